@@ -0,0 +1,102 @@
+# enrich the zones and NS hosts found by 1_findns.py with A records, AS numbers and registrars.
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu)
+#   ../data/<list>.domain_ns_info.txt (output of 1_findns.py)
+#   ../data/ipasn.dat (prefix -> AS table, pyasn or CAIDA pfx2as format; compiled to ipasn.npy)
+#   ../data/ns_registrar.csv (registrar of zones)
+# OUTPUT:
+#   ../data/<list>.a_as_register.jsonl (one name per line, streamed)
+#   ../data/domains_a_as_register.json (with --json, the dict read by 5_relation_deal.ipynb: the
+#   names of the list are merged into it, the names of the other lists are kept)
+# usage: python 1_enrich.py edu [--concurrency 64] [--qps 20] [--resume] [--json]
+# A answers are kept in ../data/ns_cache.sqlite (table a_cache), shared by all lists.
+# the files are in --data-dir (default ../data/), as for domrel.py.
+# Python 3
+
+import os
+import time
+import argparse
+from tqdm import tqdm
+from enrich import read_names, load_registrars, read_enriched, enrich, merge_json
+from as_table import ASTable, compiled_path
+from ns_cache import NSCache, default_ttl, default_negative_ttl
+from domrel import add_data_dir_argument
+
+###### GLOBAL CONFIG ######
+resolver_in_use = ["223.5.5.5", "9.9.9.9"]
+
+parser = argparse.ArgumentParser(description="enrich zones with A records, AS and registrars.")
+parser.add_argument("list", help="name of the domain list, i.e., <data-dir>/<list>.list")
+add_data_dir_argument(parser)
+parser.add_argument("--concurrency", type=int, default=64, help="max in-flight queries")
+parser.add_argument("--qps", type=float, default=20,
+                    help="max queries per second to EACH resolver (0 for unlimited)")
+parser.add_argument("--resolver", action="append", help="resolver to use (repeatable)")
+parser.add_argument("--port", type=int, default=53, help="port of the resolvers")
+parser.add_argument("--timeout", type=float, default=2.0, help="timeout of one query")
+parser.add_argument("--retries", type=int, default=2, help="retries on timeout")
+parser.add_argument("--prefix-table", help="prefix -> AS table (default <data-dir>/ipasn.dat)")
+parser.add_argument("--registrars", help="registrar csv (default <data-dir>/ns_registrar.csv)")
+parser.add_argument("--resume", action="store_true",
+                    help="append to the output, skipping names already enriched in it")
+parser.add_argument("--json", action="store_true",
+                    help="also merge the names into <data-dir>/domains_a_as_register.json")
+parser.add_argument("--cache", help="on-disk A cache (default <data-dir>/ns_cache.sqlite)")
+parser.add_argument("--no-cache", action="store_true", help="do not use the A cache")
+parser.add_argument("--cache-ttl", type=float, default=default_ttl,
+                    help="seconds an A answer stays in the cache")
+parser.add_argument("--negative-ttl", type=float, default=default_negative_ttl,
+                    help="seconds an empty A answer stays in the cache")
+args = parser.parse_args()
+
+data_dir = args.data_dir
+ns_file = data_dir+args.list+".domain_ns_info.txt"
+output_file = data_dir+args.list+".a_as_register.jsonl"
+json_file = data_dir+"domains_a_as_register.json"
+prefix_file = args.prefix_table or data_dir+"ipasn.dat"
+registrar_file = args.registrars or data_dir+"ns_registrar.csv"
+cache_file = args.cache or data_dir+"ns_cache.sqlite"
+
+###### INIT ######
+names = read_names(ns_file)
+print("[++] Names to enrich:", len(names))
+as_table = None
+if os.path.exists(prefix_file):
+    as_table = ASTable(compiled_path(prefix_file))
+    print("[++] AS table:", len(as_table), "ranges.")
+else:
+    print("[-] no prefix table", prefix_file, ": AS numbers are left empty.")
+registrars = {}
+if os.path.exists(registrar_file):
+    registrars = load_registrars(registrar_file)
+    print("[++] Registrars of", len(registrars), "zones.")
+done = set()
+if args.resume:
+    done = read_enriched(output_file)
+    print("[++] Resume with", len(done), "names already enriched.")
+cache = None
+if not args.no_cache:
+    cache = NSCache(cache_file, ttl=args.cache_ttl, negative_ttl=args.negative_ttl,
+                    table="a_cache")
+
+###### MAIN ######
+outputf = open(output_file, "a" if args.resume else "w")
+start = time.time()
+try:
+    with tqdm(unit="name") as progress:
+        stats = enrich(names, outputf, args.resolver or resolver_in_use, as_table=as_table,
+                       registrars=registrars, concurrency=args.concurrency, qps=args.qps,
+                       port=args.port, timeout=args.timeout, retries=args.retries,
+                       progress=progress, cache=cache, done=done)
+finally:
+    outputf.close()
+    if cache is not None:
+        cache.close()
+elapsed = time.time() - start
+print("[++] names:", stats["names"], "queries:", stats["queries"], "retries:", stats["retries"],
+      "timeouts:", stats["timeouts"], "no A:", stats["no_a"], "unanswered:", stats["unanswered"],
+      "errors:", stats["errors"], "cache hits:", stats["cache_hits"], "(%.1f names/sec)" % (stats["names"] / max(elapsed, 1e-9)))
+
+if args.json:
+    merged, total = merge_json(json_file, output_file)
+    print("[++] Merged", merged, "names into", json_file, "(%d names)" % total)
@@ -0,0 +1,137 @@
+# from the global graphs, the zones (and domains) that lose resolution when some zones are blocked.
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu)
+#   ../data/<list>.graph_set.dgf (output of 2_build_dependency.py, memory-mapped; or else
+#   ../data/<list>.graph_set_global.bin)
+#   ../data/<list>.list (the domains counted in the blast radius)
+#   secrank1k-metadata.txt (optional, node metadata of --json)
+#   ../data/domains_a_as_register.json (node metadata of --json with --a-as-register)
+# OUTPUT:
+#   the lost zones of --block, and the zones with the largest blast radius (--rank)
+#   ../data/<list>.graph_set_global.block.<zones>.json (with --json; red: lost, green: resolves;
+#   the general mode as in 5_relation_deal.ipynb, other modes get .<mode> before .block. the
+#   schema is the one of the shipped files: self-loops dropped, indegree without them, and only
+#   the secrank counts as metadata; --a-as-register adds the ip/as/register keys of the notebook)
+# usage: python 5_block_impact.py edu --block edu.cn [--mode general,critical] [--json]
+#        python 5_block_impact.py other --rank 20 --pairs 30 [--workers 8]
+# the files are in --data-dir (default ../data/), as for domrel.py.
+# Python 3
+
+import os
+import ast
+import json
+import time
+import argparse
+from itertools import combinations
+from dep_graph import modes
+from block_impact import BlockIndex, batch_blast_radius, block_json
+from graph_file import load_global_graphs, as_networkx
+from domrel import add_data_dir_argument
+
+###### GLOBAL CONFIG ######
+metadata_file = "secrank1k-metadata.txt"
+
+parser = argparse.ArgumentParser(description="impact of blocking zones on the global graphs.")
+parser.add_argument("list", help="name of the domain list, e.g. edu")
+add_data_dir_argument(parser)
+parser.add_argument("--mode", default=",".join(modes), help="comma-separated modes")
+parser.add_argument("--block", action="append", default=[],
+                    help="comma-separated zones blocked together (repeatable, one scenario each)")
+parser.add_argument("--json", action="store_true", help="write the colored graph of each --block")
+parser.add_argument("--a-as-register", action="store_true",
+                    help="also put the ip/as/register of the nodes in the --json output")
+parser.add_argument("--rank", type=int, default=0,
+                    help="print this many zones with the largest blast radius when blocked alone")
+parser.add_argument("--pairs", type=int, default=0,
+                    help="rank every pair among this many top zones by their joint blast radius")
+parser.add_argument("--workers", type=int, default=0, help="processes of --pairs (0: all cores)")
+args = parser.parse_args()
+
+ntype = args.list
+data_dir = args.data_dir
+domain_file = data_dir+ntype+".list"
+a_as_register_file = data_dir+"domains_a_as_register.json"
+
+
+###### FUNC ######
+# node metadata of the json output: secrank counts, and A/AS/registrar with a_as_register, if
+# available.
+def load_metadata(a_as_register=False):
+    metadata = {}
+    if os.path.exists(metadata_file):
+        with open(metadata_file) as f:
+            for line in f:
+                if line.strip():
+                    d = ast.literal_eval(line.strip())
+                    metadata[d["sld"]] = {k: d[k] for k in
+                                          ("requestCount", "clientIpCount", "subdomainCount")}
+    if a_as_register and os.path.exists(a_as_register_file):
+        with open(a_as_register_file) as f:
+            a_as_info = json.load(f)
+        for zone, info in a_as_info.items():
+            d = metadata.setdefault(zone, {})
+            d["ip"] = info["A"]
+            d["as"] = info["AS"]
+            d["register"] = info["REGISTER"]
+    return metadata
+
+
+def output_name(mode, zones):
+    infix = "" if mode == "general" else "." + mode
+    return "%s%s.graph_set_global%s.block.%s.json" % (data_dir, ntype, infix, "+".join(zones))
+
+
+###### INIT ######
+domain_list = []
+with open(domain_file) as f:
+    for line in f:
+        domain_list.append(line.strip().lower().split("\t")[0])
+# global graphs. Global_graph_set = {"general": G, "explicit", "critical", "essential"}
+# (memory-mapped from the graph file, see graph_file.py).
+Global_graph_set = load_global_graphs(data_dir, ntype)
+scenarios = [[zone for zone in block.split(",") if zone] for block in args.block]
+metadata = load_metadata(args.a_as_register) if args.json and scenarios else None
+
+###### MAIN ######
+for mode in args.mode.split(","):
+    G = Global_graph_set[mode]
+    start = time.perf_counter()
+    index = BlockIndex(G, domains=domain_list)
+    print("[+]", mode, ":", len(index), "zones indexed in %.3fs" % (time.perf_counter() - start))
+    # the json output walks the networkx graph.
+    if args.json and scenarios:
+        G = as_networkx(G)
+
+    for zones in scenarios:
+        start = time.perf_counter()
+        try:
+            lost = index.lost(zones)
+        except KeyError as e:
+            print("[-]", e.args[0])
+            continue
+        elapsed = time.perf_counter() - start
+        lost_domains = [zone for zone in lost if index.is_domain[index.ids[zone]]]
+        print("[++] block", ",".join(zones), ":", len(lost), "zones,", len(lost_domains),
+              "domains lose resolution (%.2f ms)" % (elapsed * 1000))
+        for domain in lost_domains:
+            print("\t", domain)
+        if args.json:
+            with open(output_name(mode, zones), "w") as f:
+                f.write(json.dumps(block_json(G, lost, metadata), indent=4))
+
+    if args.rank or args.pairs:
+        ranked = index.rank(max(args.rank, args.pairs + 1))
+        print("[++] largest blast radius (zone, zones lost, domains lost):")
+        for item in ranked[:args.rank]:
+            print("\t", item)
+    if args.pairs:
+        # root takes everything down with it: the pairs are formed without it.
+        top_zones = [zone for zone, _, _ in ranked if zone != "."][:args.pairs]
+        pairs = [list(pair) for pair in combinations(top_zones, 2)]
+        start = time.perf_counter()
+        radius = batch_blast_radius(index, pairs, workers=args.workers or None)
+        elapsed = time.perf_counter() - start
+        order = sorted(range(len(pairs)), key=lambda i: (radius[i][1], radius[i][0]), reverse=True)
+        print("[++]", len(pairs), "pairs in %.3fs. largest joint blast radius:" % elapsed)
+        for i in order[:max(args.rank, 10)]:
+            print("\t", tuple(pairs[i]), radius[i])
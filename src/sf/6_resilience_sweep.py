@@ -0,0 +1,84 @@
+# from the global graphs, the sets of k zones (NS providers) that jointly take down the most domains.
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu)
+#   ../data/<list>.graph_set.dgf (output of 2_build_dependency.py, memory-mapped; or else
+#   ../data/<list>.graph_set_global.bin)
+#   ../data/<list>.list (the domains counted, the first --top-domains of them)
+# OUTPUT:
+#   ../data/<list>.resilience.<mode>.csv (method, k, rank, zones, domains_lost, zones_lost)
+# usage: python 6_resilience_sweep.py other [--mode critical,explicit] [--k 3] [--candidates 60]
+#        [--family awsdns-] [--greedy-k 10] [--workers 8]
+# the files are in --data-dir (default ../data/), as for domrel.py.
+# Python 3
+
+import csv
+import time
+import argparse
+from block_impact import BlockIndex
+from resilience import candidate_units, sweep, greedy
+from graph_file import load_global_graphs
+from domrel import add_data_dir_argument
+
+###### GLOBAL CONFIG ######
+default_families = ["awsdns-"]
+
+parser = argparse.ArgumentParser(description="k-zone resilience sweep of the global graphs.")
+parser.add_argument("list", help="name of the domain list, e.g. edu")
+add_data_dir_argument(parser)
+parser.add_argument("--mode", default="critical,explicit", help="comma-separated modes")
+parser.add_argument("--k", type=int, default=3, help="sweep every scenario of 1..k units")
+parser.add_argument("--candidates", type=int, default=60,
+                    help="units of the sweep, the most exposed ones (0: all)")
+parser.add_argument("--family", action="append",
+                    help="regular expression of zones blocked together as one unit (repeatable, "
+                         "default: %s)" % " ".join(default_families))
+parser.add_argument("--greedy-k", type=int, default=10, help="units picked by lazy greedy")
+parser.add_argument("--top", type=int, default=100, help="scenarios kept for each k")
+parser.add_argument("--top-domains", type=int, default=0,
+                    help="only count the first domains of the list (0: all)")
+parser.add_argument("--workers", type=int, default=0, help="processes of the sweep (0: all cores)")
+args = parser.parse_args()
+# (a default list would be appended to by --family, and could not be dropped.)
+families = args.family or default_families
+
+ntype = args.list
+data_dir = args.data_dir
+domain_file = data_dir+ntype+".list"
+output_file = data_dir+ntype+".resilience.%s.csv"
+
+###### INIT ######
+domain_list = []
+with open(domain_file) as f:
+    for line in f:
+        domain_list.append(line.strip().lower().split("\t")[0])
+if args.top_domains:
+    domain_list = domain_list[:args.top_domains]
+# global graphs. Global_graph_set = {"general": G, "explicit", "critical", "essential"}
+# (memory-mapped from the graph file, see graph_file.py).
+Global_graph_set = load_global_graphs(data_dir, ntype)
+
+###### MAIN ######
+for mode in args.mode.split(","):
+    index = BlockIndex(Global_graph_set[mode], domains=domain_list)
+    units = candidate_units(index, families=families, candidates=args.candidates)
+    print("[+]", mode, ":", len(units), "candidate units")
+    rows = []
+    for k in range(1, args.k + 1):
+        start = time.perf_counter()
+        result = sweep(index, units, k, top=args.top, workers=args.workers or None)
+        print("[++] k = %d: %.3fs. most domains lost:" % (k, time.perf_counter() - start))
+        for rank, (domains, zones, names) in enumerate(result):
+            rows.append(["sweep", k, rank + 1, "+".join(names), domains, zones])
+            if rank < 5:
+                print("\t", names, domains, "domains,", zones, "zones")
+    start = time.perf_counter()
+    steps = greedy(index, units, args.greedy_k)
+    print("[++] lazy greedy, %d units: %.3fs" % (len(steps), time.perf_counter() - start))
+    for k, (domains, zones, names) in enumerate(steps):
+        rows.append(["greedy", k + 1, 1, "+".join(names), domains, zones])
+        print("\t", k + 1, names[-1], domains, "domains,", zones, "zones")
+    with open(output_file % mode, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["method", "k", "rank", "zones", "domains_lost", "zones_lost"])
+        writer.writerows(rows)
+    print("[++] Results in", output_file % mode)
@@ -0,0 +1,56 @@
+# long-running query service over the NS records of a list: per-domain graphs and metrics, and
+# the domains depending on a zone or an NS host, computed on demand (see query_index.py,
+# query_server.py for the endpoints).
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu)
+#   ../data/<list>.domain_ns_info.txt (output of 1_findns.py)
+#   ../data/<list>.glue.txt (output of 1_findns.py --iterative, if there is one)
+#   ../data/<list>.list (the domains answered by /dependents, in rank order)
+# usage: python 7_query_service.py other [--port 8053 | --unix /tmp/domrel.sock]
+#        curl 'http://127.0.0.1:8053/dependents?name=awsdns-00.com&mode=general'
+# the files are in --data-dir (default ../data/), as for domrel.py.
+# Python 3
+
+import time
+import argparse
+from zone_index import load_domain_ns, load_snapshot_glue
+from query_index import QueryIndex
+from query_server import make_server
+from domrel import add_data_dir_argument
+
+###### GLOBAL CONFIG ######
+parser = argparse.ArgumentParser(description="query service over the NS records of a list.")
+parser.add_argument("list", help="name of the domain list, e.g. edu")
+add_data_dir_argument(parser)
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8053)
+parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+parser.add_argument("--result-cache", type=int, default=10000, help="answers kept in the LRU")
+parser.add_argument("--verbose", action="store_true", help="log every request")
+args = parser.parse_args()
+
+ntype = args.list
+domain_file = args.data_dir+ntype+".list"
+ns_file = args.data_dir+ntype+".domain_ns_info.txt"
+
+###### INIT ######
+start = time.perf_counter()
+domain_list = []
+with open(domain_file) as f:
+    for line in f:
+        domain_list.append(line.strip().lower().split("\t")[0])
+domain_ns = load_domain_ns(ns_file)
+index = QueryIndex(domain_ns, domains=domain_list, result_cache=args.result_cache,
+                   glue=load_snapshot_glue(ns_file))
+print("[++] %d zones, %d NS hosts, %d domains indexed in %.2fs" % (
+    len(index.dep), len(index.ns_zones), len(domain_list), time.perf_counter() - start))
+
+###### MAIN ######
+server = make_server(index, args.host, args.port, unix=args.unix, quiet=not args.verbose)
+print("[++] Listening on", args.unix or "http://%s:%d" % (args.host, args.port))
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.server_close()
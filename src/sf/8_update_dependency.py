@@ -0,0 +1,98 @@
+# from two crawl snapshots of a list, update the outputs of 2_build_dependency.py incrementally:
+# only the domains whose closure touches a changed zone are rebuilt (see snapshot_diff.py).
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu)
+#   --old: the previous ../data/<list>.domain_ns_info.txt (the one the outputs were built from)
+#   --new: the new snapshot (default ../data/<list>.domain_ns_info.txt)
+#   the glue of each snapshot, if it was crawled with --iterative: <list>.glue.txt next to
+#   <list>.domain_ns_info.txt, <list>.glue.prev.txt next to <list>.domain_ns_info.prev.txt
+#   (or --old-glue, --new-glue; without it the glue is guessed from the names, as the build does)
+#   ../data/<list>.metrics/ (output of 2_build_dependency.py, the domains updated)
+#   ../data/<list>.graph_set_global.bin (output of 2_build_dependency.py)
+# OUTPUT:
+#   ../data/<list>.metrics/ and ../data/<list>.graph_set_global.bin, patched in place
+#   ../data/<list>.graph_set.dgf (if there is one), rewritten with the patched global graphs
+#   ../data/<list>.graph_set_per_domain.bin and ../data/<list>.graphs/ are not updated (a warning
+#   says so if they exist): rebuild them with 2_build_dependency.py
+#   ../data/<list>.changelog.jsonl: one line per changed domain,
+#     {"domain": d, "changes": {mode: {"added": [zones], "removed": [zones],
+#                                      "edges_added": [[u, v]], "edges_removed": [[u, v]]}}}
+# usage: python 8_update_dependency.py edu --old ../data/edu.domain_ns_info.prev.txt
+# the files are in --data-dir (default ../data/), as for domrel.py.
+# Python 3
+
+import os
+import json
+import time
+import pickle
+import argparse
+from zone_index import load_domain_ns, load_glue, load_snapshot_glue
+from result_store import read_metrics
+from snapshot_diff import update
+from graph_file import GraphFile, graph_file_path, write_graph_file
+from domrel import add_data_dir_argument
+
+###### GLOBAL CONFIG ######
+parser = argparse.ArgumentParser(description="incremental update between two crawl snapshots.")
+parser.add_argument("list", help="name of the domain list, e.g. edu")
+add_data_dir_argument(parser)
+parser.add_argument("--old", required=True, help="the snapshot the outputs were built from")
+parser.add_argument("--new",
+                    help="the new snapshot (default <data-dir>/<list>.domain_ns_info.txt)")
+parser.add_argument("--old-glue", help="the glue of --old (default: the one next to it)")
+parser.add_argument("--new-glue", help="the glue of --new (default: the one next to it)")
+args = parser.parse_args()
+
+ntype = args.list
+data_dir = args.data_dir
+new_file = args.new or data_dir+ntype+".domain_ns_info.txt"
+metrics_dir = data_dir+ntype+".metrics/"
+graph_store_dir = data_dir+ntype+".graphs/"
+per_domain_file = data_dir+ntype+".graph_set_per_domain.bin"
+global_graph_file = data_dir+ntype+".graph_set_global.bin"
+changelog_file = data_dir+ntype+".changelog.jsonl"
+graph_file = graph_file_path(data_dir, ntype)
+
+###### INIT ######
+start = time.perf_counter()
+old_ns = load_domain_ns(args.old)
+new_ns = load_domain_ns(new_file)
+old_glue = load_glue(args.old_glue) if args.old_glue else load_snapshot_glue(args.old)
+new_glue = load_glue(args.new_glue) if args.new_glue else load_snapshot_glue(new_file)
+print("[++] Glue from the referrals: old %s, new %s" % (
+    "none" if old_glue is None else "%d zones" % len(old_glue),
+    "none" if new_glue is None else "%d zones" % len(new_glue)))
+# the domains of the build, in rank order (one row per mode in the store).
+metrics = read_metrics(metrics_dir)
+first_mode = metrics["mode"] == 0
+domain_list = [domain.decode() for domain in metrics["domain"][first_mode]]
+print("[++] Domains in the build:", len(domain_list))
+# global graphs. Global_graph_set = {"general": G, "explicit", "critical", "essential"}
+Global_graph_set = pickle.load(open(global_graph_file, "rb"))
+
+###### MAIN ######
+changelog, stats = update(old_ns, new_ns, domain_list, metrics_dir, Global_graph_set,
+                          old_glue=old_glue, new_glue=new_glue)
+tmp = global_graph_file + ".tmp"
+pickle.dump(Global_graph_set, open(tmp, "wb"))
+os.replace(tmp, global_graph_file)
+if os.path.exists(graph_file):
+    # the per-domain graphs of the file are not updated: they are dropped.
+    if GraphFile(graph_file).domains:
+        print("[-] per-domain graphs dropped from", graph_file,
+              "rebuild them with 2_build_dependency.py --domain-graphs")
+    write_graph_file(graph_file, Global_graph_set)
+with open(changelog_file, "w") as f:
+    for domain in domain_list:
+        if domain in changelog:
+            f.write(json.dumps({"domain": domain, "changes": changelog[domain]}) + "\n")
+print("[++] zones changed: %d, domains rebuilt: %d, changed: %d, metric rows patched: %d (%.2fs)" % (
+    stats["zones_changed"], stats["domains_rebuilt"], stats["domains_changed"],
+    stats["metric_rows_patched"], time.perf_counter() - start))
+for key in sorted(k for k in stats if k.startswith("global_")):
+    print("[++]", key, stats[key])
+print("[++] Changelog in", changelog_file)
+if os.path.exists(per_domain_file):
+    print("[-]", per_domain_file, "is not updated, rebuild it with 2_build_dependency.py --pickle")
+if os.path.exists(graph_store_dir):
+    print("[-]", graph_store_dir, "is not updated, rebuild it with 2_build_dependency.py --graph-store")
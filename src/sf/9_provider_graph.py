@@ -0,0 +1,21 @@
+# from the graphs, collapse the global graphs into providers and output them as tiles that a
+# viewer loads lazily (provider -> zone -> domain, see provider_graph.py).
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu)
+#   ../data/<list>.graph_set.dgf, or else ../data/<list>.graph_set_global.bin (output of 2_build_dependency.py)
+#   ../data/<list>.list, ../data/<list>.domain_ns_info.txt (output of 1_findns.py)
+#   ../data/<list>.a_as_register.jsonl, or else ../data/domains_a_as_register.json (AS of the NS)
+#   ../data/ns_registrar.csv (registrar of zones)
+# OUTPUT:
+#   ../data/<list>.providers/(type)/index.json, zones/<t>.json, domains/<t>.json
+#   ../data/<list>.providers.profile.txt and ../data/<list>.providers.metrics.json (with --profile)
+# usage: python 9_provider_graph.py edu [--mode general,explicit,critical,essential]
+#        [--tile-size 500]
+# Python 3
+
+import sys
+from domrel import main
+
+###### MAIN ######
+# the providers stage of the pipeline (pipeline.py), with the options of: python domrel.py providers --help
+main(["providers"] + sys.argv[1:])
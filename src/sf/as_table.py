@@ -0,0 +1,171 @@
+# IPv4 -> AS number lookups from a local prefix table (used by enrich.py).
+# the text table (pyasn "ipasn.dat": "1.0.0.0/24<TAB>13335", or CAIDA pfx2as:
+# "1.0.0.0<TAB>24<TAB>13335", ";" or "#" comments) is compiled once into a flat interval table:
+# the nested prefixes are cut into disjoint ranges, each with the AS of its longest prefix.
+#   <table>.npy: uint32 array (2, n): row 0 the first address of each range (sorted, starting
+#   at 0.0.0.0), row 1 its AS (0: not announced).
+#   <table>.blocks.npy: uint32 array of 2^24 (64 MB): the AS of every /24 that lies in one range,
+#   split (0xFFFFFFFF) for the few /24 cut by longer prefixes.
+# both files are memory-mapped. a lookup is one read of the /24 array; only the addresses of
+# split /24s go through np.searchsorted over the range starts.
+# Python 3
+
+import os
+import socket
+import numpy as np
+
+###### GLOBAL CONFIG ######
+default_prefix_file = "../data/ipasn.dat"
+no_as = 0
+split_block = 0xFFFFFFFF
+
+
+###### FUNC ######
+def ip_to_int(ip):
+    return int.from_bytes(socket.inet_aton(ip), "big")
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(int(value).to_bytes(4, "big"))
+
+
+# dotted IPv4 strings to a uint32 array.
+def ips_to_array(ips):
+    return np.fromiter((ip_to_int(ip) for ip in ips), dtype=np.uint32, count=len(ips))
+
+
+# read the (start, end, asn) of every prefix of a text table. IPv6 prefixes are skipped.
+def read_prefixes(prefix_file):
+    prefixes = []
+    with open(prefix_file) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0][0] in ";#" or ":" in fields[0]:
+                continue
+            try:
+                if "/" in fields[0]:
+                    network, length = fields[0].split("/")
+                    asn = fields[1]
+                else:
+                    network, length, asn = fields[:3]
+                length = int(length)
+                # multi-origin prefixes ("123_456", "123,456"): the first origin.
+                asn = int(asn.replace(",", "_").split("_")[0])
+                start = ip_to_int(network) & ((0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF)
+            except (ValueError, IndexError, OSError):
+                print("[-] bad prefix line:", line.strip())
+                continue
+            prefixes.append((start, start + (1 << (32 - length)) - 1, asn))
+    return prefixes
+
+
+# cut nested prefixes into disjoint ranges: (starts, asns), the AS of the longest prefix wins.
+def flatten(prefixes):
+    # outer prefixes before the prefixes they contain.
+    prefixes = sorted(prefixes, key=lambda p: (p[0], -p[1]))
+    starts = [0]
+    asns = [no_as]
+
+    def emit(start, asn):
+        if starts[-1] == start:
+            starts.pop()
+            asns.pop()
+        if asns and asns[-1] == asn:
+            return
+        starts.append(start)
+        asns.append(asn)
+
+    # the prefixes covering the current address, innermost last: (end, asn).
+    stack = []
+    for start, end, asn in prefixes:
+        while stack and stack[-1][0] < start:
+            popped_end, _ = stack.pop()
+            if popped_end < 0xFFFFFFFF:
+                emit(popped_end + 1, stack[-1][1] if stack else no_as)
+        emit(start, asn)
+        stack.append((end, asn))
+    while stack:
+        popped_end, _ = stack.pop()
+        if popped_end < 0xFFFFFFFF:
+            emit(popped_end + 1, stack[-1][1] if stack else no_as)
+    return np.array(starts, dtype=np.uint32), np.array(asns, dtype=np.uint32)
+
+
+# the AS of every /24 (split_block when the /24 is not in one range), 2^20 /24s at a time.
+def block_table(starts, asns):
+    # the start of the next range, past the last address for the last range.
+    next_starts = np.append(starts.astype(np.uint64)[1:], np.uint64(1 << 32))
+    result = np.empty(1 << 24, dtype=np.uint32)
+    step = 1 << 20
+    for first in range(0, 1 << 24, step):
+        blocks = np.arange(first, first + step, dtype=np.uint64) << np.uint64(8)
+        index = np.searchsorted(starts, blocks, side="right") - 1
+        result[first:first + step] = np.where(next_starts[index] >= blocks + np.uint64(256),
+                                              asns[index], np.uint32(split_block))
+    return result
+
+
+def _save(path, array):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+# compile a text prefix table into table_file (.npy) and its /24 blocks. returns the number of
+# ranges.
+def compile_table(prefix_file, table_file):
+    starts, asns = flatten(read_prefixes(prefix_file))
+    _save(blocks_path(table_file), block_table(starts, asns))
+    _save(table_file, np.stack([starts, asns]))
+    return len(starts)
+
+
+def blocks_path(table_file):
+    return os.path.splitext(table_file)[0] + ".blocks.npy"
+
+
+# the compiled table of a text prefix table, (re)compiled when the text is newer.
+def compiled_path(prefix_file):
+    table_file = os.path.splitext(prefix_file)[0] + ".npy"
+    if (not os.path.exists(table_file)
+            or os.path.getmtime(table_file) < os.path.getmtime(prefix_file)):
+        compile_table(prefix_file, table_file)
+    return table_file
+
+
+class ASTable:
+    def __init__(self, table_file):
+        table = np.load(table_file, mmap_mode="r")
+        self.starts = table[0]
+        self.asns = table[1]
+        self.blocks = np.load(blocks_path(table_file), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.starts)
+
+    # AS of every address of a uint32 array (0: not announced).
+    def lookup_array(self, addresses):
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        result = np.take(self.blocks, addresses >> np.uint32(8))
+        split = np.flatnonzero(result == split_block)
+        if len(split):
+            index = np.searchsorted(self.starts, addresses[split], side="right") - 1
+            result[split] = self.asns[index]
+        return result
+
+    # AS of each dotted IPv4 address, None if not announced (or not IPv4).
+    def lookup(self, ips):
+        result = [None] * len(ips)
+        positions = []
+        addresses = []
+        for i, ip in enumerate(ips):
+            try:
+                addresses.append(ip_to_int(ip))
+                positions.append(i)
+            except OSError:
+                continue
+        if addresses:
+            asns = self.lookup_array(np.array(addresses, dtype=np.uint32))
+            for i, asn in zip(positions, asns.tolist()):
+                result[i] = asn if asn != no_as else None
+        return result
@@ -0,0 +1,65 @@
+# check block_impact.py against the two reverse DFS of 5_relation_deal.ipynb (blockAdomain), on
+# every zone of the global graphs and on random multi-zone scenarios, and time both.
+# INPUT:
+#   ../data/<list>.graph_set.dgf (output of 2_build_dependency.py, memory-mapped; or else
+#   ../data/<list>.graph_set_global.bin). the index is built from the graph as the scripts load
+#   it, the reference DFS walks its networkx graph.
+# usage: python bench_block_impact.py edu gov other [--scenarios 300] [--max-zones 4]
+# Python 3
+
+import time
+import random
+import argparse
+import networkx as nx
+from dep_graph import modes, root
+from block_impact import BlockIndex
+from graph_file import load_global_graphs, as_networkx
+
+###### GLOBAL CONFIG ######
+parser = argparse.ArgumentParser(description="check and time the block impact index.")
+parser.add_argument("lists", nargs="+", help="names of the domain lists, e.g. edu gov other")
+parser.add_argument("--scenarios", type=int, default=300, help="random multi-zone scenarios")
+parser.add_argument("--max-zones", type=int, default=4, help="zones of a random scenario")
+args = parser.parse_args()
+
+
+###### FUNC ######
+# the zones lost when zones are blocked, as 5_relation_deal.ipynb computes it.
+def block_reference(G, zones):
+    R = G.reverse()
+    reachable1 = set(nx.dfs_preorder_nodes(R, source=root))
+    R.remove_nodes_from(zones)
+    reachable2 = set(nx.dfs_preorder_nodes(R, source=root)) if root in R else set()
+    return reachable1 - reachable2
+
+
+###### MAIN ######
+failed = False
+rnd = random.Random(0)
+for ntype in args.lists:
+    Global_graph_set = load_global_graphs("../data/", ntype)
+    for mode in modes:
+        start = time.perf_counter()
+        index = BlockIndex(Global_graph_set[mode])
+        t_index = time.perf_counter() - start
+        G = as_networkx(Global_graph_set[mode])
+        nodes = list(G.nodes())
+        scenarios = [[zone] for zone in nodes]
+        scenarios += [rnd.sample(nodes, rnd.randint(2, min(args.max_zones, len(nodes))))
+                      for _ in range(args.scenarios)]
+        t_index_query = t_reference = 0.0
+        mismatches = 0
+        for zones in scenarios:
+            start = time.perf_counter()
+            lost = set(index.lost(zones))
+            t_index_query += time.perf_counter() - start
+            start = time.perf_counter()
+            reference = block_reference(G, zones)
+            t_reference += time.perf_counter() - start
+            mismatches += lost != reference
+        failed |= mismatches > 0
+        print("%-6s %-9s zones %6d | index %.3fs | query %.3f ms | DFS %.3f ms | mismatches %d" % (
+            ntype, mode, len(nodes), t_index, t_index_query / len(scenarios) * 1000,
+            t_reference / len(scenarios) * 1000, mismatches))
+if failed:
+    raise SystemExit(1)
@@ -0,0 +1,68 @@
+# throughput benchmark of the NS crawler against the local stub DNS server.
+# usage: python bench_crawl.py [--domains 20000] [--providers 200] [--concurrency 256] [--delay 0.01]
+#        python bench_crawl.py --ns-file ../data/other.domain_ns_info.txt --list ../data/other.list
+# Python 3
+
+import io
+import time
+import random
+import argparse
+from stub_dns import StubDNSServer, load_zones
+from ns_crawler import crawl
+
+parser = argparse.ArgumentParser(description="throughput benchmark of the NS crawler.")
+parser.add_argument("--domains", type=int, default=20000, help="synthetic domains to crawl")
+parser.add_argument("--providers", type=int, default=200, help="synthetic NS providers")
+parser.add_argument("--ns-file", help="serve a real domain_ns_info.txt instead")
+parser.add_argument("--list", help="domain list to crawl (with --ns-file)")
+parser.add_argument("--concurrency", type=int, default=256)
+parser.add_argument("--qps", type=float, default=0, help="per-resolver qps (0 for unlimited)")
+parser.add_argument("--delay", type=float, default=0.01, help="simulated resolver latency (s)")
+args = parser.parse_args()
+
+
+# synthetic zones: every domain is hosted by one provider; providers host themselves.
+def synthetic_zones(n_domains, n_providers):
+    rng = random.Random(0)
+    zones = {"com": ["a.gtld-servers.net."], "net": ["a.gtld-servers.net."],
+             "gtld-servers.net": ["a.gtld-servers.net."]}
+    providers = ["dns%d.net" % i for i in range(n_providers)]
+    for p in providers:
+        zones[p] = ["ns1." + p + ".", "ns2." + p + "."]
+    domains = []
+    for i in range(n_domains):
+        domain = "site%d.com" % i
+        zones[domain] = ["ns1." + rng.choice(providers) + "."]
+        domains.append(domain)
+    return zones, domains
+
+
+if args.ns_file:
+    zones = load_zones(args.ns_file)
+    domains = [line.strip().split("\t")[0].lower() for line in open(args.list) if line.strip()]
+else:
+    zones, domains = synthetic_zones(args.domains, args.providers)
+
+with StubDNSServer(zones, delay=args.delay) as server:
+    outputf = io.StringIO()
+    start = time.time()
+    stats = crawl(domains, outputf, ["127.0.0.1"], concurrency=args.concurrency,
+                  qps=args.qps, port=server.port, timeout=2.0)
+    elapsed = time.time() - start
+
+# every zone served by the stub must show up in the output with the same NS set. names are
+# compared lowercased without the trailing dot, as DNS names are case-insensitive (the ns file
+# has e.g. ns2.APNIC.net where the crawl writes ns2.apnic.net).
+def ns_name(ns):
+    return ns.rstrip(".").lower()
+
+
+found = {}
+for line in outputf.getvalue().splitlines():
+    zone, ns = line.split("\t")
+    found.setdefault(zone, set()).add(ns_name(ns))
+missing = [z for z in zones if z in found and found[z] != {ns_name(ns) for ns in zones[z]}]
+print("[+] zones:", stats["zones"], "queries:", stats["queries"], "timeouts:", stats["timeouts"],
+      "mismatched:", len(missing))
+print("[+] %.2f s, %.1f zones/sec (concurrency %d, delay %.3f s)"
+      % (elapsed, stats["zones"] / elapsed, args.concurrency, args.delay))
@@ -0,0 +1,71 @@
+# deduplication of the per-domain graphs in the graph file (graph_file.py): for each list, the
+# graph_set_per_domain.bin is converted to a graph file in a scratch folder, and compared with it:
+# distinct shared bodies, dedup ratio, edges and bytes stored, and the memory of the unpickled
+# networkx graphs against the graph file read back.
+# usage: python bench_dedup.py edu gov other [--data-dir ../data/]
+# Python 3
+
+import os
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+# imported here, so that it is not counted in the memory of the first unpickling.
+import networkx
+from dep_graph import modes
+from graph_file import GraphFile, write_graph_file
+
+parser = argparse.ArgumentParser(description="deduplication of the per-domain graphs.")
+parser.add_argument("lists", nargs="+", help="names of the lists, e.g. edu gov other")
+parser.add_argument("--data-dir", default="../data/")
+args = parser.parse_args()
+
+
+###### FUNC ######
+# (result, peak of the Python allocations in MB) of f().
+def traced(f):
+    tracemalloc.start()
+    result = f()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, peak
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# every edge list read back from the graph file (expanded, but not kept).
+def read_all(graph_file):
+    edges = 0
+    for domain in graph_file.domain_names():
+        for mode in modes:
+            edges += len(graph_file.domain_edges(domain, mode))
+    return edges
+
+
+###### MAIN ######
+workdir = tempfile.mkdtemp(prefix="bench_dedup_")
+print("%-8s %7s %7s %6s %9s %9s %10s %10s %10s %10s" % (
+    "list", "graphs", "bodies", "ratio", "edges", "stored", "pickle KB", "file KB",
+    "nx MB", "file MB"))
+for ntype in args.lists:
+    per_domain_file = os.path.join(args.data_dir, ntype + ".graph_set_per_domain.bin")
+    Graph_set, nx_memory = traced(lambda: load_pickle(per_domain_file))
+    Global_graph_set = load_pickle(os.path.join(args.data_dir, ntype + ".graph_set_global.bin"))
+    path = os.path.join(workdir, ntype + ".graph_set.dgf")
+    start = time.perf_counter()
+    write_graph_file(path, Global_graph_set, Graph_set)
+    elapsed = time.perf_counter() - start
+    graph_file = GraphFile(path)
+    dedup = graph_file.dedup_stats()
+    edges, file_memory = traced(lambda: read_all(GraphFile(path)))
+    assert edges == dedup["edges"]
+    print("%-8s %7d %7d %6.1f %9d %9d %10.1f %10.1f %10.2f %10.2f   (written in %.2fs)" % (
+        ntype, dedup["graphs"], dedup["bodies"], dedup["dedup_ratio"], dedup["edges"],
+        dedup["stored_edges"], os.path.getsize(per_domain_file) / 1024,
+        os.path.getsize(path) / 1024, nx_memory, file_memory, elapsed))
+shutil.rmtree(workdir)
@@ -0,0 +1,106 @@
+# benchmark of the enrichment stage: AS lookups on a synthetic prefix table (checked against a
+# longest-prefix match), then the A/AS/registrar enrichment of a domain_ns_info.txt against the
+# local stub DNS server (synthetic A records), including an interrupted run resumed.
+# usage: python bench_enrich.py [--prefixes 900000] [--lookups 10000000]
+#        [--ns-file ../data/other.domain_ns_info.txt] [--delay 0.001]
+# Python 3
+
+import os
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+from as_table import ASTable, compile_table, int_to_ip, ip_to_int
+from enrich import read_names, load_registrars, enrich, read_enriched, to_dict
+from stub_dns import StubDNSServer
+
+parser = argparse.ArgumentParser(description="benchmark of the A/AS/registrar enrichment.")
+parser.add_argument("--prefixes", type=int, default=900000, help="synthetic prefixes")
+parser.add_argument("--lookups", type=int, default=10000000, help="random addresses looked up")
+parser.add_argument("--ns-file", default="../data/other.domain_ns_info.txt")
+parser.add_argument("--registrars", default="../data/ns_registrar.csv")
+parser.add_argument("--concurrency", type=int, default=256)
+parser.add_argument("--delay", type=float, default=0.001, help="simulated resolver latency (s)")
+args = parser.parse_args()
+
+
+# a synthetic BGP-like table: mostly /24s, nested in shorter prefixes of other AS.
+def synthetic_prefixes(path, n):
+    rng = random.Random(0)
+    lengths = [8, 12, 16, 19, 20, 21, 22, 23, 24, 24, 24, 24, 24, 24]
+    prefixes = {}
+    with open(path, "w") as f:
+        f.write("; synthetic prefix table\n")
+        while len(prefixes) < n:
+            length = rng.choice(lengths)
+            start = rng.getrandbits(32) & ((0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF)
+            if (start, length) in prefixes:
+                continue
+            prefixes[(start, length)] = rng.randint(1, 65000)
+            f.write("%s/%d\t%d\n" % (int_to_ip(start), length, prefixes[(start, length)]))
+    return prefixes
+
+
+# longest-prefix match, one address at a time.
+def reference_lookup(prefixes, address):
+    for length in range(32, -1, -1):
+        start = address & ((0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF)
+        if (start, length) in prefixes:
+            return prefixes[(start, length)]
+    return 0
+
+
+workdir = tempfile.mkdtemp()
+### 1. AS lookups.
+prefix_file = os.path.join(workdir, "ipasn.dat")
+table_file = os.path.join(workdir, "ipasn.npy")
+prefixes = synthetic_prefixes(prefix_file, args.prefixes)
+start = time.perf_counter()
+ranges = compile_table(prefix_file, table_file)
+print("[+] %d prefixes compiled into %d ranges in %.2fs" % (len(prefixes), ranges,
+                                                            time.perf_counter() - start))
+start = time.perf_counter()
+table = ASTable(table_file)
+print("[+] table mapped in %.4fs" % (time.perf_counter() - start))
+addresses = np.random.default_rng(0).integers(0, 1 << 32, size=args.lookups, dtype=np.uint32)
+start = time.perf_counter()
+asns = table.lookup_array(addresses)
+elapsed = time.perf_counter() - start
+print("[+] %d lookups in %.3fs: %.1f M IPs/sec" % (args.lookups, elapsed,
+                                                  args.lookups / elapsed / 1e6))
+sample = addresses[:20000].tolist()
+mismatches = sum(reference_lookup(prefixes, a) != asn
+                 for a, asn in zip(sample, asns[:20000].tolist()))
+print("[+] checked", len(sample), "lookups against longest-prefix match, mismatches:", mismatches)
+
+### 2. enrichment against the stub server.
+names = read_names(args.ns_file)
+rng = random.Random(1)
+a_records = {name: [int_to_ip(rng.getrandbits(32)) for _ in range(rng.randint(1, 3))]
+             for name in names if rng.random() < 0.8}
+registrars = load_registrars(args.registrars) if os.path.exists(args.registrars) else {}
+output_file = os.path.join(workdir, "enriched.jsonl")
+with StubDNSServer({}, delay=args.delay, a_records=a_records) as server:
+    # an interrupted run: the first half of the names, the last line torn.
+    with open(output_file, "w") as outputf:
+        enrich(names[:len(names) // 2], outputf, ["127.0.0.1"], as_table=table,
+               registrars=registrars, concurrency=args.concurrency, qps=0, port=server.port)
+    with open(output_file, "rb+") as f:
+        f.truncate(os.path.getsize(output_file) - 10)
+    done = read_enriched(output_file)
+    start = time.perf_counter()
+    with open(output_file, "a") as outputf:
+        stats = enrich(names, outputf, ["127.0.0.1"], as_table=table, registrars=registrars,
+                       concurrency=args.concurrency, qps=0, port=server.port, done=done)
+    elapsed = time.perf_counter() - start
+result = to_dict(output_file)
+bad = [name for name in names if name not in result
+       or sorted(result[name]["A"]) != sorted(a_records.get(name, []))
+       or result[name]["AS"] != [table.lookup_array(np.array([ip_to_int(ip)],
+                                                            dtype=np.uint32))[0] or None
+                                 for ip in result[name]["A"]]]
+print("[+] resumed with %d names done, %d enriched in %.2fs (%.0f names/sec), "
+      "%d names in output, %d with registrar, bad: %d" % (
+          len(done), stats["names"], elapsed, stats["names"] / elapsed, len(result),
+          sum(1 for r in result.values() if r["REGISTER"]), len(bad)))
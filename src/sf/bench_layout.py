@@ -0,0 +1,84 @@
+# benchmark of layout.py: accuracy of the approximated repulsion against the exact one, time of
+# a layout against nx.spring_layout, cache hits, and the global graphs of a list if given.
+# usage: python sf/bench_layout.py [other] [--sizes 1000,10000,100000] [--spring-max 5000]
+# Python 3
+
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import networkx as nx
+from layout import repulsion, layout, mode_layouts, LayoutCache, Renderer
+
+parser = argparse.ArgumentParser(description="benchmark of the cached graph layouts.")
+parser.add_argument("list", nargs="?", help="name of a domain list with global graphs")
+parser.add_argument("--sizes", default="1000,10000,100000", help="synthetic graph sizes")
+parser.add_argument("--spring-max", type=int, default=5000,
+                    help="largest size also laid out with nx.spring_layout")
+parser.add_argument("--iterations", type=int, default=50)
+args = parser.parse_args()
+
+
+# a dependency-like graph: zones pointing to a few popular providers (preferential attachment).
+def synthetic_graph(n, seed=0):
+    rng = np.random.default_rng(seed)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(n))
+    weight = np.ones(n)
+    for u in range(1, n):
+        p = weight[:u] / weight[:u].sum()
+        for v in set(rng.choice(u, size=min(u, 2), p=p).tolist()):
+            G.add_edge(u, v)
+            weight[v] += 1
+    return G
+
+
+### 1. repulsion accuracy.
+rng = np.random.default_rng(1)
+pos = np.concatenate([rng.normal(c, 0.03, (400, 2)) for c in rng.random((5, 2))])
+exact = repulsion(pos, 1 / len(pos), exact=True)
+approx = repulsion(pos, 1 / len(pos))
+err = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+print("[+] repulsion of %d nodes: median relative error %.4f, p99 %.4f" % (
+    len(pos), np.median(err), np.percentile(err, 99)))
+
+### 2. layouts.
+cache_dir = tempfile.mkdtemp()
+cache = LayoutCache(cache_dir)
+for n in [int(size) for size in args.sizes.split(",") if size]:
+    G = synthetic_graph(n)
+    start = time.perf_counter()
+    layout(G, cache, iterations=args.iterations)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    layout(G, cache, iterations=args.iterations)
+    cached = time.perf_counter() - start
+    line = "[+] %d nodes, %d edges: layout %.2fs, cached %.3fs" % (
+        n, G.number_of_edges(), elapsed, cached)
+    if n <= args.spring_max:
+        start = time.perf_counter()
+        try:
+            nx.spring_layout(G, iterations=args.iterations, seed=0)
+            line += ", nx.spring_layout %.2fs" % (time.perf_counter() - start)
+        except ImportError:
+            # the sparse spring_layout (over 500 nodes) needs scipy.
+            line += ", nx.spring_layout needs scipy"
+    print(line)
+
+### 3. global graphs of a list: one layout for all modes, rendered in the background.
+if args.list:
+    Global_graph_set = pickle.load(open("../data/" + args.list + ".graph_set_global.bin", "rb"))
+    start = time.perf_counter()
+    pos = mode_layouts(Global_graph_set, cache)
+    print("[+] %s: layout of all modes in %.2fs" % (args.list, time.perf_counter() - start))
+    start = time.perf_counter()
+    with Renderer(workers=2) as renderer:
+        for mode, G in Global_graph_set.items():
+            renderer.submit("%s/%s.%s.png" % (cache_dir, args.list, mode), G, pos[mode])
+        queued = time.perf_counter() - start
+    print("[+] %s: rendering queued in %.3fs, done in %.2fs" % (
+        args.list, queued, time.perf_counter() - start))
+print("[+] cache hits: %d, misses: %d" % (cache.hits, cache.misses))
+shutil.rmtree(cache_dir)
@@ -0,0 +1,160 @@
+# benchmark suite of the whole pipeline on synthetic topologies (synth_topology.py): for each size,
+# every stage runs as its own process in a scratch folder, and its wall time and peak RSS are
+# recorded.
+#   findns:  1_findns.py against the stub DNS server (stub_dns.py) serving the topology, offline.
+#            its output is checked against the offline crawl.
+#   build:   2_build_dependency.py on all domains, without pictures.
+#   analyze: 3_analyze_dependency.py.
+#   export:  4_draw_global.py.
+# every run is appended to a history (JSON lines, with the commit), and compared with the last run
+# of the same stage and size: slower or bigger by more than --threshold is reported as a regression.
+# usage: python sf/bench_pipeline.py [--sizes 10000,100000,1000000] [--stages build,analyze]
+#        [--history ../data/bench/pipeline.jsonl] [--threshold 0.2] [--fail-on-regression]
+# Python 3
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from stub_dns import StubDNSServer
+from synth_topology import generate, crawl_offline
+
+###### GLOBAL CONFIG ######
+stages = ["findns", "build", "analyze", "export"]
+
+parser = argparse.ArgumentParser(description="benchmark of the pipeline on synthetic topologies.")
+parser.add_argument("--sizes", default="10000,100000", help="comma-separated numbers of domains")
+parser.add_argument("--stages", default=",".join(stages), help="comma-separated stages")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--workers", type=int, default=1, help="--workers of 2_build_dependency.py")
+parser.add_argument("--history", default="../data/bench/pipeline.jsonl",
+                    help="JSON lines file the results are appended to")
+parser.add_argument("--threshold", type=float, default=0.2,
+                    help="relative increase of wall time or peak RSS reported as a regression")
+parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 on a regression")
+parser.add_argument("--keep", action="store_true", help="keep the scratch folders")
+args = parser.parse_args()
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+###### FUNC ######
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=script_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# run one script of the pipeline from cwd. returns (wall time, peak RSS in MB) of the process.
+def run_stage(script, stage_args, cwd, log):
+    env = dict(os.environ, MPLBACKEND="Agg")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(script_dir, script)] + stage_args,
+                               cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    # wait4 gives the resource usage of that child alone.
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError("%s exited with %d, see %s" % (script, process.returncode, log.name))
+    return wall, usage.ru_maxrss / 1024
+
+
+# the last recorded result of each (size, seed, stage).
+def read_history(path):
+    last = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                last[(record["size"], record["seed"], record["stage"])] = record
+    return last
+
+
+def run_size(size, selected, workdir, log):
+    name = "synth%d" % size
+    data_dir = os.path.join(workdir, "data")
+    src_dir = os.path.join(workdir, "src")
+    os.makedirs(data_dir)
+    os.makedirs(src_dir)
+    start = time.perf_counter()
+    zones, domains = generate(size, args.seed)
+    expected = io.StringIO()
+    crawled = crawl_offline(zones, domains, expected)
+    with open(os.path.join(data_dir, name + ".list"), "w") as f:
+        f.write("".join(domain + "\n" for domain in domains))
+    ns_file = os.path.join(data_dir, name + ".domain_ns_info.txt")
+    with open(ns_file, "w") as f:
+        f.write(expected.getvalue())
+    print("[+] %d domains, %d zones crawled, generated in %.1fs" % (
+        size, crawled, time.perf_counter() - start))
+
+    results = {}
+    if "findns" in selected:
+        with StubDNSServer(zones) as server:
+            results["findns"] = run_stage("1_findns.py", [
+                name, "--resolver", "127.0.0.1", "--port", str(server.port), "--qps", "0",
+                "--concurrency", "256", "--no-cache"], src_dir, log)
+        with open(ns_file) as f:
+            found = set(f)
+        missing = set(expected.getvalue().splitlines(True)) ^ found
+        if missing:
+            raise RuntimeError("1_findns.py output differs from the offline crawl on %d lines"
+                               % len(missing))
+        # the next stages always read the same file.
+        with open(ns_file, "w") as f:
+            f.write(expected.getvalue())
+    if "build" in selected:
+        results["build"] = run_stage("2_build_dependency.py", [
+            name, "--limit", "0", "--no-pictures", "--workers", str(args.workers)], src_dir, log)
+    if "analyze" in selected:
+        results["analyze"] = run_stage("3_analyze_dependency.py", [name], src_dir, log)
+    if "export" in selected:
+        results["export"] = run_stage("4_draw_global.py", [name], src_dir, log)
+    return results, crawled
+
+
+###### MAIN ######
+selected = [stage for stage in args.stages.split(",") if stage]
+commit = git_commit()
+last = read_history(args.history)
+os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+regressions = []
+for size in [int(s) for s in args.sizes.split(",") if s]:
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    with open(os.path.join(workdir, "log.txt"), "w") as log:
+        results, crawled = run_size(size, selected, workdir, log)
+    with open(args.history, "a") as history:
+        for stage in stages:
+            if stage not in results:
+                continue
+            wall, rss = results[stage]
+            record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "size": size,
+                      "seed": args.seed, "zones": crawled, "stage": stage,
+                      "wall": round(wall, 3), "peak_rss_mb": round(rss, 1)}
+            history.write(json.dumps(record) + "\n")
+            previous = last.get((size, args.seed, stage))
+            line = "\t%-8s %9.2f s %9.1f MB" % (stage, wall, rss)
+            if previous is not None:
+                line += "   (was %.2f s, %.1f MB at %s)" % (
+                    previous["wall"], previous["peak_rss_mb"], previous["commit"])
+                for key, value in (("wall", wall), ("peak_rss_mb", rss)):
+                    if value > previous[key] * (1 + args.threshold):
+                        regressions.append((size, stage, key, previous[key], value))
+                        line += "  REGRESSION " + key
+            print(line)
+    if args.keep:
+        print("[+] kept", workdir)
+    else:
+        shutil.rmtree(workdir)
+for size, stage, key, before, after in regressions:
+    print("[-] regression: %d domains, %s, %s %.2f -> %.2f" % (size, stage, key, before, after))
+print("[+] results appended to", args.history)
+exit(1 if regressions and args.fail_on_regression else 0)
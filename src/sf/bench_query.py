@@ -0,0 +1,144 @@
+# load test of the query service: a forked server (or a running one, --port) is hit by client
+# threads with a mix of /graph, /metrics, /dependents and /zone queries, twice (cold, then with the
+# result cache warm). prints the throughput and the p50/p99 latency of every endpoint, and checks
+# a sample of /dependents answers against the closures of the domains.
+# usage: python sf/bench_query.py other [--clients 8] [--requests 2000] [--port 0]
+# Python 3
+
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+import multiprocessing
+import numpy as np
+from zone_index import load_domain_ns
+from dep_graph import modes
+from query_index import QueryIndex
+from query_server import make_server
+
+parser = argparse.ArgumentParser(description="load test of the query service.")
+parser.add_argument("list", help="name of the domain list, e.g. other")
+parser.add_argument("--clients", type=int, default=8, help="concurrent client connections")
+parser.add_argument("--requests", type=int, default=2000, help="requests of each pass")
+parser.add_argument("--port", type=int, default=0, help="port of a running server (0: fork one)")
+parser.add_argument("--check", type=int, default=50, help="/dependents answers checked")
+args = parser.parse_args()
+
+ntype = args.list
+domain_file = "../data/"+ntype+".list"
+ns_file = "../data/"+ntype+".domain_ns_info.txt"
+bench_port = 8153
+
+
+# the queries of a pass: (endpoint, path).
+def make_queries(index, n, seed):
+    rng = random.Random(seed)
+    ns_hosts = list(index.ns_zones)
+    zones = list(index.domain_ns)
+    queries = []
+    for _ in range(n):
+        kind = rng.choice(["graph", "graph", "metrics", "dependents", "dependents", "zone"])
+        mode = rng.choice(modes)
+        if kind == "dependents":
+            name = rng.choice(ns_hosts) if rng.random() < 0.5 else rng.choice(zones)
+        else:
+            name = rng.choice(index.domains)
+        if kind == "zone" and rng.random() < 0.5:
+            name = "www." + name
+        queries.append((kind, "/%s?name=%s&mode=%s" % (kind, name, mode)))
+    return queries
+
+
+def run_pass(queries, port):
+    latencies = {}
+    lock = threading.Lock()
+    position = [0]
+    errors = [0]
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        while True:
+            with lock:
+                if position[0] >= len(queries):
+                    break
+                kind, path = queries[position[0]]
+                position[0] += 1
+            start = time.perf_counter()
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.setdefault(kind, []).append(elapsed)
+                if response.status != 200:
+                    errors[0] += 1
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start, errors[0]
+
+
+def report(label, latencies, elapsed, errors):
+    total = sum(len(v) for v in latencies.values())
+    print("[+] %s: %d requests in %.2fs (%.0f req/s), %d errors" % (
+        label, total, elapsed, total / elapsed, errors))
+    for kind, values in sorted(latencies.items()) + [("all", sum(latencies.values(), []))]:
+        ms = np.array(values) * 1000
+        print("\t%-11s n=%5d  p50 %7.2f ms  p99 %7.2f ms  max %7.2f ms" % (
+            kind, len(ms), np.percentile(ms, 50), np.percentile(ms, 99), ms.max()))
+
+
+domain_list = []
+with open(domain_file) as f:
+    for line in f:
+        domain_list.append(line.strip().lower().split("\t")[0])
+start = time.perf_counter()
+index = QueryIndex(load_domain_ns(ns_file), domains=domain_list)
+print("[+] index of %d zones, %d NS hosts built in %.2fs" % (
+    len(index.dep), len(index.ns_zones), time.perf_counter() - start))
+
+server = None
+port = args.port
+if not port:
+    port = bench_port
+    server = multiprocessing.get_context("fork").Process(
+        target=lambda: make_server(index, port=port).serve_forever(), daemon=True)
+    server.start()
+    for _ in range(100):
+        try:
+            http.client.HTTPConnection("127.0.0.1", port, timeout=1).connect()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+queries = make_queries(index, args.requests, seed=0)
+report("cold", *run_pass(queries, port))
+report("warm", *run_pass(queries, port))
+report("mixed (half new)", *run_pass(queries[:args.requests // 2]
+                                     + make_queries(index, args.requests // 2, seed=1), port))
+
+# /dependents against the closures of the domains.
+rng = random.Random(2)
+conn = http.client.HTTPConnection("127.0.0.1", port)
+mismatches = 0
+for _ in range(args.check):
+    zone = rng.choice(list(index.domain_ns))
+    mode = rng.choice(modes)
+    conn.request("GET", "/dependents?name=%s&mode=%s&limit=%d" % (zone, mode, len(domain_list)))
+    answer = json.loads(conn.getresponse().read())
+    # a zone that is also an NS host is depended upon by the zones listing it too.
+    starts = {index.dep.ids[z] for z in index.ns_zones.get(zone, []) + [zone]}
+    expected = [d for d in index.domains if starts & index.caches[mode].reach(d)]
+    mismatches += answer["top"] != expected
+print("[+] checked %d /dependents answers, mismatches: %d" % (args.check, mismatches))
+conn.request("GET", "/stats")
+print("[+] server stats:", conn.getresponse().read().decode())
+if server is not None:
+    server.terminate()
@@ -0,0 +1,76 @@
+# benchmark of reach_count.py against nx.transitive_closure: time and accuracy of the closure
+# in-degree of every zone, exact and approximate (HyperLogLog), for every mode of the global graphs.
+# INPUT:
+#   ../data/<list>.graph_set.dgf (output of 2_build_dependency.py, memory-mapped; or else
+#   ../data/<list>.graph_set_global.bin). networkx gets the networkx graph.
+#   or random graphs (with cycles) of --synthetic zones
+# usage: python bench_reach_count.py edu gov other [--synthetic 2000] [--precision 12] [--no-networkx]
+# Python 3
+
+import time
+import argparse
+import numpy as np
+import networkx as nx
+from dep_graph import modes
+from reach_count import closure_in_degree, top_depended, default_precision
+from graph_file import load_global_graphs, as_networkx
+
+###### GLOBAL CONFIG ######
+parser = argparse.ArgumentParser(description="benchmark the closure in-degree of global graphs.")
+parser.add_argument("lists", nargs="*", help="names of the domain lists, e.g. edu gov other")
+parser.add_argument("--synthetic", type=int, action="append", default=[],
+                    help="also bench a random graph of this many zones (repeatable)")
+parser.add_argument("--precision", type=int, default=default_precision,
+                    help="HyperLogLog precision (2^p registers)")
+parser.add_argument("--top", type=int, default=50, help="size of the compared top lists")
+parser.add_argument("--no-networkx", action="store_true",
+                    help="skip nx.transitive_closure (for graphs too big for it)")
+args = parser.parse_args()
+
+
+###### FUNC ######
+def timed(f, *a, **kw):
+    start = time.perf_counter()
+    result = f(*a, **kw)
+    return result, time.perf_counter() - start
+
+
+# compare both engines (and networkx) on one graph. returns False on a mismatch.
+def bench(name, mode, G):
+    ok = True
+    (nodes, exact), t_exact = timed(closure_in_degree, G)
+    (_, approx), t_approx = timed(closure_in_degree, G, exact=False, precision=args.precision)
+    line = "%-6s %-9s nodes %7d edges %8d | exact %.3fs | hll %.3fs" % (
+        name, mode, G.number_of_nodes(), G.number_of_edges(), t_exact, t_approx)
+    truth = exact
+    if not args.no_networkx:
+        C, t_nx = timed(nx.transitive_closure, as_networkx(G))
+        truth = np.array([C.in_degree(node) for node in nodes])
+        if not np.array_equal(truth, exact):
+            ok = False
+            line += " | EXACT MISMATCH"
+        top = [item for item in sorted(((node, C.in_degree(node)) for node in C.nodes()),
+                                       key=lambda x: x[1], reverse=True)
+               if "." in item[0]][:args.top]
+        if top != top_depended(G, args.top):
+            ok = False
+            line += " | TOP MISMATCH"
+        line += " | networkx %.3fs (x%.1f)" % (t_nx, t_nx / max(t_exact, 1e-9))
+    error = np.abs(approx - truth) / np.maximum(truth, 1)
+    line += " | hll rel. error mean %.4f max %.4f" % (error.mean(), error.max())
+    print(line)
+    return ok
+
+
+###### MAIN ######
+failed = False
+for ntype in args.lists:
+    Global_graph_set = load_global_graphs("../data/", ntype)
+    for mode in modes:
+        failed |= not bench(ntype, mode, Global_graph_set[mode])
+for n in args.synthetic:
+    G = nx.relabel_nodes(nx.gnm_random_graph(n, n * 3 // 4, directed=True, seed=n),
+                         lambda i: "z%d.example" % i)
+    failed |= not bench("random", str(n), G)
+if failed:
+    raise SystemExit(1)
@@ -0,0 +1,100 @@
+# check and time of the incremental update (snapshot_diff.py): a snapshot of a list is perturbed
+# (NS removed, added, replaced, zones dropped or given NS), the build of the old snapshot is
+# updated in place and compared with a full build of the new one (metrics and global graphs).
+# usage: python sf/bench_update.py edu gov other [--change 0.03] [--seed 0]
+# Python 3
+
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from zone_index import load_domain_ns
+from dep_graph import DepGraph, GlobalGraph, modes
+from dep_build import build_all
+from result_store import MetricsWriter, read_metrics, metric_columns
+from snapshot_diff import update
+
+parser = argparse.ArgumentParser(description="check of the incremental snapshot update.")
+parser.add_argument("lists", nargs="+", help="names of domain lists")
+parser.add_argument("--change", type=float, default=0.03, help="fraction of zones changed")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+
+# a copy of domain_ns with about fraction of its zones changed.
+def perturb(domain_ns, fraction, rng):
+    new_ns = {zone: dict(ns) for zone, ns in domain_ns.items()}
+    zones = list(domain_ns)
+    hosts = sorted({ns for entry in domain_ns.values() for ns in entry})
+    for zone in rng.sample(zones, max(1, int(len(zones) * fraction))):
+        action = rng.choice(["drop_ns", "add_ns", "replace", "remove_zone"])
+        if action == "drop_ns" and len(new_ns[zone]) > 1:
+            del new_ns[zone][rng.choice(list(new_ns[zone]))]
+        elif action == "add_ns":
+            new_ns[zone][rng.choice(hosts)] = None
+        elif action == "replace":
+            new_ns[zone] = dict(domain_ns[rng.choice(zones)])
+        else:
+            del new_ns[zone]
+    # a zone that had no NS record gets some (e.g. a parent of an NS host).
+    for host in rng.sample(hosts, 3):
+        parent = host[host.find(".") + 1:]
+        if parent not in new_ns:
+            new_ns[parent] = {rng.choice(hosts): None}
+            break
+    return new_ns
+
+
+# what 2_build_dependency.py writes: the metrics store, and the global graphs returned.
+def full_build(domain_ns, domains, metrics_dir):
+    dep = DepGraph(domain_ns, roots=domains)
+    raw, zones, _ = build_all(dep, domains)
+    writer = MetricsWriter(metrics_dir)
+    for rank, domain in enumerate(domains):
+        writer.add(rank, domain, raw[domain])
+    writer.close()
+    Global_graph_set = {}
+    for mode in modes:
+        global_edges = GlobalGraph(dep, mode)
+        global_edges.add(zones[mode])
+        Global_graph_set[mode] = global_edges.to_networkx()
+    return Global_graph_set
+
+
+def sorted_metrics(metrics_dir):
+    metrics = read_metrics(metrics_dir)
+    order = np.lexsort((metrics["mode"], metrics["rank"]))
+    return {column: metrics[column][order] for column in metric_columns}
+
+
+failed = 0
+rng = random.Random(args.seed)
+for ntype in args.lists:
+    workdir = tempfile.mkdtemp()
+    domains = []
+    with open("../data/"+ntype+".list") as f:
+        for line in f:
+            domains.append(line.strip().lower().split("\t")[0])
+    old_ns = load_domain_ns("../data/"+ntype+".domain_ns_info.txt")
+    new_ns = perturb(old_ns, args.change, rng)
+    Global_graph_set = full_build(old_ns, domains, workdir + "/updated")
+    start = time.perf_counter()
+    changelog, stats = update(old_ns, new_ns, domains, workdir + "/updated", Global_graph_set)
+    incremental = time.perf_counter() - start
+    start = time.perf_counter()
+    reference = full_build(new_ns, domains, workdir + "/full")
+    full = time.perf_counter() - start
+    updated, expected = sorted_metrics(workdir + "/updated"), sorted_metrics(workdir + "/full")
+    bad_metrics = sum(int((updated[c] != expected[c]).sum()) for c in metric_columns)
+    bad_graphs = [mode for mode in modes
+                  if set(Global_graph_set[mode].nodes()) != set(reference[mode].nodes())
+                  or set(Global_graph_set[mode].edges()) != set(reference[mode].edges())]
+    failed += bad_metrics + len(bad_graphs)
+    print("[+] %s: %d zones changed, %d/%d domains rebuilt, %d changed; update %.3fs, full build "
+          "%.3fs; metric mismatches: %d, global graphs differing: %s" % (
+              ntype, stats["zones_changed"], stats["domains_rebuilt"], len(domains),
+              stats["domains_changed"], incremental, full, bad_metrics, bad_graphs or "none"))
+    shutil.rmtree(workdir)
+exit(1 if failed else 0)
@@ -0,0 +1,99 @@
+# micro-benchmark of loading (domain, ns) data and expanding zones: the old list-based code
+# vs the zone_index module, on a synthetic domain_ns_info.txt.
+# usage: python bench_zone_index.py [--lines 1000000] [--expand 20000]
+# Python 3
+
+import os
+import time
+import random
+import argparse
+import tempfile
+import zone_index
+
+parser = argparse.ArgumentParser(description="micro-benchmark of zone_index.")
+parser.add_argument("--lines", type=int, default=1000000, help="lines of the synthetic file")
+parser.add_argument("--expand", type=int, default=20000,
+                    help="names for the expansion benchmark (the old code is quadratic)")
+args = parser.parse_args()
+
+
+# synthetic domain_ns_info.txt: domains with 2-6 NS from shared providers, some dead ends,
+# and (like real crawls) repeated records.
+def write_synthetic(path, n_lines):
+    rng = random.Random(0)
+    providers = ["dns%d.provider%d.net." % (i % 4, i) for i in range(5000)]
+    with open(path, "w") as outputf:
+        written = 0
+        i = 0
+        while written < n_lines:
+            domain = "site%d.%s" % (i, rng.choice(["com", "net", "org", "edu.cn", "gov.cn"]))
+            if rng.random() < 0.2:
+                outputf.write(domain + "\t~NO~NS~\n")
+                written += 1
+            else:
+                for ns in rng.sample(providers, rng.randint(2, 6)) * rng.choice([1, 1, 2]):
+                    outputf.write(domain + "\t" + ns + "\n")
+                    written += 1
+            i += 1
+
+
+# the loader of 2_build_dependency.py before zone_index.
+def legacy_load(ns_file):
+    domain_ns = {}
+    inputf = open(ns_file)
+    for line in inputf:
+        line = line.strip()
+        try:
+            domain, ns = line.split("\t")
+        except:
+            continue
+        ns = ns.rstrip(".")
+        if ns != "~NO~NS~":
+            if domain not in domain_ns:
+                domain_ns[domain] = []
+            if ns not in domain_ns[domain]:
+                domain_ns[domain].append(ns)
+    inputf.close()
+    return domain_ns
+
+
+# the zone expansion of iterate_query_ns() in 1_findns.py before zone_index.
+# (its membership test compares "a.com." against "a.com", so duplicates were only dropped
+# later by query_ns().)
+def legacy_expand(domain_list):
+    domain_list_expanded = []
+    for domain in domain_list:
+        domain_tmp = domain + "."
+        while domain_tmp.find(".") >= 0:
+            if domain_tmp not in domain_list_expanded:
+                domain_list_expanded.append(domain_tmp.rstrip("."))
+            domain_tmp = domain_tmp[domain_tmp.find(".") + 1:]
+    return domain_list_expanded
+
+
+fd, path = tempfile.mkstemp(suffix=".domain_ns_info.txt")
+os.close(fd)
+try:
+    write_synthetic(path, args.lines)
+
+    start = time.time()
+    old = legacy_load(path)
+    t_old = time.time() - start
+    start = time.time()
+    new = zone_index.load_domain_ns(path)
+    t_new = time.time() - start
+    same = len(old) == len(new) and all(old[d] == list(new[d]) for d in old)
+    print("[+] load %d lines: list-based %.2f s, zone_index %.2f s (same result: %s)"
+          % (args.lines, t_old, t_new, same))
+
+    names = [ns for d in list(new)[:args.expand] for ns in new[d]][:args.expand]
+    start = time.time()
+    old = legacy_expand(names)
+    t_old = time.time() - start
+    start = time.time()
+    new = zone_index.expand_zones(names)
+    t_new = time.time() - start
+    print("[+] expand %d names: list-based %.2f s, zone_index %.3f s (same result: %s)"
+          % (len(names), t_old, t_new, list(dict.fromkeys(old)) == new))
+finally:
+    os.remove(path)
@@ -0,0 +1,271 @@
+# "what if zones X, Y are blocked": which zones of a global graph lose resolution.
+# a zone resolves while it still has a dependency path to root that avoids every blocked zone
+# (as the reverse DFS from root, before and after removing the zone, of 5_relation_deal.ipynb).
+# the global graph (u -> v: u depends on v) is indexed once:
+#   - the dominator tree of its reverse, rooted at root: the zones lost when ONE zone is blocked
+#     are exactly its subtree, a contiguous slice of the tree preorder.
+#   - the reverse adjacency: for a set of blocked zones, only the zones depending on one of them
+#     can be lost, so only that region is searched again.
+# the blast radius (zones lost) of every single zone is the subtree sizes, all in O(n).
+# batches of multi-zone scenarios run over a pool of forked processes; BlockState blocks zones
+# one at a time, reusing the lost zones of the scenario so far (see resilience.py).
+# Python 3
+
+import os
+import numpy as np
+from dep_graph import root
+from reach_count import graph_to_csr
+
+###### GLOBAL CONFIG ######
+# index of the worker processes, set in the parent before the pool is forked (see dep_build.py).
+_index = None
+
+
+###### FUNC ######
+# ids of the zones lost by blocking the zones of block (ids), when the zones marked in dead are
+# already lost. only the zones depending on a blocked zone can be lost (root resolves unless it is
+# blocked itself); among them, a zone survives if it depends on a zone that still resolves.
+def _newly_lost(index, dead, block):
+    block = [b for b in block if not dead[b]]
+    if not block:
+        return []
+    pred, succ = index._pred, index._succ
+    candidate = set(block)
+    stack = list(block)
+    while stack:
+        for u in pred[stack.pop()]:
+            if u not in candidate and not dead[u] and u != index.root:
+                candidate.add(u)
+                stack.append(u)
+    blocked = set(block)
+    survived = set()
+    stack = []
+    for u in candidate:
+        if u not in blocked and any(not dead[p] and p not in candidate for p in succ[u]):
+            survived.add(u)
+            stack.append(u)
+    while stack:
+        for u in pred[stack.pop()]:
+            if u in candidate and u not in survived and u not in blocked:
+                survived.add(u)
+                stack.append(u)
+    return list(candidate - survived)
+
+
+class BlockIndex:
+    # G: a global graph (networkx). domains: the zones to count as domains in the reports
+    # (e.g. the domain list); all zones by default.
+    def __init__(self, G, domains=None):
+        self.names, indptr, indices, _ = graph_to_csr(G)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+        # G successors of u (the zones u depends on) = predecessors of u in the reverse graph.
+        self._succ = [indices[indptr[u]:indptr[u + 1]].tolist() for u in range(n)]
+        src = np.repeat(np.arange(n), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        rindptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=n), out=rindptr[1:])
+        rindices = src[order]
+        # G predecessors of v (the zones depending on v).
+        self._pred = [rindices[rindptr[v]:rindptr[v + 1]].tolist() for v in range(n)]
+        self.is_domain = np.ones(n, dtype=bool)
+        if domains is not None:
+            self.is_domain[:] = False
+            for domain in domains:
+                if domain in self.ids:
+                    self.is_domain[self.ids[domain]] = True
+        self.root = self.ids.get(root, -1)
+        self._dominators()
+
+    def __len__(self):
+        return len(self.names)
+
+    # dominator tree of the reverse graph from root (Cooper, Harvey & Kennedy, iterative).
+    # sets idom, the preorder of the tree and the [tin, tout) slice of every subtree.
+    def _dominators(self):
+        n = len(self.names)
+        self.alive = np.zeros(n, dtype=bool)
+        self._alive = [False] * n
+        self._dead = [True] * n
+        self.idom = np.full(n, -1, dtype=np.int64)
+        self.preorder = np.zeros(0, dtype=np.int64)
+        self.tin = np.zeros(n, dtype=np.int64)
+        self.tout = np.zeros(n, dtype=np.int64)
+        if self.root < 0:
+            return
+        # reverse postorder of the zones depending on root (iterative DFS).
+        post = []
+        seen = [False] * n
+        seen[self.root] = True
+        work = [(self.root, iter(self._pred[self.root]))]
+        while work:
+            v, it = work[-1]
+            for u in it:
+                if not seen[u]:
+                    seen[u] = True
+                    work.append((u, iter(self._pred[u])))
+                    break
+            else:
+                work.pop()
+                post.append(v)
+        rpo = post[::-1]
+        number = [-1] * n
+        for i, v in enumerate(post):
+            number[v] = i
+        idom = [-1] * n
+        idom[self.root] = self.root
+        changed = True
+        while changed:
+            changed = False
+            for u in rpo[1:]:
+                new = -1
+                for p in self._succ[u]:
+                    if idom[p] < 0:
+                        continue
+                    if new < 0:
+                        new = p
+                        continue
+                    # intersect the two dominator chains.
+                    a, b = p, new
+                    while a != b:
+                        while number[a] < number[b]:
+                            a = idom[a]
+                        while number[b] < number[a]:
+                            b = idom[b]
+                    new = a
+                if idom[u] != new:
+                    idom[u] = new
+                    changed = True
+        self.alive[rpo] = True
+        self._alive = self.alive.tolist()
+        self._dead = [not alive for alive in self._alive]
+        self.idom[rpo] = [idom[u] for u in rpo]
+        self.idom[self.root] = -1
+        # preorder of the dominator tree: the subtree of u is preorder[tin[u]:tout[u]].
+        children = [[] for _ in range(n)]
+        for u in rpo[1:]:
+            children[idom[u]].append(u)
+        preorder = []
+        stack = [self.root]
+        while stack:
+            v = stack.pop()
+            self.tin[v] = len(preorder)
+            preorder.append(v)
+            stack.extend(reversed(children[v]))
+        self.preorder = np.array(preorder, dtype=np.int64)
+        # subtree sizes, children before parents (reverse preorder).
+        size = np.ones(n, dtype=np.int64)
+        weight = self.is_domain.astype(np.int64)
+        for v in reversed(preorder[1:]):
+            size[idom[v]] += size[v]
+            weight[idom[v]] += weight[v]
+        self.tout = self.tin + size
+        self.subtree_size = np.where(self.alive, size, 0)
+        self.subtree_domains = np.where(self.alive, weight, 0)
+
+    def _zone_ids(self, zones):
+        unknown = [zone for zone in zones if zone not in self.ids]
+        if unknown:
+            raise KeyError("zones not in the graph: " + ", ".join(unknown))
+        return sorted(set(self.ids[zone] for zone in zones))
+
+    # ids of the zones that lose resolution when all the zones of blocked (ids) are down,
+    # the blocked zones included (if they resolved).
+    def lost_ids(self, blocked):
+        blocked = [b for b in blocked if self._alive[b]]
+        if not blocked:
+            return np.zeros(0, dtype=np.int64)
+        if len(blocked) == 1:
+            b = blocked[0]
+            return self.preorder[self.tin[b]:self.tout[b]]
+        return np.array(sorted(_newly_lost(self, self._dead, blocked)), dtype=np.int64)
+
+    # names of the zones that lose resolution when zones are blocked.
+    def lost(self, zones):
+        return [self.names[i] for i in self.lost_ids(self._zone_ids(zones))]
+
+    # (zones, domains) lost when zones are blocked.
+    def blast_radius(self, zones):
+        lost = self.lost_ids(self._zone_ids(zones))
+        return len(lost), int(self.is_domain[lost].sum())
+
+    # every zone by blast radius of blocking it alone: [(zone, zones lost, domains lost), ...],
+    # most domains lost first.
+    def rank(self, top=None):
+        order = np.lexsort((-self.subtree_size, -self.subtree_domains))
+        order = order[self.alive[order]]
+        if top is not None:
+            order = order[:top]
+        return [(self.names[i], int(self.subtree_size[i]), int(self.subtree_domains[i]))
+                for i in order]
+
+    # an empty scenario, to block zones one at a time (see BlockState).
+    def state(self):
+        return BlockState(self)
+
+
+# the lost zones of a growing scenario, kept incrementally: blocking one more zone only searches
+# the zones depending on it that still resolve, and can be undone (for sweeps over many
+# scenarios sharing a prefix).
+class BlockState:
+    def __init__(self, index):
+        self.index = index
+        self.dead = list(index._dead)
+        self.lost = 0
+        self.lost_domains = 0
+        self._is_domain = index.is_domain.tolist()
+
+    # (zones, domains) that blocking block would add, without blocking it.
+    def gain(self, block):
+        newly = _newly_lost(self.index, self.dead, block)
+        return len(newly), sum(self._is_domain[u] for u in newly)
+
+    # block the zones of block. returns the undo record of undo().
+    def add(self, block):
+        newly = _newly_lost(self.index, self.dead, block)
+        for u in newly:
+            self.dead[u] = True
+        self.lost += len(newly)
+        self.lost_domains += sum(self._is_domain[u] for u in newly)
+        return newly
+
+    def undo(self, newly):
+        for u in newly:
+            self.dead[u] = False
+        self.lost -= len(newly)
+        self.lost_domains -= sum(self._is_domain[u] for u in newly)
+
+
+def _blast(scenario):
+    return _index.blast_radius(scenario)
+
+
+# blast radius of many scenarios (lists of zones), over workers processes.
+# returns [(zones lost, domains lost), ...] in the order of scenarios.
+def batch_blast_radius(index, scenarios, workers=None):
+    global _index
+    _index = index
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(scenarios) < 2:
+        return [_blast(scenario) for scenario in scenarios]
+    import multiprocessing
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        return pool.map(_blast, scenarios, chunksize=max(1, len(scenarios) // (workers * 16)))
+
+
+# the global graph with the lost zones (and their edges) colored red, the others green,
+# in the node-link format of the *.graph_set_global.block.*.json files: as the notebook writes
+# them, without the self-loops (wipecycle) and with the indegree counted without them. metadata:
+# extra keys of each node, first in the node (as set by addmetadata).
+def block_json(G, lost, metadata=None):
+    lost = set(lost)
+    nodes = []
+    for node in G.nodes():
+        node_dict = dict(metadata.get(node, {})) if metadata else {}
+        node_dict["color"] = "red" if node in lost else "green"
+        node_dict["indegree"] = G.in_degree(node) - G.has_edge(node, node)
+        node_dict["id"] = node
+        nodes.append(node_dict)
+    links = [{"color": "red" if u in lost or v in lost else "green", "source": u, "target": v}
+             for u, v in G.edges() if u != v]
+    return {"nodes": nodes, "links": links}
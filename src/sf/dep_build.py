@@ -0,0 +1,164 @@
+# build the dependency graphs and metrics of a list of domains (used by 2_build_dependency.py),
+# on one core or sharded over a pool of processes.
+# the results of a domain are kept as zone-id edge arrays plus metrics:
+#   raw[domain][mode] = {"nodes", "edges": int32 array (k, 2),
+#                        "extrasize", "avgextradepth", "maxextradepth"}
+# and turned into networkx graphs by materialize(), in the parent, so that a sharded run gives
+# exactly the same output as a single-process one.
+# Python 3
+
+import os
+import pickle
+import numpy as np
+from dep_graph import ClosureCache, modes
+
+###### GLOBAL CONFIG ######
+shards_per_worker = 4       # more shards than workers, to balance the load.
+
+# state of the worker processes. set in the parent before the pool is forked, so that the
+# (read-only) compiled graph is shared copy-on-write and never pickled.
+_dep = None
+_caches = None
+
+
+###### FUNC ######
+# the graphs and metrics of one domain. returns (G_set, reaches), reaches[mode] = zone ids.
+def build_domain(dep, caches, domain):
+    G_set = {}
+    reaches = {}
+    # build graph for essential first, as the metrics of all graphs depend on it.
+    for mode in modes:
+        reach = caches[mode].reach(domain)
+        reaches[mode] = reach
+        G_set[mode] = {}
+        G_set[mode]["nodes"] = len(reach)
+        if mode == "essential":
+            G_set[mode]["edges"] = _edge_array(dep.closure_edges(domain, reach, mode))
+            continue
+
+        # calc metrics.
+        # Zn = V(G) - V(G_essential)
+        Zn = reach - reaches["essential"]
+        # the value does not make sense when Zn is empty.
+        if len(Zn) == 0:
+            G_set[mode]["edges"] = _edge_array(dep.closure_edges(domain, reach, mode))
+            G_set[mode]["extrasize"] = 0
+            G_set[mode]["avgextradepth"] = 0
+            G_set[mode]["maxextradepth"] = 0
+            continue
+        # get the distance between domain and each node in Zn, from one BFS of the closure.
+        edges, depth = dep.bfs_closure(domain, mode)
+        G_set[mode]["edges"] = _edge_array(edges)
+        # 1. ExtraSize(G) = |Zn|
+        G_set[mode]["extrasize"] = len(Zn)
+        # 2. AvgExtraDepth & MaxExtraDepth
+        depths = [depth[zi] for zi in Zn]
+        G_set[mode]["avgextradepth"] = sum(depths) / float(len(Zn))
+        G_set[mode]["maxextradepth"] = max(depths)
+    return G_set, reaches
+
+
+def _edge_array(edges):
+    return np.array(edges, dtype=np.int32).reshape(-1, 2)
+
+
+def new_caches(dep, cache_size):
+    return {mode: ClosureCache(dep, mode, max_size=cache_size) for mode in modes}
+
+
+def _cache_stats(caches):
+    return {mode: dict(caches[mode].stats) for mode in modes}
+
+
+# build one shard of domains. with shard_dir, the result is written to a shard file and its
+# path returned; otherwise the result itself is returned.
+#   result = {"raw": {domain: G_set}, "zones": {mode: set of zone ids}, "stats": {mode: {...}}}
+def build_shard(job):
+    index, domains, shard_dir = job
+    before = _cache_stats(_caches)
+    raw = {}
+    zones = {mode: set() for mode in modes}
+    for domain in domains:
+        raw[domain], reaches = build_domain(_dep, _caches, domain)
+        for mode in modes:
+            zones[mode] |= reaches[mode]
+    after = _cache_stats(_caches)
+    stats = {mode: {k: after[mode][k] - before[mode][k] for k in after[mode]} for mode in modes}
+    result = {"raw": raw, "zones": zones, "stats": stats}
+    if shard_dir is None:
+        return result
+    path = os.path.join(shard_dir, "part-%05d.bin" % index)
+    with open(path, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+# merge shard results, in shard order, into (raw, zones, stats).
+def merge_shards(results):
+    raw = {}
+    zones = {mode: set() for mode in modes}
+    stats = {}
+    for result in results:
+        if isinstance(result, str):
+            with open(result, "rb") as f:
+                path, result = result, pickle.load(f)
+            os.remove(path)
+        raw.update(result["raw"])
+        for mode in modes:
+            zones[mode] |= result["zones"][mode]
+            for k, v in result["stats"][mode].items():
+                stats.setdefault(mode, {}).setdefault(k, 0)
+                stats[mode][k] += v
+    return raw, zones, stats
+
+
+# build all domains, yielding the result of every shard (raw, zones, stats) in order, so that the
+# caller can stream them out. domain_list is cut into contiguous shards of at most shard_size
+# domains. with workers > 1, a pool of forked processes builds them into shard files under
+# shard_dir, which are read back (and removed) in order.
+def iter_build(dep, domain_list, workers=1, shard_dir=None, cache_size=20000000,
+               shard_size=10000):
+    global _dep, _caches
+    _dep = dep
+    _caches = new_caches(dep, cache_size)
+    n_shards = max(1, workers * shards_per_worker, -(-len(domain_list) // shard_size))
+    size = max(1, -(-len(domain_list) // n_shards))
+    jobs = [(i, domain_list[start:start + size], shard_dir if workers > 1 else None)
+            for i, start in enumerate(range(0, len(domain_list), size))]
+    if workers <= 1:
+        for job in jobs:
+            yield merge_shards([build_shard(job)])
+        return
+
+    import multiprocessing
+    os.makedirs(shard_dir, exist_ok=True)
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        for job, path in zip(jobs, pool.imap(build_shard, jobs, chunksize=1)):
+            raw, zones, stats = merge_shards([path])
+            # keyed by the domain strings of the parent, as in a single-process run: the names
+            # unpickled from the shard are other objects, and would be pickled differently in
+            # Graph_set (pickle memoizes by object).
+            yield {domain: raw[domain] for domain in job[1]}, zones, stats
+    try:
+        os.rmdir(shard_dir)
+    except OSError:
+        pass
+
+
+# build all domains at once: (raw, zones, stats) of the whole list.
+def build_all(dep, domain_list, workers=1, shard_dir=None, cache_size=20000000):
+    return merge_shards(
+        {"raw": raw, "zones": zones, "stats": stats} for raw, zones, stats in
+        iter_build(dep, domain_list, workers=workers, shard_dir=shard_dir, cache_size=cache_size))
+
+
+# the networkx graphs of one domain from its raw result, in the format of Graph_set.
+def materialize(dep, domain, raw_set):
+    G_set = {}
+    for mode in modes:
+        G_set[mode] = {}
+        G_set[mode]["graph"] = dep.to_networkx(domain, raw_set[mode]["edges"].tolist())
+        for k in ("extrasize", "avgextradepth", "maxextradepth"):
+            if k in raw_set[mode]:
+                G_set[mode][k] = raw_set[mode][k]
+    return G_set
@@ -0,0 +1,333 @@
+# compact, precompiled dependency graph of zones (used by 2_build_dependency.py).
+# zones are interned to int32 ids; the NS-parent edges of each zone are kept in CSR arrays
+# (ns_indptr, ns_indices) with a glue flag per edge, and the direct parent of each zone in an
+# array. the glue flags, and from them the NS edges of every mode, are computed once with NumPy.
+# the glue flags are guessed from the names (has_glue_vec), or taken from the referrals recorded
+# by the iterative crawl (<list>.glue.txt, see zone_index.load_glue) for the zones in it.
+# the closure of a domain (ClosureCache, bfs_closure) is then walked on plain integer lists, and
+# turned into a networkx graph only when asked for.
+# Python 3
+
+import numpy as np
+from zone_index import parent_of
+
+###### GLOBAL CONFIG ######
+modes = ["essential", "general", "explicit", "critical"]
+root = "."
+
+
+###### FUNC ######
+# records: src NS ns, for all edges at once. src_names/ns_parent_names: arrays of str (for
+# example.com NS ns2.example.net: example.com and example.net).
+# determining if there is a glue of ns in the parent of src: always for a TLD (the parent is
+# root, everything is under root), else only if the parent of ns is under the parent of src
+# (otherwise it is out-of-bailiwick, no glue).
+def has_glue_vec(src_names, ns_parent_names):
+    src_names = np.asarray(src_names, dtype=str)
+    is_tld = np.char.find(src_names, ".") < 0
+    src_parent = np.array([parent_of(name) for name in src_names], dtype=str)
+    under = np.char.endswith(np.asarray(ns_parent_names, dtype=str), np.char.add(".", src_parent))
+    return is_tld | under
+
+
+class DepGraph:
+    # domain_ns[domain] = {ns1, ns2, ...} (see zone_index.py).
+    # roots: extra names (e.g. the domain list) that may be asked for without NS records.
+    # glue (optional): glue[zone] = {ns host: [addresses]} seen in the referral of the zone
+    # (lowercased names).
+    def __init__(self, domain_ns, roots=(), glue=None):
+        self.names = []
+        self.ids = {}
+        self._intern(root)
+
+        # 1. intern zones, their NS parents and all their parent chains.
+        src, dst = [], []
+        # glue of each edge from the referrals: 1 if any NS of the edge has glue, 0 if none,
+        # -1 if the zone was not in glue (guessed below).
+        real_glue = []
+        for domain in domain_ns:
+            u = self._intern_chain(domain)
+            zone_glue = glue.get(domain.lower()) if glue is not None else None
+            seen = {}
+            for ns in domain_ns[domain]:
+                # only take the parent of each NS. (an edge that appears twice is kept once.)
+                v = self._intern_chain(ns[ns.find(".") + 1:])
+                if v not in seen:
+                    seen[v] = len(src)
+                    src.append(u)
+                    dst.append(v)
+                    real_glue.append(-1 if zone_glue is None else 0)
+                if zone_glue and zone_glue.get(ns.lower()):
+                    real_glue[seen[v]] = 1
+        for name in roots:
+            self._intern_chain(name)
+        n = len(self.names)
+
+        # 2. direct parents. -1 for root.
+        self.parent = np.full(n, -1, dtype=np.int32)
+        for i in range(1, n):
+            self.parent[i] = self.ids[parent_of(self.names[i])]
+
+        # 3. NS edges in CSR. edges are already grouped by source, in the order of domain_ns.
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        self.ns_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.ns_indptr[1:])
+        order = np.argsort(src, kind="stable")
+        self.ns_indices = dst[order]
+        self.ns_src = src[order]
+        names = np.array(self.names, dtype=object)
+        if len(self.ns_indices):
+            self.ns_glue = has_glue_vec(names[self.ns_src], names[self.ns_indices])
+            real_glue = np.asarray(real_glue, dtype=np.int8)[order]
+            known = real_glue >= 0
+            self.ns_glue[known] = real_glue[known] == 1
+        else:
+            self.ns_glue = np.zeros(0, dtype=bool)
+
+        # 4. NS edges of every mode.
+        #   [General] everything. [Explicit] only edges without glue.
+        #   [Critical] all edges of a zone if EVERY NS is without glue. [Essential] nothing.
+        no_glue_zone = np.bincount(self.ns_src[self.ns_glue], minlength=n) == 0
+        self.mode_edge_mask = {
+            "essential": np.zeros(len(self.ns_indices), dtype=bool),
+            "general": np.ones(len(self.ns_indices), dtype=bool),
+            "explicit": ~self.ns_glue,
+            "critical": no_glue_zone[self.ns_src],
+        }
+        self._adj = {}
+        for mode in modes:
+            mask = self.mode_edge_mask[mode]
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.ns_src[mask], minlength=n), out=indptr[1:])
+            indices = self.ns_indices[mask]
+            # the parent edge of a zone is the same edge as one of its NS edges in this mode.
+            parent_dup = np.zeros(n, dtype=bool)
+            parent_dup[self.ns_src[mask][indices == self.parent[self.ns_src[mask]]]] = True
+            # plain lists: indexing them is much faster than numpy scalars in the walk.
+            self._adj[mode] = (indptr.tolist(), indices.tolist(), parent_dup.tolist())
+        self._parent = self.parent.tolist()
+        self._csr = {}
+
+    def _intern(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    # intern a name and all its parents, returns the id of the name.
+    def _intern_chain(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self._intern(name)
+            if name != root:
+                self._intern_chain(parent_of(name))
+        return i
+
+    def __len__(self):
+        return len(self.names)
+
+    # the zones a zone depends on directly in one mode: its NS parents and its direct parent.
+    def successors(self, u, mode):
+        indptr, indices, parent_dup = self._adj[mode]
+        succ = indices[indptr[u]:indptr[u + 1]]
+        p = self._parent[u]
+        if p >= 0 and not parent_dup[u]:
+            succ = succ + [p]
+        return succ
+
+    # all edges of a closure, given its zones (ids, e.g. ClosureCache.reach()): every zone in
+    # it keeps all its edges of the mode. the domain comes first, then the zones in id order.
+    def closure_edges(self, domain, reach, mode):
+        start = self.ids[domain]
+        edges = []
+        for u in [start] + sorted(reach - {start}):
+            edges.extend((u, v) for v in self.successors(u, mode))
+        return edges
+
+    # the closure of a domain walked breadth-first: returns (edges, depth), where edges are all the
+    # edges of the closure (in BFS order) and depth[zone] the distance from the domain to the zone,
+    # recorded as the zone is discovered (i.e. the shortest path length).
+    def bfs_closure(self, domain, mode):
+        successors = self.successors
+        start = self.ids[domain]
+        depth = {start: 0}
+        edges = []
+        frontier = [start]
+        d = 0
+        while frontier:
+            d += 1
+            next_frontier = []
+            for u in frontier:
+                # root does not need searching.
+                if u == 0:
+                    continue
+                for v in successors(u, mode):
+                    edges.append((u, v))
+                    if v not in depth:
+                        depth[v] = d
+                        next_frontier.append(v)
+            frontier = next_frontier
+        return edges, depth
+
+    # all the edges of a mode (NS parents and direct parents) as NumPy CSR: (indptr, indices).
+    # reverse: the edges pointing to each zone instead.
+    def csr(self, mode, reverse=False):
+        key = (mode, reverse)
+        if key not in self._csr:
+            n = len(self.names)
+            indptr, indices, parent_dup = self._adj[mode]
+            src = np.repeat(np.arange(n), np.diff(np.asarray(indptr, dtype=np.int64)))
+            dst = np.asarray(indices, dtype=np.int64)
+            with_parent = (self.parent >= 0) & ~np.asarray(parent_dup, dtype=bool)
+            src = np.concatenate([src, np.flatnonzero(with_parent)])
+            dst = np.concatenate([dst, self.parent[with_parent].astype(np.int64)])
+            if reverse:
+                src, dst = dst, src
+            order = np.argsort(src, kind="stable")
+            csr_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=n), out=csr_indptr[1:])
+            self._csr[key] = (csr_indptr, dst[order])
+        return self._csr[key]
+
+    # mask of the zones reachable from the zone ids starts (starts included), breadth-first over
+    # whole frontiers. reverse: the zones depending on starts instead.
+    def reach_mask(self, starts, mode, reverse=False):
+        indptr, indices = self.csr(mode, reverse)
+        seen = np.zeros(len(self.names), dtype=bool)
+        frontier = np.unique(np.asarray(starts, dtype=np.int64))
+        seen[frontier] = True
+        while len(frontier):
+            counts = indptr[frontier + 1] - indptr[frontier]
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            nxt = indices[np.repeat(indptr[frontier], counts) + offset]
+            nxt = np.unique(nxt[~seen[nxt]])
+            seen[nxt] = True
+            frontier = nxt
+        return seen
+
+    # the networkx graph of a closure.
+    def to_networkx(self, domain, edges):
+        import networkx as nx
+        names = self.names
+        G = nx.DiGraph()
+        G.add_node(domain)
+        G.add_edges_from((names[u], names[v]) for u, v in edges)
+        return G
+
+
+# memoized closures of zones in one mode, shared by all domains.
+# reach(zone) is the set of zone ids the zone depends on (itself included). it is computed
+# bottom-up over the strongly connected components (NS records do form cycles) found by an
+# iterative Tarjan walk: every zone of a component gets the same closure, i.e. the component
+# plus the closures of the components it points to. zones already in the cache are not walked
+# again. the cache is an LRU bounded by the total size of the cached closures.
+class ClosureCache:
+    def __init__(self, dep, mode, max_size=20000000):
+        from collections import OrderedDict
+        self.dep = dep
+        self.mode = mode
+        self.max_size = max_size
+        self.size = 0
+        self.cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "zones_walked": 0}
+
+    def _store(self, zone, reach):
+        self.cache[zone] = reach
+        self.size += len(reach)
+        while self.size > self.max_size and len(self.cache) > 1:
+            old_zone, old_reach = self.cache.popitem(last=False)
+            self.size -= len(old_reach)
+            self.stats["evictions"] += 1
+
+    def reach(self, zone):
+        if isinstance(zone, str):
+            zone = self.dep.ids[zone]
+        r = self.cache.get(zone)
+        if r is not None:
+            self.stats["hits"] += 1
+            self.cache.move_to_end(zone)
+            return r
+        self.stats["misses"] += 1
+
+        successors = self.dep.successors
+        mode = self.mode
+        # closures known in this walk (the cache may evict them while we walk).
+        known = {}
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        index[zone] = low[zone] = 0
+        stack.append(zone)
+        on_stack.add(zone)
+        work = [(zone, iter(successors(zone, mode)))]
+        while work:
+            v, it = work[-1]
+            descended = False
+            for w in it:
+                if w in known:
+                    continue
+                if w not in index:
+                    r = self.cache.get(w)
+                    if r is not None:
+                        # a cached zone is a leaf of the walk.
+                        self.stats["hits"] += 1
+                        known[w] = r
+                        continue
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(successors(w, mode))))
+                    descended = True
+                    break
+                elif w in on_stack:
+                    low[v] = min(low[v], index[w])
+            if descended:
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == index[v]:
+                # v is the root of a component: pop it and build its closure.
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                r = set(component)
+                for u in component:
+                    for w in successors(u, mode):
+                        if w not in r:
+                            r |= known[w]
+                r = frozenset(r)
+                self.stats["zones_walked"] += len(component)
+                for u in component:
+                    known[u] = r
+                    self._store(u, r)
+        return known[zone]
+
+
+# the global graph of one mode: the union of the closures of all domains. as every zone of a
+# closure keeps all its edges, only the zones are collected; the edges are made at the end.
+class GlobalGraph:
+    def __init__(self, dep, mode):
+        self.dep = dep
+        self.mode = mode
+        self.zones = set()
+
+    def add(self, reach):
+        self.zones |= reach
+
+    def to_networkx(self):
+        import networkx as nx
+        names = self.dep.names
+        G = nx.DiGraph()
+        for u in sorted(self.zones):
+            for v in self.dep.successors(u, self.mode):
+                G.add_edge(names[u], names[v])
+        return G
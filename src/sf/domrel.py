@@ -0,0 +1,248 @@
+# the pipeline as one command line (the stages are in pipeline.py):
+#   python sf/domrel.py crawl edu [--resolver 223.5.5.5] [--qps 20]    (as 1_findns.py)
+#   python sf/domrel.py crawl edu --iterative                          (from the root servers)
+#   python sf/domrel.py build edu [--limit 0] [--workers 4]            (as 2_build_dependency.py)
+#   python sf/domrel.py analyze edu [--rank-mode critical]             (as 3_analyze_dependency.py)
+#   python sf/domrel.py export edu [--mode general]                    (as 4_draw_global.py)
+#   python sf/domrel.py providers edu [--tile-size 500]                (as 9_provider_graph.py)
+#   python sf/domrel.py run edu [--stages crawl,build,analyze,export,providers]
+#     several stages in one process: the NS records, the global graphs and the metrics are handed
+#     from one stage to the next in memory (the files are still written).
+# the files of the lists are in --data-dir (default ../data/), as for the other numbered scripts
+# (1_enrich.py, 5_block_impact.py...: add_data_dir_argument). a stage imports its heavy modules
+# (dnspython, networkx, matplotlib...) only when it runs, and the plots use the Agg backend
+# unless --show is given.
+# Python 3
+
+import sys
+import argparse
+from instrument import stats, add_profile_argument, Profiler
+from pipeline import crawl, build, analyze, export, providers, default_data_dir, \
+    default_resolvers, default_tld_list
+
+###### GLOBAL CONFIG ######
+stages = ["crawl", "build", "analyze", "export", "providers"]
+# stages of run without --stages.
+default_stages = ["crawl", "build", "analyze", "export"]
+# name of the stage in the --profile outputs (<list>.<name>.profile.txt).
+profile_names = {"crawl": "findns", "build": "build", "analyze": "analyze", "export": "export",
+                 "providers": "providers", "run": "run"}
+
+
+###### FUNC ######
+# a folder argument, with the trailing / the paths are built with.
+def dir_path(path):
+    return path if path.endswith("/") else path + "/"
+
+
+# the --data-dir option, of every command and of the numbered scripts that are no command.
+def add_data_dir_argument(parser):
+    parser.add_argument("--data-dir", type=dir_path, default=default_data_dir,
+                        help="folder of the files of the lists (default %(default)s)")
+
+
+def add_crawl_arguments(parser):
+    from ns_cache import default_ttl, default_negative_ttl
+    parser.add_argument("--concurrency", type=int, default=64, help="max in-flight queries")
+    parser.add_argument("--qps", type=float, default=20,
+                        help="max queries per second to EACH resolver (0 for unlimited)")
+    parser.add_argument("--resolver", action="append",
+                        help="resolver to use (repeatable, default: %s)" % " ".join(default_resolvers))
+    parser.add_argument("--port", type=int, default=53, help="port of the resolvers")
+    parser.add_argument("--timeout", type=float, default=2.0, help="timeout of one query")
+    parser.add_argument("--retries", type=int, default=2, help="retries on timeout")
+    parser.add_argument("--resume", action="store_true",
+                        help="append to the output, skipping zones already resolved in it")
+    parser.add_argument("--cache", help="on-disk NS cache (default <data-dir>/ns_cache.sqlite)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the NS cache")
+    parser.add_argument("--cache-ttl", type=float, default=default_ttl,
+                        help="seconds an NS answer stays in the cache")
+    parser.add_argument("--negative-ttl", type=float, default=default_negative_ttl,
+                        help="seconds a ~NO~NS~ answer stays in the cache")
+    parser.add_argument("--iterative", action="store_true",
+                        help="walk the delegations from the root servers (no resolver, no NS "
+                             "cache), and write the glue to <list>.glue.txt")
+    parser.add_argument("--root", action="append",
+                        help="root server address for --iterative (repeatable, default: the 13)")
+    parser.add_argument("--edns-payload", type=int, default=1232,
+                        help="EDNS UDP size of --iterative (0: no EDNS)")
+
+
+def add_build_arguments(parser):
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes building the graphs (shards of the domain list)")
+    parser.add_argument("--graph-store", action="store_true",
+                        help="also write the per-domain graphs to <list>.graphs/")
+    parser.add_argument("--domain-graphs", action="store_true",
+                        help="also write the per-domain graphs to <list>.graph_set.dgf")
+    parser.add_argument("--pickle", action="store_true",
+                        help="also write the per-domain networkx graphs to graph_set_per_domain.bin")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="processes drawing the pictures in the background (0: in this process)")
+    parser.add_argument("--limit", type=int, default=200,
+                        help="build only the first domains of the list (0: all of them)")
+    parser.add_argument("--no-pictures", action="store_true",
+                        help="do not lay out or draw any picture")
+
+
+def add_analyze_arguments(parser):
+    from dep_graph import modes
+    parser.add_argument("--magnitude", type=int, default=10000,
+                        help="concentrate this many domains (by rank) in one dot")
+    parser.add_argument("--tld", default=",".join(default_tld_list),
+                        help="comma-separated TLDs to compare")
+    parser.add_argument("--top", type=int, default=50, help="most depended zones to print")
+    parser.add_argument("--rank-mode", default="critical", choices=modes,
+                        help="global graph of the most depended zones")
+    parser.add_argument("--approx", action="store_true",
+                        help="approximate the indegree of the most depended zones (HyperLogLog)")
+    parser.add_argument("--show", action="store_true", help="also show the plots")
+
+
+# prefix: of the options, as --top is also an option of analyze in the run command.
+def add_export_arguments(parser, prefix=""):
+    from dep_graph import modes
+    parser.add_argument("--" + prefix + "mode", default=",".join(modes),
+                        help="comma-separated modes")
+    # the entire graph is tooooo big. only draw nodes that have over this indegree (or outdegree).
+    parser.add_argument("--" + prefix + "degree-limit", type=int, default=2,
+                        help="only draw nodes with an in or out degree over this")
+    parser.add_argument("--" + prefix + "top", type=int, default=0,
+                        help="at most this many nodes, the most depended upon (0: all)")
+
+
+# prefix: as for export, --mode is also an option of export in the run command.
+def add_providers_arguments(parser, prefix=""):
+    from dep_graph import modes
+    from provider_graph import default_tile_size
+    parser.add_argument("--" + prefix + "mode", default=",".join(modes),
+                        help="comma-separated modes")
+    parser.add_argument("--" + prefix + "tile-size", type=int, default=default_tile_size,
+                        help="zones (or domains) in one tile")
+
+
+# the stages, from parsed arguments. data is what the previous stage handed over.
+def run_crawl(args, data):
+    data["domain_ns"] = crawl(
+        args.list, args.data_dir, resolvers=args.resolver, concurrency=args.concurrency,
+        qps=args.qps, port=args.port, timeout=args.timeout, retries=args.retries,
+        resume=args.resume, cache_file=args.cache, use_cache=not args.no_cache,
+        cache_ttl=args.cache_ttl, negative_ttl=args.negative_ttl, iterative=args.iterative,
+        roots=args.root, edns_payload=args.edns_payload)
+
+
+def run_build(args, data, keep_metrics=False):
+    data.update(build(
+        args.list, args.data_dir, domain_ns=data.get("domain_ns"), limit=args.limit,
+        workers=args.workers, graph_store=args.graph_store, pickle_graphs=args.pickle,
+        pictures=not args.no_pictures, render_workers=args.render_workers,
+        keep_metrics=keep_metrics, domain_graphs=args.domain_graphs))
+
+
+def run_analyze(args, data):
+    data["analysis"] = analyze(
+        args.list, args.data_dir, Global_graph_set=data.get("Global_graph_set"),
+        metrics=data.get("metrics"), magnitude=args.magnitude,
+        tld_list=[tld for tld in args.tld.split(",") if tld], top=args.top,
+        rank_mode=args.rank_mode, approx=args.approx, show=args.show)
+
+
+def run_export(args, data, prefix=""):
+    option = lambda name: getattr(args, prefix + name)
+    export(args.list, args.data_dir, Global_graph_set=data.get("Global_graph_set"),
+           export_modes=[mode for mode in option("mode").split(",") if mode],
+           degree_limit=option("degree_limit"), top=option("top"))
+
+
+def run_providers(args, data, prefix=""):
+    option = lambda name: getattr(args, prefix + name)
+    data["providers"] = providers(
+        args.list, args.data_dir, Global_graph_set=data.get("Global_graph_set"),
+        domain_ns=data.get("domain_ns"),
+        provider_modes=[mode for mode in option("mode").split(",") if mode],
+        tile_size=option("tile_size"))
+
+
+def run_stages(args):
+    selected = [stage for stage in args.stages.split(",") if stage]
+    unknown = [stage for stage in selected if stage not in stages]
+    if unknown:
+        sys.exit("[-] unknown stages: " + ",".join(unknown))
+    data = {}
+    for stage in stages:
+        if stage not in selected:
+            continue
+        print("[+] ===== %s =====" % stage)
+        if stage == "crawl":
+            run_crawl(args, data)
+        elif stage == "build":
+            # the metrics are only kept in memory for a following analyze.
+            run_build(args, data, keep_metrics="analyze" in selected)
+        elif stage == "analyze":
+            run_analyze(args, data)
+        elif stage == "export":
+            run_export(args, data, prefix="export_")
+        else:
+            run_providers(args, data, prefix="providers_")
+    return data
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="domrel", description="domain dependency pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    helps = {"crawl": "find the NS of a list and of everything they depend on",
+             "build": "build the dependency graph and metrics of each domain",
+             "analyze": "output metrics of dependency analysis",
+             "export": "output the drawing js of the global graphs",
+             "providers": "collapse the global graphs into providers, output them as tiles",
+             "run": "several stages in one process, the results passed in memory"}
+    for command in stages + ["run"]:
+        sub = commands.add_parser(command, help=helps[command])
+        sub.add_argument("list", help="name of the domain list, i.e., <data-dir>/<list>.list")
+        add_data_dir_argument(sub)
+        add_profile_argument(sub)
+        if command == "run":
+            sub.add_argument("--stages", default=",".join(default_stages),
+                             help="comma-separated stages, run in pipeline order")
+        if command in ("crawl", "run"):
+            add_crawl_arguments(sub.add_argument_group("crawl") if command == "run" else sub)
+        if command in ("build", "run"):
+            add_build_arguments(sub.add_argument_group("build") if command == "run" else sub)
+        if command in ("analyze", "run"):
+            add_analyze_arguments(sub.add_argument_group("analyze") if command == "run" else sub)
+        if command == "export":
+            add_export_arguments(sub)
+        elif command == "run":
+            add_export_arguments(sub.add_argument_group("export"), prefix="export-")
+        if command == "providers":
+            add_providers_arguments(sub)
+        elif command == "run":
+            add_providers_arguments(sub.add_argument_group("providers"), prefix="providers-")
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    profiler = Profiler(args.profile, args.data_dir + args.list + "." + profile_names[args.command])
+    data = {}
+    if args.command == "crawl":
+        run_crawl(args, data)
+    elif args.command == "build":
+        run_build(args, data)
+    elif args.command == "analyze":
+        run_analyze(args, data)
+    elif args.command == "export":
+        run_export(args, data)
+    elif args.command == "providers":
+        run_providers(args, data)
+    else:
+        data = run_stages(args)
+    if stats.timers:
+        print(stats.summary())
+    profiler.stop()
+    return data
+
+
+###### MAIN ######
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# asyncio enrichment of zones and NS hosts with their A records, the AS of each address and the
+# registrar of their zone (used by 1_enrich.py).
+# a queue of names is drained by a bounded pool of workers, every A query sent to one of the
+# resolvers in turn (ns_crawler.QueryPool, rate-limited as the NS queries). AS numbers come from
+# a local prefix table (as_table.py), registrars from ns_registrar.csv. every name is written out
+# as soon as it is resolved, one JSON object per line:
+#   {"name": "dns.sjtu.edu.cn", "A": ["202.120.2.90"], "AS": [4538], "REGISTER": null}
+# Python 3
+
+import os
+import json
+import asyncio
+import dns.rdatatype
+from ns_crawler import QueryPool
+from zone_index import parent_chain, null_ns
+
+###### FUNC ######
+# the names to enrich from a domain_ns_info.txt file: every zone and every NS host, in order.
+def read_names(ns_file):
+    names = {}
+    with open(ns_file) as f:
+        for line in f:
+            try:
+                zone, ns = line.strip().split("\t")
+            except ValueError:
+                continue
+            names[zone.rstrip(".").lower()] = None
+            if ns != null_ns:
+                names[ns.rstrip(".").lower()] = None
+    return list(names)
+
+
+# registrars[zone] = registrar, from ns_registrar.csv ("Registrar, count,zone,zone,...").
+def load_registrars(registrar_file):
+    registrars = {}
+    with open(registrar_file) as f:
+        for line in f:
+            fields = line.strip().split(",")
+            if len(fields) < 3:
+                continue
+            for zone in fields[2:]:
+                zone = zone.strip().lower()
+                if zone:
+                    registrars[zone] = fields[0].strip()
+    return registrars
+
+
+# the registrar of a name: the one of its closest enclosing zone in the table.
+def registrar_of(name, registrars):
+    for zone in parent_chain(name):
+        if zone in registrars:
+            return registrars[zone]
+    return None
+
+
+# the A records of names, handed to on_result(name, ips) (ips: [] if none). a name no resolver
+# answered is not (see ns_crawler.QueryPool): a resumed run asks again.
+class AResolver(QueryPool):
+    def __init__(self, resolvers, on_result, concurrency=64, qps=20, port=53,
+                 timeout=2.0, retries=2, cache=None):
+        super().__init__(resolvers, dns.rdatatype.A, self.resolve_name, concurrency=concurrency,
+                         qps=qps, port=port, timeout=timeout, retries=retries, cache=cache)
+        self.on_result = on_result
+        self.stats.update({"no_a": 0, "names": 0})
+
+    async def resolve_name(self, name):
+        ips = await self.lookup(name)
+        if ips is None:
+            return
+        self.stats["names"] += 1
+        if not ips:
+            self.stats["no_a"] += 1
+        self.on_result(name, ips)
+
+
+# the names already written by a previous (maybe interrupted) run. the torn last line is cut off
+# the file, so that new results can be appended safely.
+def read_enriched(output_file):
+    done = set()
+    try:
+        f = open(output_file, "rb+")
+    except FileNotFoundError:
+        return done
+    with f:
+        data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+        f.seek(len(data))
+        f.truncate()
+    for line in data.decode().splitlines():
+        try:
+            done.add(json.loads(line)["name"])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+
+# enrich names (skipping those of done) and write them to outputf. returns the counters.
+# as_table: an as_table.ASTable (None: no AS), registrars: see load_registrars().
+def enrich(names, outputf, resolvers, as_table=None, registrars=None, concurrency=64, qps=20,
+           port=53, timeout=2.0, retries=2, progress=None, cache=None, done=None):
+    registrars = registrars or {}
+
+    def on_result(name, ips):
+        record = {"name": name, "A": ips,
+                  "AS": as_table.lookup(ips) if as_table is not None else [None] * len(ips),
+                  "REGISTER": registrar_of(name, registrars)}
+        outputf.write(json.dumps(record) + "\n")
+        if progress is not None:
+            progress.update(1)
+
+    resolver = AResolver(resolvers, on_result, concurrency=concurrency, qps=qps, port=port,
+                         timeout=timeout, retries=retries, cache=cache)
+    names = [name for name in names if not done or name not in done]
+    try:
+        return asyncio.run(resolver.run(names))
+    finally:
+        outputf.flush()
+        if cache is not None:
+            cache.commit()
+
+
+# the JSON Lines output as the dict of domains_a_as_register.json:
+#   {name: {"A": [...], "AS": [...], "REGISTER": ...}}
+def to_dict(jsonl_file):
+    result = {}
+    with open(jsonl_file) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            result[record["name"]] = {"A": record["A"], "AS": record["AS"],
+                                      "REGISTER": record["REGISTER"]}
+    return result
+
+
+# merge the JSON Lines output of a list into domains_a_as_register.json, which holds the names of
+# all the lists (and hand-curated ones): the names of the list are replaced, the others kept. the
+# file is replaced at once (written to json_file.tmp first). returns (names merged, names in all).
+def merge_json(json_file, jsonl_file):
+    result = {}
+    if os.path.exists(json_file):
+        with open(json_file) as f:
+            result = json.load(f)
+    records = to_dict(jsonl_file)
+    result.update(records)
+    with open(json_file + ".tmp", "w") as f:
+        f.write(json.dumps(result, indent=4))
+    os.replace(json_file + ".tmp", json_file)
+    return len(records), len(result)
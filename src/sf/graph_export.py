@@ -0,0 +1,67 @@
+# export of a global graph to the json of the viewer (used by 4_draw_global.py):
+#   webkitDep={"nodes": [{"name": "example.com", "id": "0", "value": 1}, ...],
+#              "links": [{"source": "0", "target": "1", "value": 1}, ...]}
+# the graph is read once into integer edge arrays: the degrees of all nodes are two bincounts,
+# the kept nodes a mask, the kept links a lookup of their ends. nodes and links are then written
+# out in chunks with json.dumps (names are properly escaped), never as one big dict.
+# Python 3
+
+import json
+import numpy as np
+
+###### GLOBAL CONFIG ######
+chunk_size = 65536      # nodes / links encoded per write.
+
+
+###### FUNC ######
+# integer edges of a networkx graph, self-loops included. returns (nodes, src, dst).
+def edge_arrays(G):
+    if hasattr(G, "edge_arrays"):
+        # a graph_file.GraphView: the arrays are in the file.
+        return G.edge_arrays()
+    nodes = list(G.nodes())
+    ids = {node: i for i, node in enumerate(nodes)}
+    m = G.number_of_edges()
+    src = np.fromiter((ids[u] for u, v in G.edges()), dtype=np.int64, count=m)
+    dst = np.fromiter((ids[v] for u, v in G.edges()), dtype=np.int64, count=m)
+    return nodes, src, dst
+
+
+# (in_degree, out_degree) of every node, as networkx counts them (a self-loop in both).
+def degrees(n, src, dst):
+    return np.bincount(dst, minlength=n), np.bincount(src, minlength=n)
+
+
+# the nodes drawn: in or out degree over degree_limit, at most top of them (the most depended
+# upon first, 0: all). returns their indexes, in the order of the graph.
+def select_nodes(in_degree, out_degree, degree_limit=2, top=0):
+    keep = np.flatnonzero((in_degree > degree_limit) | (out_degree > degree_limit))
+    if top and len(keep) > top:
+        order = np.lexsort((-out_degree[keep], -in_degree[keep]))
+        keep = np.sort(keep[order[:top]])
+    return keep
+
+
+# write the viewer js of the kept nodes and the links between them. returns (nodes, links).
+def write_webkitdep(outputf, nodes, src, dst, keep):
+    node_id = np.full(len(nodes), -1, dtype=np.int64)
+    node_id[keep] = np.arange(len(keep))
+    link = (node_id[src] >= 0) & (node_id[dst] >= 0)
+    sources = node_id[src[link]].tolist()
+    targets = node_id[dst[link]].tolist()
+    outputf.write('webkitDep={"nodes": [')
+    kept = keep.tolist()
+    for first in range(0, len(kept), chunk_size):
+        if first:
+            outputf.write(", ")
+        outputf.write(", ".join(json.dumps({"name": nodes[i], "id": str(first + j), "value": 1})
+                                for j, i in enumerate(kept[first:first + chunk_size])))
+    outputf.write('], "links": [')
+    for first in range(0, len(sources), chunk_size):
+        if first:
+            outputf.write(", ")
+        outputf.write(", ".join('{"source": "%d", "target": "%d", "value": 1}' % (s, t)
+                                for s, t in zip(sources[first:first + chunk_size],
+                                                targets[first:first + chunk_size])))
+    outputf.write("]}")
+    return len(keep), len(sources)
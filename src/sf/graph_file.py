@@ -0,0 +1,537 @@
+# memory-mapped binary file of the dependency graphs of a list, <list>.graph_set.dgf, instead of
+# the pickled networkx graphs (graph_set_global.bin, graph_set_per_domain.bin): a tool opens it
+# at once (only the footer is read) and the arrays are np.memmap views, so only the pages it
+# touches are read from the disk.
+# layout (little endian, every section aligned on 64 bytes):
+#   magic (8 bytes) | sections ... | footer (JSON) | footer offset (uint64) | magic
+#   the footer gives the format version, the modes, and the offset, dtype and shape of each section:
+#   - string table of the zone names:  names.offsets (int64, n + 1), names.data (uint8, UTF-8),
+#     names.order (int32, the ids sorted by name, for lookups by binary search)
+#   - global graph of each mode, in the node and edge order of the networkx graph:
+#     global.<mode>.nodes (int32 zone ids), global.<mode>.indptr (int64), global.<mode>.indices
+#     (int32, node indexes): the successors of node i are indices[indptr[i]:indptr[i + 1]]
+#   - per-domain graphs (optional): domains.ids (int32 zone id of each domain, in rank order),
+#     domains.row (int32, the row of each zone id, -1 if not a domain), and per (domain, mode)
+#     (row * len(modes) + mode index):
+#       the edges, deduplicated: most domains of a list share their providers, so their graphs
+#       only differ by the edges from or to the domain itself. these are kept per graph, with
+#       their positions in the edge list: domains.prefix_offsets into domains.prefix_pos (int32)
+#       and domains.prefix_edges (int32 (p, 2)). the other edges (the closure shared with the
+#       domains of the same providers) are stored once per content (hash of the zone id array):
+#       domains.body (int32) is the index of it in bodies.offsets / bodies.edges (int32 (m, 2)).
+#       the edge list of a graph is expanded on access.
+#       the nodes: the domain, then the ends of the edges in order. the graphs converted from a
+#       pickle with another node order have it in domains.nodelist (-1: none), an index in
+#       nodelists.offsets / nodelists.nodes (int32, the domain as -1), deduplicated the same way.
+#       the metrics: domains.extrasize, domains.avgextradepth, domains.maxextradepth.
+#     (version 1: the plain edge lists, domains.offsets / domains.edges, and all node lists.)
+# usage: python graph_file.py convert edu    (../data/edu.graph_set_global.bin and
+#                                              graph_set_per_domain.bin -> ../data/edu.graph_set.dgf)
+#        python graph_file.py info edu
+# Python 3
+
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+from collections.abc import Mapping
+from dep_graph import modes
+
+###### GLOBAL CONFIG ######
+magic = b"DRGRAPH\x00"
+file_version = 2
+# the versions the reader understands.
+read_versions = (1, 2)
+alignment = 64
+metric_names = ["extrasize", "avgextradepth", "maxextradepth"]
+metric_dtypes = {"extrasize": np.int32, "avgextradepth": np.float64, "maxextradepth": np.int32}
+
+
+###### FUNC ######
+# the graph file of a list.
+def graph_file_path(data_dir, ntype):
+    return data_dir + ntype + ".graph_set.dgf"
+
+
+class GraphFileWriter:
+    # names: the names of the zone ids of the per-domain edges added with add() (DepGraph.names).
+    # without it, names are numbered as they come (add_graphs(), set_global()).
+    # the per-domain edges are streamed to the file; everything else is written by close(). the
+    # file is written to path.tmp and renamed by close(); as a context manager, path.tmp is removed
+    # on an exception instead.
+    def __init__(self, path, names=None):
+        self.path = path
+        self.names = list(names) if names is not None else []
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.sections = {}
+        self.global_set = {}
+        self.domain_ids = []
+        self.metrics = {name: [] for name in metric_names}
+        self.metric_modes = None
+        # bodies[hash] = index of the body, graph_body[graph] = index of its body.
+        self.bodies = {}
+        self.body_offsets = [0]
+        self.graph_body = []
+        self.prefix_pos = []
+        self.prefix_edges = []
+        self.prefix_offsets = [0]
+        self.nodelists = {}
+        self.nodelist_offsets = [0]
+        self.nodes = []
+        self.graph_nodelist = []
+        self.f = open(path + ".tmp", "wb")
+        self.f.write(magic)
+        self._align()
+        self.bodies_offset = self.f.tell()
+        # edges of all graphs, expanded.
+        self.edge_count = 0
+
+    def _align(self):
+        self.f.write(b"\x00" * (-self.f.tell() % alignment))
+
+    def _section(self, name, array):
+        self._align()
+        array = np.ascontiguousarray(array)
+        self.sections[name] = {"offset": self.f.tell(), "dtype": array.dtype.str,
+                               "shape": list(array.shape)}
+        self.f.write(array.tobytes())
+
+    def _id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    # nodes: the nodes in graph order, None for the domain then the ends of the edges in order.
+    def _add_edges(self, domain_id, edges, nodes=None):
+        edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        self.edge_count += len(edges)
+        own = (edges[:, 0] == domain_id) | (edges[:, 1] == domain_id)
+        body = edges[~own]
+        key = hashlib.blake2b(body.tobytes(), digest_size=16).digest()
+        body_id = self.bodies.get(key)
+        if body_id is None:
+            # the bodies are streamed to the file as they come.
+            body_id = self.bodies[key] = len(self.body_offsets) - 1
+            self.f.write(body.tobytes())
+            self.body_offsets.append(self.body_offsets[-1] + len(body))
+        self.graph_body.append(body_id)
+        pos = np.flatnonzero(own).astype(np.int32)
+        self.prefix_pos.append(pos)
+        self.prefix_edges.append(edges[own])
+        self.prefix_offsets.append(self.prefix_offsets[-1] + len(pos))
+        nodelist_id = -1
+        if nodes is not None and not np.array_equal(nodes, _derived_nodes(domain_id, edges)):
+            nodes = np.where(np.asarray(nodes) == domain_id, -1, nodes).astype(np.int32)
+            key = hashlib.blake2b(nodes.tobytes(), digest_size=16).digest()
+            nodelist_id = self.nodelists.get(key)
+            if nodelist_id is None:
+                nodelist_id = self.nodelists[key] = len(self.nodes)
+                self.nodes.append(nodes)
+                self.nodelist_offsets.append(self.nodelist_offsets[-1] + len(nodes))
+        self.graph_nodelist.append(nodelist_id)
+
+    def _add_metrics(self, domain, metric_set):
+        if self.metric_modes is None:
+            self.metric_modes = [mode for mode in modes if "extrasize" in metric_set[mode]]
+        self.domain_ids.append(self._id(domain))
+        for name in metric_names:
+            self.metrics[name].append([metric_set[mode].get(name, 0) for mode in modes])
+        return self.domain_ids[-1]
+
+    # the graphs of one domain from its raw result (dep_build.build_domain()), edges as zone ids.
+    def add(self, domain, raw_set):
+        domain_id = self._add_metrics(domain, raw_set)
+        for mode in modes:
+            self._add_edges(domain_id, raw_set[mode]["edges"])
+
+    # the graphs of one domain from its Graph_set entry ({mode: {"graph": G, "extrasize"...}}).
+    def add_graphs(self, domain, G_set):
+        domain_id = self._add_metrics(domain, G_set)
+        for mode in modes:
+            G = G_set[mode]["graph"]
+            self._add_edges(domain_id, [(self._id(u), self._id(v)) for u, v in G.edges()],
+                            [self._id(node) for node in G.nodes()])
+
+    # the global graphs: Global_graph_set = {mode: networkx graph}.
+    def set_global(self, Global_graph_set):
+        from graph_export import edge_arrays
+        for mode in modes:
+            nodes, src, dst = edge_arrays(Global_graph_set[mode])
+            # G.edges() is grouped by source, in the node order.
+            indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+            self.global_set[mode] = (np.array([self._id(node) for node in nodes], dtype=np.int32),
+                                     indptr, dst.astype(np.int32))
+
+    # the deduplication of the per-domain graphs so far.
+    def dedup_stats(self):
+        return _dedup_stats(len(self.graph_body), len(self.bodies), self.edge_count,
+                            self.body_offsets[-1], self.prefix_offsets[-1])
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.sections["bodies.edges"] = {"offset": self.bodies_offset, "dtype": "<i4",
+                                         "shape": [self.body_offsets[-1], 2]}
+        self._section("bodies.offsets", np.array(self.body_offsets, dtype=np.int64))
+        for mode, (nodes, indptr, indices) in self.global_set.items():
+            self._section("global." + mode + ".nodes", nodes)
+            self._section("global." + mode + ".indptr", indptr)
+            self._section("global." + mode + ".indices", indices)
+        domain_ids = np.array(self.domain_ids, dtype=np.int32)
+        self._section("domains.ids", domain_ids)
+        row = np.full(len(self.names), -1, dtype=np.int32)
+        row[domain_ids] = np.arange(len(domain_ids), dtype=np.int32)
+        self._section("domains.row", row)
+        self._section("domains.body", np.array(self.graph_body, dtype=np.int32))
+        self._section("domains.prefix_offsets", np.array(self.prefix_offsets, dtype=np.int64))
+        self._section("domains.prefix_pos", _concat(self.prefix_pos, (0,)))
+        self._section("domains.prefix_edges", _concat(self.prefix_edges, (0, 2)))
+        self._section("domains.nodelist", np.array(self.graph_nodelist, dtype=np.int32))
+        self._section("nodelists.offsets", np.array(self.nodelist_offsets, dtype=np.int64))
+        self._section("nodelists.nodes", _concat(self.nodes, (0,)))
+        for name in metric_names:
+            self._section("domains." + name, np.array(self.metrics[name], dtype=metric_dtypes[name])
+                          .reshape(-1, len(modes)))
+        encoded = [name.encode() for name in self.names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+        self._section("names.offsets", offsets)
+        self._section("names.data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        self._section("names.order", np.argsort(np.array(encoded, dtype=object), kind="stable")
+                      .astype(np.int32))
+        footer = {"version": file_version, "modes": modes, "global_modes": list(self.global_set),
+                  "metric_modes": self.metric_modes or [], "zones": len(self.names),
+                  "domains": len(self.domain_ids), "edges": self.edge_count,
+                  "sections": self.sections}
+        self._align()
+        footer_offset = self.f.tell()
+        self.f.write(json.dumps(footer).encode())
+        self.f.write(np.uint64(footer_offset).tobytes() + magic)
+        self.f.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        elif not self.f.closed:
+            self.f.close()
+            os.remove(self.path + ".tmp")
+
+
+def _concat(arrays, empty_shape):
+    return np.concatenate(arrays) if arrays else np.zeros(empty_shape, dtype=np.int32)
+
+
+# the node order of a graph built from its edges (dep_graph.DepGraph.to_networkx()).
+def _derived_nodes(domain_id, edges):
+    ends = np.concatenate(([domain_id], np.asarray(edges, dtype=np.int32).ravel()))
+    _, first = np.unique(ends, return_index=True)
+    return ends[np.sort(first)]
+
+
+# graphs: (domain, mode) graphs; bodies: distinct shared bodies; edges: edges of all graphs,
+# expanded; body_edges, prefix_edges: the edges stored. the bytes are the ones of the edges
+# (8 per edge, 4 per prefix position).
+def _dedup_stats(graphs, bodies, edges, body_edges, prefix_edges):
+    stored = body_edges * 8 + prefix_edges * 12
+    return {"graphs": graphs, "bodies": bodies,
+            "dedup_ratio": graphs / bodies if bodies else 0.0,
+            "edges": edges, "stored_edges": body_edges + prefix_edges,
+            "bytes_expanded": edges * 8, "bytes_stored": stored,
+            "bytes_saved": edges * 8 - stored}
+
+
+# write a graph file from the pickled formats. Graph_set (optional): the per-domain graphs.
+def write_graph_file(path, Global_graph_set, Graph_set=None):
+    with GraphFileWriter(path) as writer:
+        for domain, G_set in (Graph_set or {}).items():
+            writer.add_graphs(domain, G_set)
+        writer.set_global(Global_graph_set)
+
+
+# the zone names of some ids, decoded when indexed.
+class Names:
+    def __init__(self, graph_file, ids=None):
+        self.graph_file = graph_file
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids) if self.ids is not None else self.graph_file.zones
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.graph_file.name(int(self.ids[i]) if self.ids is not None else i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+# the global graph of one mode in a graph file, with what the analyses ask of a networkx graph.
+class GraphView:
+    def __init__(self, graph_file, mode):
+        self.mode = mode
+        self.graph_file = graph_file
+        self.node_ids = graph_file.array("global." + mode + ".nodes")
+        self.indptr = graph_file.array("global." + mode + ".indptr")
+        self.indices = graph_file.array("global." + mode + ".indices")
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def nodes(self):
+        return Names(self.graph_file, self.node_ids)
+
+    # (nodes, src, dst) as graph_export.edge_arrays() gives them for the networkx graph.
+    def edge_arrays(self):
+        src = np.repeat(np.arange(len(self.node_ids), dtype=np.int64), np.diff(self.indptr))
+        return self.nodes(), src, self.indices.astype(np.int64)
+
+    def to_networkx(self):
+        import networkx as nx
+        nodes = [self.graph_file.name(i) for i in self.node_ids.tolist()]
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        G = nx.DiGraph()
+        G.add_nodes_from(nodes)
+        G.add_edges_from((nodes[u], nodes[indices[j]])
+                         for u in range(len(nodes)) for j in range(indptr[u], indptr[u + 1]))
+        return G
+
+
+class GraphFile:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError("%s is not a graph file" % path)
+            f.seek(-8 - len(magic), os.SEEK_END)
+            footer_offset = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            end = f.tell()
+            f.seek(footer_offset)
+            footer = json.loads(f.read(end - 8 - footer_offset))
+        if footer["version"] not in read_versions:
+            raise ValueError("%s: graph file version %d, expected one of %s" % (
+                path, footer["version"], read_versions))
+        self.footer = footer
+        self.version = footer["version"]
+        self.modes = footer["modes"]
+        self.zones = footer["zones"]
+        self.domains = footer["domains"]
+        self._arrays = {}
+
+    # a section as a read-only memmap.
+    def array(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            section = self.footer["sections"][name]
+            shape = tuple(section["shape"])
+            if 0 in shape:
+                array = np.zeros(shape, dtype=section["dtype"])
+            else:
+                array = np.memmap(self.path, dtype=section["dtype"], mode="r",
+                                  offset=section["offset"], shape=shape)
+            self._arrays[name] = array
+        return array
+
+    def name(self, i):
+        offsets = self.array("names.offsets")
+        return bytes(self.array("names.data")[offsets[i]:offsets[i + 1]]).decode()
+
+    # the id of a zone name, -1 if it is not in the file (binary search in names.order).
+    def id_of(self, name):
+        order = self.array("names.order")
+        key = name.encode()
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name(int(order[mid])).encode() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and self.name(int(order[lo])) == name:
+            return int(order[lo])
+        return -1
+
+    ### global graphs
+    def graph(self, mode):
+        return GraphView(self, mode)
+
+    # {mode: GraphView}, in place of the unpickled Global_graph_set for the analyses.
+    def global_views(self):
+        return {mode: GraphView(self, mode) for mode in self.footer["global_modes"]}
+
+    # the same as the unpickled graph_set_global.bin.
+    def global_graph_set(self):
+        return {mode: GraphView(self, mode).to_networkx() for mode in self.footer["global_modes"]}
+
+    ### per-domain graphs
+    def _row(self, domain):
+        i = self.id_of(domain)
+        return int(self.array("domains.row")[i]) if i >= 0 else -1
+
+    def __contains__(self, domain):
+        return self._row(domain) >= 0
+
+    # the domains, in rank order.
+    def domain_names(self):
+        return Names(self, self.array("domains.ids"))
+
+    # the index of the graph of one (domain, mode) in the per-domain sections.
+    def _graph(self, domain, mode):
+        row = self._row(domain)
+        if row < 0:
+            raise KeyError(domain)
+        return row * len(self.modes) + self.modes.index(mode)
+
+    # the part of the graph k in data, a section of the per-domain graphs.
+    def _part(self, k, offsets, data):
+        offsets = self.array(offsets)
+        return self.array(data)[offsets[k]:offsets[k + 1]]
+
+    # the edges (zone ids) of the graph of one domain in one mode: the body shared with other
+    # domains, with the edges of the domain put back at their positions.
+    def domain_edges(self, domain, mode):
+        k = self._graph(domain, mode)
+        if self.version == 1:
+            return self._part(k, "domains.offsets", "domains.edges")
+        body = self._part(int(self.array("domains.body")[k]), "bodies.offsets", "bodies.edges")
+        pos = self._part(k, "domains.prefix_offsets", "domains.prefix_pos")
+        if not len(pos):
+            return body
+        edges = np.empty((len(body) + len(pos), 2), dtype=np.int32)
+        own = np.zeros(len(edges), dtype=bool)
+        own[pos] = True
+        edges[own] = self._part(k, "domains.prefix_offsets", "domains.prefix_edges")
+        edges[~own] = body
+        return edges
+
+    # the nodes (zone ids) of the graph of one domain in one mode.
+    def domain_nodes(self, domain, mode):
+        k = self._graph(domain, mode)
+        if self.version == 1:
+            return self._part(k, "domains.node_offsets", "domains.nodes")
+        nodelist = int(self.array("domains.nodelist")[k])
+        if nodelist < 0:
+            return _derived_nodes(self.id_of(domain), self.domain_edges(domain, mode))
+        nodes = self._part(nodelist, "nodelists.offsets", "nodelists.nodes")
+        return np.where(nodes < 0, self.id_of(domain), nodes)
+
+    def domain_graph(self, domain, mode):
+        import networkx as nx
+        G = nx.DiGraph()
+        G.add_nodes_from(self.name(u) for u in self.domain_nodes(domain, mode).tolist())
+        G.add_edges_from((self.name(u), self.name(v))
+                         for u, v in self.domain_edges(domain, mode).tolist())
+        return G
+
+    # the per-domain graphs as a read-only dict, the graphs of a domain made on access.
+    def domain_graph_set(self):
+        return DomainGraphSet(self)
+
+    # the deduplication of the per-domain graphs (see _dedup_stats()).
+    def dedup_stats(self):
+        if self.version == 1:
+            edges = len(self.array("domains.edges"))
+            return _dedup_stats(self.domains * len(self.modes), self.domains * len(self.modes),
+                                edges, edges, 0)
+        return _dedup_stats(len(self.array("domains.body")),
+                            len(self.array("bodies.offsets")) - 1, self.footer["edges"],
+                            len(self.array("bodies.edges")), len(self.array("domains.prefix_pos")))
+
+    # the same as Graph_set[domain] of the unpickled graph_set_per_domain.bin.
+    def domain_set(self, domain):
+        row = self._row(domain)
+        if row < 0:
+            raise KeyError(domain)
+        G_set = {}
+        for j, mode in enumerate(self.modes):
+            G_set[mode] = {"graph": self.domain_graph(domain, mode)}
+            if mode in self.footer["metric_modes"]:
+                for name in metric_names:
+                    G_set[mode][name] = self.array("domains." + name)[row, j].item()
+        return G_set
+
+
+# Graph_set of a graph file: Graph_set[domain] = {mode: {"graph": G, "extrasize", ...}}, read
+# from the file each time.
+class DomainGraphSet(Mapping):
+    def __init__(self, graph_file):
+        self.graph_file = graph_file
+
+    def __getitem__(self, domain):
+        return self.graph_file.domain_set(domain)
+
+    def __contains__(self, domain):
+        return domain in self.graph_file
+
+    def __iter__(self):
+        return iter(self.graph_file.domain_names())
+
+    def __len__(self):
+        return self.graph_file.domains
+
+
+# the global graphs of a list: the graph file if there is one (views, see GraphView), else the
+# pickle.
+def load_global_graphs(data_dir, ntype):
+    path = graph_file_path(data_dir, ntype)
+    if os.path.exists(path):
+        return GraphFile(path).global_views()
+    import pickle
+    with open(data_dir + ntype + ".graph_set_global.bin", "rb") as f:
+        return pickle.load(f)
+
+
+# a global graph of load_global_graphs() as a networkx graph (for what a view does not do).
+def as_networkx(G):
+    return G.to_networkx() if isinstance(G, GraphView) else G
+
+
+###### MAIN ######
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="memory-mapped graph files of the lists.")
+    parser.add_argument("command", choices=["convert", "info"])
+    parser.add_argument("list", help="name of the list, e.g. edu")
+    parser.add_argument("--data-dir", default="../data/")
+    args = parser.parse_args()
+    data_dir = args.data_dir if args.data_dir.endswith("/") else args.data_dir + "/"
+    path = graph_file_path(data_dir, args.list)
+    if args.command == "convert":
+        import time
+        import pickle
+        start = time.perf_counter()
+        with open(data_dir + args.list + ".graph_set_global.bin", "rb") as f:
+            Global_graph_set = pickle.load(f)
+        Graph_set = None
+        per_domain_file = data_dir + args.list + ".graph_set_per_domain.bin"
+        if os.path.exists(per_domain_file):
+            with open(per_domain_file, "rb") as f:
+                Graph_set = pickle.load(f)
+        write_graph_file(path, Global_graph_set, Graph_set)
+        print("[+] %d global graphs, %d domains -> %s (%.2fs)" % (
+            len(Global_graph_set), len(Graph_set or ()), path, time.perf_counter() - start))
+    graph_file = GraphFile(path)
+    print("[+] %s: version %d, %d zones, %d domains, %.1f MB" % (
+        path, graph_file.footer["version"], graph_file.zones, graph_file.domains,
+        os.path.getsize(path) / 2 ** 20))
+    for mode, view in graph_file.global_views().items():
+        print("\t%-10s %9d nodes %9d edges" % (mode, view.number_of_nodes(), view.number_of_edges()))
+    if graph_file.domains:
+        dedup = graph_file.dedup_stats()
+        print("[+] per-domain graphs: %d, distinct bodies: %d (dedup ratio %.1f), edges: %d "
+              "expanded, %d stored, %.2f MB -> %.2f MB" % (
+                  dedup["graphs"], dedup["bodies"], dedup["dedup_ratio"], dedup["edges"],
+                  dedup["stored_edges"], dedup["bytes_expanded"] / 2 ** 20,
+                  dedup["bytes_stored"] / 2 ** 20))
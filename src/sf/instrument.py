@@ -0,0 +1,157 @@
+# counters, timers and histograms of a run, and the --profile switch of the scripts.
+#   stats (the one of the process, shared by the scripts and the library modules):
+#     stats.count("dns.queries")            counter
+#     with stats.timer("build.pickle"): ... wall time (total and calls) of a stage
+#     stats.observe("dns.latency_ms", 3.2)  histogram (power-of-2 buckets)
+#   Profiler: with --profile (cProfile, or --profile pyinstrument), the run is profiled and at the
+#   end <prefix>.profile.txt (report) and <prefix>.metrics.json (stats, wall time, peak RSS) are
+#   written, prefix being e.g. ../data/edu.build.
+# Python 3
+
+import io
+import sys
+import json
+import time
+import bisect
+import pstats
+import cProfile
+import resource
+import contextlib
+
+###### GLOBAL CONFIG ######
+# upper bounds of the histogram buckets (0.125 ... 65536), the last bucket holds everything above.
+bucket_bounds = [2.0 ** i for i in range(-3, 17)]
+profilers = ["cprofile", "pyinstrument"]
+report_lines = 60
+
+
+###### FUNC ######
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(bucket_bounds) + 1)
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(bucket_bounds, value)] += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    # upper bound of the bucket holding the q-quantile.
+    def quantile(self, q):
+        n = sum(self.counts)
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= q * n:
+                return bucket_bounds[i] if i < len(bucket_bounds) else self.max
+        return 0.0
+
+    def to_dict(self):
+        n = sum(self.counts)
+        if not n:
+            return {"count": 0}
+        buckets = {("le_%g" % bucket_bounds[i] if i < len(bucket_bounds) else "inf"): c
+                   for i, c in enumerate(self.counts) if c}
+        return {"count": n, "mean": self.total / n, "min": self.min, "max": self.max,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": buckets}
+
+
+class Stats:
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+        self.histograms = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += seconds
+        timer[1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def to_dict(self):
+        return {"counters": dict(sorted(self.counters.items())),
+                "timers": {name: {"seconds": round(t[0], 6), "calls": t[1]}
+                           for name, t in sorted(self.timers.items())},
+                "histograms": {name: h.to_dict() for name, h in sorted(self.histograms.items())}}
+
+    # one line per timer, for the end of a run.
+    def summary(self):
+        return "\n".join("[++] %-28s %9.3fs (%d)" % (name, t[0], t[1])
+                         for name, t in self.timers.items())
+
+
+stats = Stats()
+
+
+# the --profile switch of a script.
+def add_profile_argument(parser):
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=profilers,
+                        help="profile the run, write <prefix>.profile.txt and <prefix>.metrics.json")
+
+
+class Profiler:
+    # kind: None (nothing profiled nor written), "cprofile" or "pyinstrument".
+    def __init__(self, kind, prefix):
+        self.kind = kind
+        self.prefix = prefix
+        self.profiler = None
+        self.start_time = time.perf_counter()
+        if kind == "pyinstrument":
+            try:
+                import pyinstrument
+            except ImportError:
+                sys.exit("[-] --profile pyinstrument needs pyinstrument (pip install pyinstrument)")
+            self.profiler = pyinstrument.Profiler()
+            self.profiler.start()
+        elif kind == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def _report(self):
+        if self.kind == "pyinstrument":
+            self.profiler.stop()
+            return self.profiler.output_text()
+        self.profiler.disable()
+        self.profiler.dump_stats(self.prefix + ".prof")
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(report_lines)
+        return out.getvalue()
+
+    # stop profiling and write the report and the metrics. returns the metrics.
+    def stop(self):
+        metrics = {"script": sys.argv[0], "argv": sys.argv[1:],
+                   "wall_seconds": round(time.perf_counter() - self.start_time, 6),
+                   # ru_maxrss is in KB on Linux.
+                   "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                   "children_peak_rss_mb":
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024}
+        metrics.update(stats.to_dict())
+        if self.kind is None:
+            return metrics
+        with open(self.prefix + ".profile.txt", "w") as f:
+            f.write(self._report())
+        with open(self.prefix + ".metrics.json", "w") as f:
+            json.dump(metrics, f, indent=1)
+        print("[++] Profile in", self.prefix + ".profile.txt", "metrics in",
+              self.prefix + ".metrics.json")
+        return metrics
@@ -0,0 +1,266 @@
+# layouts of the dependency graphs (used by 2_build_dependency.py), computed once and cached.
+#   - force-directed (Fruchterman-Reingold, as nx.spring_layout) with the repulsion of the far
+#     nodes approximated Barnes-Hut style on a pyramid of grids: at each level, a node feels the
+#     cells (mass at their center of mass) that are children of its parent's neighbours but not
+#     its own neighbours; only the nodes of the 3x3 neighbourhood at the finest level are exact.
+#     every level is a few vectorized passes over all nodes: O(n log n) per iteration instead of
+#     O(n^2).
+#   - cache: positions are pickled in ../data/layout_cache/<sha1>.bin, keyed by the content of
+#     the graph (nodes, edges) and the layout parameters. the modes of a domain share one layout
+#     (the one of the union of their graphs), so a node is at the same place in every picture.
+#   - rendering: matplotlib runs in a pool of forked processes (Agg backend), the caller only
+#     queues the pictures and waits for them at the end.
+# Python 3
+
+import os
+import pickle
+import hashlib
+import numpy as np
+
+###### GLOBAL CONFIG ######
+default_cache_dir = "../data/layout_cache/"
+default_iterations = 50
+max_depth = 12          # grids of the repulsion: at most 2^12 x 2^12 cells.
+grid_pad = 3            # empty cells around the grids of the repulsion.
+chunk_nodes = 32768     # nodes of one vectorized pass of the far field.
+label_limit = 300       # bigger graphs are drawn without labels nor arrows.
+
+
+###### FUNC ######
+# sha1 of the nodes and edges of a graph (and of the layout parameters in extra).
+def graph_hash(G, extra=()):
+    h = hashlib.sha1()
+    for node in sorted(map(str, G.nodes())):
+        h.update(node.encode() + b"\n")
+    h.update(b"\n")
+    for u, v in sorted((str(u), str(v)) for u, v in G.edges()):
+        h.update(u.encode() + b"\t" + v.encode() + b"\n")
+    h.update(repr(tuple(extra)).encode())
+    return h.hexdigest()
+
+
+def _accumulate(disp, index, force, n):
+    disp[:, 0] += np.bincount(index, weights=force[:, 0], minlength=n)
+    disp[:, 1] += np.bincount(index, weights=force[:, 1], minlength=n)
+
+
+# the repulsive displacement k^2 * delta / dist^2 of every node, from all the others.
+# exact: all pairs (O(n^2), for checks), else the grid approximation.
+def repulsion(pos, k2, exact=False, leaf_size=4):
+    n = len(pos)
+    disp = np.zeros((n, 2))
+    if exact:
+        for i in range(n):
+            delta = pos[i] - pos
+            dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-12)
+            dist2[i] = np.inf
+            disp[i] = (delta * (k2 / dist2)[:, None]).sum(axis=0)
+        return disp
+    lo = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - lo).max()), 1e-12)
+    unit = np.minimum((pos - lo) / span, 1 - 1e-9)
+    # finest level: about leaf_size nodes per cell, deeper where the nodes are clustered.
+    depth = int(min(max(np.ceil(np.log(max(n / leaf_size, 1)) / np.log(4)), 2), max_depth))
+    while depth < max_depth:
+        cell = (unit * (1 << depth)).astype(np.int64)
+        occupancy = np.bincount(cell[:, 0] * (1 << depth) + cell[:, 1]).astype(np.float64)
+        if (occupancy ** 2).sum() <= 2 * leaf_size * n:
+            break
+        depth += 1
+    for level in range(2, depth + 1):
+        size = 1 << level
+        # cells are padded with empty ones, so that no offset falls out of the grid.
+        width = size + 2 * grid_pad
+        cell = (unit * size).astype(np.int64)
+        flat = (cell[:, 0] + grid_pad) * width + cell[:, 1] + grid_pad
+        mass = np.bincount(flat, minlength=width * width).astype(np.float64)
+        center = np.stack([np.bincount(flat, weights=pos[:, 0], minlength=width * width),
+                           np.bincount(flat, weights=pos[:, 1], minlength=width * width)], axis=1)
+        center /= np.maximum(mass, 1)[:, None]
+        # the interaction list only depends on where the cell lies in its parent: 27 offsets
+        # for each of the 4 children.
+        parity = (cell[:, 0] & 1) * 2 + (cell[:, 1] & 1)
+        for p in range(4):
+            bx, by = p >> 1, p & 1
+            offsets = np.array([ox * width + oy for ox in range(-2 - bx, 4 - bx)
+                                for oy in range(-2 - by, 4 - by) if abs(ox) > 1 or abs(oy) > 1])
+            members = np.flatnonzero(parity == p)
+            for first in range(0, len(members), chunk_nodes):
+                index = members[first:first + chunk_nodes]
+                target = flat[index][:, None] + offsets
+                delta = pos[index][:, None, :] - center[target]
+                dist2 = np.maximum((delta ** 2).sum(axis=2), 1e-12)
+                disp[index] += (delta * (k2 * mass[target] / dist2)[:, :, None]).sum(axis=1)
+    # near field: exact, node pairs of neighbouring cells at the finest level.
+    order = np.argsort(flat, kind="stable")
+    first = np.zeros(width * width + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=width * width), out=first[1:])
+    nodes = np.arange(n)
+    for ox in range(-1, 2):
+        for oy in range(-1, 2):
+            target = flat + ox * width + oy
+            counts = first[target + 1] - first[target]
+            total = int(counts.sum())
+            if not total:
+                continue
+            i = np.repeat(nodes, counts)
+            offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            j = order[np.repeat(first[target], counts) + offset]
+            keep = i != j
+            i, j = i[keep], j[keep]
+            delta = pos[i] - pos[j]
+            dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-12)
+            _accumulate(disp, i, delta * (k2 / dist2)[:, None], n)
+    return disp
+
+
+# positions (n, 2) of a graph given as edge arrays, in the unit square.
+# init: (n, 2) starting positions (NaN rows: random).
+def spring_positions(n, src, dst, iterations=default_iterations, seed=0, init=None):
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    if init is not None:
+        known = ~np.isnan(init).any(axis=1)
+        pos[known] = init[known]
+    if n <= 1:
+        return pos
+    # undirected, without self-loops.
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    k = np.sqrt(1.0 / n)
+    t = max(float((pos.max(axis=0) - pos.min(axis=0)).max()), 1e-3) * 0.1
+    dt = t / (iterations + 1)
+    for _ in range(iterations):
+        disp = repulsion(pos, k * k)
+        delta = pos[src] - pos[dst]
+        force = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+        _accumulate(disp, src, -force, n)
+        _accumulate(disp, dst, force, n)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 0.01)
+        pos += disp * (t / length)[:, None]
+        t -= dt
+    pos -= pos.min(axis=0)
+    pos /= max(float(pos.max()), 1e-12)
+    return pos
+
+
+class LayoutCache:
+    def __init__(self, cache_dir=default_cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                pos = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pos
+
+    def put(self, key, pos):
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(pos, f)
+        os.replace(tmp, self._path(key))
+
+
+# positions of a networkx graph: pos[node] = array([x, y]), from the cache if possible.
+# init: pos of a previous layout, for the nodes it has.
+def layout(G, cache=None, iterations=default_iterations, seed=0, init=None):
+    key = graph_hash(G, (iterations, seed)) if cache is not None else None
+    if key is not None:
+        pos = cache.get(key)
+        if pos is not None:
+            return pos
+    nodes = list(G.nodes())
+    ids = {node: i for i, node in enumerate(nodes)}
+    m = G.number_of_edges()
+    src = np.fromiter((ids[u] for u, v in G.edges()), dtype=np.int64, count=m)
+    dst = np.fromiter((ids[v] for u, v in G.edges()), dtype=np.int64, count=m)
+    start = None
+    if init:
+        start = np.full((len(nodes), 2), np.nan)
+        for i, node in enumerate(nodes):
+            if node in init:
+                start[i] = init[node]
+    xy = spring_positions(len(nodes), src, dst, iterations=iterations, seed=seed, init=start)
+    pos = {node: xy[i] for i, node in enumerate(nodes)}
+    if key is not None:
+        cache.put(key, pos)
+    return pos
+
+
+# one layout for the graphs of all modes (of a domain, or the global ones): the layout of their
+# union, restricted to each graph. returns pos[mode].
+def mode_layouts(graphs, cache=None, **kwargs):
+    import networkx as nx
+    union = nx.DiGraph()
+    for G in graphs.values():
+        union.add_nodes_from(G.nodes())
+        union.add_edges_from(G.edges())
+    pos = layout(union, cache, **kwargs)
+    return {mode: {node: pos[node] for node in G.nodes()} for mode, G in graphs.items()}
+
+
+# draw a graph at the given positions into a png (runs in the render pool).
+def render(path, G, pos):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    fig = plt.figure()
+    if G.number_of_nodes() <= label_limit:
+        nx.draw(G, pos, with_labels=True)
+    else:
+        nx.draw(G, pos, with_labels=False, arrows=False, node_size=2, width=0.1)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+class Renderer:
+    # workers: processes of the pool (0: draw in the caller). the pool is forked here, so create
+    # the renderer before the big state of the caller (and its own fork pools): the workers do
+    # not inherit it. (a spawn pool would run again the numbered scripts, that call main() at
+    # import.)
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.pool = None
+        self.jobs = []
+        if workers:
+            import multiprocessing
+            self.pool = multiprocessing.get_context("fork").Pool(workers)
+
+    def submit(self, path, G, pos):
+        if not self.workers:
+            render(path, G, pos)
+            return
+        self.jobs.append(self.pool.apply_async(render, (path, G, pos)))
+
+    # wait for all the pictures. returns their paths.
+    def close(self):
+        done = [job.get() for job in self.jobs]
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        self.jobs = []
+        return done
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None and self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+            return False
+        self.close()
+        return False
@@ -0,0 +1,70 @@
+# persistent on-disk cache of NS answers (SQLite), shared by all scans (edu/gov/other...),
+# so that common zones like edu.cn, cernet.net and com are queried once, not once per list.
+#   ns_cache(zone, ns, resolved_at, ttl): ns is the space-separated NS list, "" for ~NO~NS~.
+# a record is used while resolved_at + ttl is in the future.
+# other record lists (e.g. the A records of enrich.py) are kept in their own table of the same file,
+# with the same layout: NSCache(path, table="a_cache").
+# Python 3
+
+import time
+import sqlite3
+
+###### GLOBAL CONFIG ######
+default_cache_file = "../data/ns_cache.sqlite"
+default_ttl = 7 * 86400             # keep NS answers for a week.
+default_negative_ttl = 86400        # keep dead ends (~NO~NS~) for a day.
+commit_every = 200                  # records written between two commits.
+
+
+###### FUNC ######
+class NSCache:
+    def __init__(self, path=default_cache_file, ttl=default_ttl, negative_ttl=default_negative_ttl,
+                 table="ns_cache"):
+        if not table.isidentifier():
+            raise ValueError("bad cache table name: " + table)
+        self.table = table
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # concurrent scans may share the file. wait for the lock instead of failing.
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS " + table + " ("
+                        "zone TEXT PRIMARY KEY, ns TEXT NOT NULL, "
+                        "resolved_at REAL NOT NULL, ttl REAL NOT NULL)")
+        self.pending = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0}
+
+    # the cached NS list of a zone ([] for ~NO~NS~), or None if unknown or expired.
+    def get(self, zone):
+        row = self.db.execute("SELECT ns, resolved_at, ttl FROM " + self.table
+                              + " WHERE zone = ?", (zone,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        if row[1] + row[2] < time.time():
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return row[0].split()
+
+    def put(self, zone, ns_list):
+        ttl = self.ttl if ns_list else self.negative_ttl
+        self.db.execute("INSERT OR REPLACE INTO " + self.table + " VALUES (?, ?, ?, ?)",
+                        (zone, " ".join(ns_list), time.time(), ttl))
+        self.stats["writes"] += 1
+        self.pending += 1
+        if self.pending >= commit_every:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM " + self.table).fetchone()[0]
@@ -0,0 +1,272 @@
+# asyncio crawl engine for the NS records of zones (used by 1_findns.py).
+# a work queue of zones is drained by a bounded pool of workers (QueryPool, also the one of the A
+# queries of enrich.py). every query is sent to one of the resolvers in turn, each resolver
+# rate-limited by its own token bucket.
+# with an ns_iterative.IterativeResolver, the zones are resolved from the root servers instead.
+# Python 3
+
+import asyncio
+import time
+import dns.asyncresolver
+import dns.exception
+import dns.rdatatype
+from zone_index import expand_zones, null_ns
+from instrument import stats
+
+###### FUNC ######
+# token bucket limiting the queries sent to ONE resolver. qps <= 0 means unlimited.
+class TokenBucket:
+    def __init__(self, qps, burst=None):
+        self.rate = float(qps)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# one resolver object and one bucket per upstream resolver: [(resolver, bucket), ...].
+def make_upstreams(resolvers, qps, port=53, timeout=2.0):
+    upstreams = []
+    for ip in resolvers:
+        r = dns.asyncresolver.Resolver(configure=False)
+        r.nameservers = [ip]
+        r.port = port
+        r.timeout = timeout
+        r.lifetime = timeout
+        upstreams.append((r, TokenBucket(qps)))
+    return upstreams
+
+
+# a pool of workers draining a queue of names, each name looked up (records of rdtype) with one
+# of the resolvers in turn. the base of NSCrawler (NS) and enrich.AResolver (A).
+# handle: the coroutine function called once per name queued, handle(name). an exception raised
+# by it is counted (stats["errors"]) and printed, and the worker goes on with the next name.
+# cache (optional) is an ns_cache.NSCache (or its A table) consulted before querying. only answers
+# go into it (records, NXDOMAIN, NoAnswer...): a name whose queries all timed out is looked up as
+# None, it is neither cached nor written out, and asked again by the next run (or --resume).
+class QueryPool:
+    def __init__(self, resolvers, rdtype, handle, concurrency=64, qps=20, port=53, timeout=2.0,
+                 retries=2, cache=None):
+        self.rdtype = rdtype
+        self.handle = handle
+        self.cache = cache
+        self.concurrency = concurrency
+        self.retries = retries
+        self.upstreams = make_upstreams(resolvers, qps, port, timeout)
+        self.next_upstream = 0
+        self.queue = asyncio.Queue()
+        # counters.
+        self.stats = {"queries": 0, "retries": 0, "timeouts": 0, "cache_hits": 0, "unanswered": 0,
+                      "errors": 0}
+
+    def add(self, name):
+        self.queue.put_nowait(name)
+
+    # query the records of a name, trying the next resolver on timeout. returns them as text
+    # ([] for a dead end), None if nothing answered.
+    async def query(self, name):
+        for attempt in range(self.retries + 1):
+            resolver, bucket = self.upstreams[self.next_upstream]
+            self.next_upstream = (self.next_upstream + 1) % len(self.upstreams)
+            await bucket.acquire()
+            self.stats["queries"] += 1
+            if attempt > 0:
+                self.stats["retries"] += 1
+            start = time.perf_counter()
+            try:
+                answer = await resolver.resolve(name, rdtype=self.rdtype)
+                stats.observe("dns.latency_ms", (time.perf_counter() - start) * 1000)
+                return [str(item) for item in answer.rrset.items]
+            except dns.exception.Timeout:
+                self.stats["timeouts"] += 1
+                continue
+            except Exception:
+                # NXDOMAIN, NoAnswer, SERVFAIL... the name is a dead end.
+                stats.observe("dns.latency_ms", (time.perf_counter() - start) * 1000)
+                return []
+        return None
+
+    # the records of a name, from the cache or else queried. None if nothing answered.
+    async def lookup(self, name):
+        records = self.cache.get(name) if self.cache is not None else None
+        if records is not None:
+            self.stats["cache_hits"] += 1
+            return records
+        records = await self.query(name)
+        if records is None:
+            self.stats["unanswered"] += 1
+            return None
+        if self.cache is not None:
+            self.cache.put(name, records)
+        return records
+
+    async def worker(self):
+        while True:
+            name = await self.queue.get()
+            try:
+                await self.handle(name)
+            except Exception as e:
+                # a dead worker would leave queue.join() waiting forever.
+                self.stats["errors"] += 1
+                print("[-]", name, "failed:", repr(e))
+            finally:
+                self.queue.task_done()
+
+    async def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    # look up all the names (and those queued on the way) until the queue is drained.
+    async def run(self, names):
+        for name in names:
+            self.add(name)
+        await self.open()
+        workers = [asyncio.create_task(self.worker()) for i in range(self.concurrency)]
+        try:
+            await self.queue.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.close()
+        return self.stats
+
+
+# the crawler. resolved zones are handed to on_result(zone, ns_list), ns_list is [] for ~NO~NS~.
+# a zone no resolver answered is not (see QueryPool): it is not in the output, so that a resumed
+# run asks again. ns names are returned as they are in the answer (with the trailing dot).
+# done (optional) holds the results of a previous run (resume): done[zone] = ns_list. these
+# zones are neither queried nor handed to on_result again, but their dependencies are followed.
+# iterative (optional) is an ns_iterative.IterativeResolver used instead of the resolvers. the
+# cache is not used with it: every zone must be walked for the glue of its referral to be seen, and
+# the cache of the recursive crawls is not filled with the answers of the authoritative servers.
+class NSCrawler(QueryPool):
+    def __init__(self, resolvers, on_result, concurrency=64, qps=20, port=53,
+                 timeout=2.0, retries=2, cache=None, done=None, iterative=None):
+        super().__init__(resolvers if iterative is None else [], dns.rdatatype.NS, self.crawl_zone,
+                         concurrency=concurrency, qps=qps, port=port, timeout=timeout,
+                         retries=retries, cache=cache if iterative is None else None)
+        self.on_result = on_result
+        self.iterative = iterative
+        self.done = done if done is not None else {}
+        # zones already queued (or done). they are never queried twice.
+        self.seen = set()
+        self.stats.update({"no_ns": 0, "zones": 0, "resumed": 0})
+
+    # queue a name and all its parents that have not been seen.
+    def add(self, name):
+        for zone in expand_zones([name], self.seen):
+            self.queue.put_nowait(zone)
+
+    async def query(self, zone):
+        if self.iterative is not None:
+            return await self.iterative.resolve_ns(zone)
+        return await super().query(zone)
+
+    async def crawl_zone(self, zone):
+        if zone in self.done:
+            # resolved in a previous run.
+            ns_list = self.done[zone]
+            self.stats["resumed"] += 1
+        else:
+            ns_list = await self.lookup(zone)
+            if ns_list is None:
+                return
+            self.stats["zones"] += 1
+            if not ns_list:
+                self.stats["no_ns"] += 1
+            self.on_result(zone, ns_list)
+        # iteratively follow the dependencies of all NS.
+        for ns in ns_list:
+            self.add(ns)
+
+    async def open(self):
+        if self.iterative is not None:
+            await self.iterative.open()
+
+    def close(self):
+        if self.iterative is not None:
+            self.iterative.close()
+
+    async def run(self, domain_list):
+        await super().run(domain_list)
+        if self.iterative is not None:
+            # the queries are the ones of the iterative resolver.
+            self.stats.update(self.iterative.stats)
+        return self.stats
+
+
+# read the results of a previous (maybe interrupted) run from a domain_ns_info.txt file.
+# the lines of a zone are written together, so only the last zone of the file can be torn.
+# it is cut off the file (and resolved again), so that new results can be appended safely.
+# returns done[zone] = [ns1, ns2, ...] ([] for ~NO~NS~).
+def read_results(output_file):
+    done = {}
+    try:
+        f = open(output_file, "rb+")
+    except FileNotFoundError:
+        return done
+    with f:
+        lines = f.read().split(b"\n")
+        # drop the unterminated (or empty) last line, then the whole last zone.
+        lines.pop()
+        if lines:
+            last_zone = lines[-1].split(b"\t")[0]
+            while lines and lines[-1].split(b"\t")[0] == last_zone:
+                lines.pop()
+        data = b"".join(line + b"\n" for line in lines)
+        f.seek(len(data))
+        f.truncate()
+    for line in data.decode().splitlines():
+        try:
+            zone, ns = line.split("\t")
+        except ValueError:
+            continue
+        ns_list = done.setdefault(zone, [])
+        if ns != null_ns:
+            ns_list.append(ns)
+    return done
+
+
+# write one zone in the format of domain_ns_info.txt.
+def format_result(zone, ns_list):
+    if not ns_list:
+        return zone + "\t" + null_ns + "\n"
+    return "".join(zone + "\t" + ns + "\n" for ns in ns_list)
+
+
+# crawl domain_list and write the results to outputf. returns the counters.
+# results (optional) also gets them: results[zone] = ns_list.
+def crawl(domain_list, outputf, resolvers, concurrency=64, qps=20, port=53,
+          timeout=2.0, retries=2, progress=None, cache=None, done=None, results=None,
+          iterative=None):
+    def on_result(zone, ns_list):
+        outputf.write(format_result(zone, ns_list))
+        if results is not None:
+            results[zone] = ns_list
+        if progress is not None:
+            progress.update(1)
+
+    crawler = NSCrawler(resolvers, on_result, concurrency=concurrency, qps=qps,
+                        port=port, timeout=timeout, retries=retries, cache=cache, done=done,
+                        iterative=iterative)
+    try:
+        return asyncio.run(crawler.run(domain_list))
+    finally:
+        # keep everything resolved so far, even on Ctrl-C.
+        outputf.flush()
+        if cache is not None:
+            cache.commit()
@@ -0,0 +1,360 @@
+# iterative resolution of NS records for the crawler (1_findns.py --iterative): instead of asking
+# a public recursive resolver, the delegations are walked from the root servers.
+#   - zone cuts learned from referrals are kept in a delegation cache shared by all queries: a
+#     zone whose cut is known is answered without any query, and every walk starts from the
+#     closest known cut. concurrent walks through the same not yet known cut wait for the first.
+#   - the glue of the referrals (A/AAAA of the NS in the additional section) is recorded per
+#     zone, as <list>.glue.txt: the real glue, read by dep_graph.DepGraph(glue=...) instead of
+#     guessing it from the names. the NS of a zone are the ones of the referral of its parent (the
+#     child is not asked again). NS without glue are resolved (A) the same way, iteratively.
+#     glueless NS can form a cycle (a.com served by ns1.b.net, b.net by ns1.a.com): a lookup that
+#     comes back to a host already being looked up on the way, by the same walk or by walks
+#     waiting on each other, gives up (lame) instead of waiting for itself.
+#   - one UDP socket is used for every query (answers matched by id and server); a truncated
+#     answer is asked again over TCP, on connections pooled per server.
+#   - each server is rate-limited by its own token bucket (qps <= 0: unlimited).
+# only IPv4 addresses are queried, AAAA glue is recorded.
+# Python 3
+
+import random
+import asyncio
+import time
+import dns.flags
+import dns.message
+import dns.rdatatype
+import dns.rcode
+from instrument import stats
+from ns_crawler import TokenBucket
+
+###### GLOBAL CONFIG ######
+# a.root-servers.net ... m.root-servers.net.
+root_servers = ["198.41.0.4", "170.247.170.2", "192.33.4.12", "199.7.91.13", "192.203.230.10",
+                "192.5.5.241", "192.112.36.4", "198.97.190.53", "192.36.148.17", "192.58.128.30",
+                "193.0.14.129", "199.7.83.42", "202.12.27.33"]
+no_glue = "~NO~GLUE~"
+# referrals followed by one walk, and nesting of the NS address lookups (hosts in a chain).
+max_referrals = 16
+max_depth = 6
+
+
+###### FUNC ######
+def _name(name):
+    return name.to_text().rstrip(".").lower() or "."
+
+
+# name is zone or under it.
+def _under(name, zone):
+    return zone == "." or name == zone or name.endswith("." + zone)
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.pending = {}
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        future = self.pending.pop((int.from_bytes(data[:2], "big"), addr[0], addr[1]), None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+
+# one UDP socket for all queries.
+class UDPTransport:
+    def __init__(self):
+        self.transport = None
+        self.protocol = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.transport, self.protocol = await loop.create_datagram_endpoint(
+            _UDPProtocol, local_addr=("0.0.0.0", 0))
+
+    # send the query (a dns.message) to addr, returns the answer as wire, None on timeout.
+    async def query(self, query, addr, timeout):
+        pending = self.protocol.pending
+        query.id = random.getrandbits(16)
+        while (query.id, addr[0], addr[1]) in pending:
+            query.id = random.getrandbits(16)
+        key = (query.id, addr[0], addr[1])
+        future = asyncio.get_running_loop().create_future()
+        pending[key] = future
+        self.transport.sendto(query.to_wire(), addr)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            pending.pop(key, None)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+# TCP connections kept open per server, one query at a time on each.
+class TCPPool:
+    def __init__(self):
+        self.idle = {}
+
+    async def _exchange(self, conn, wire, timeout):
+        reader, writer = conn
+        writer.write(len(wire).to_bytes(2, "big") + wire)
+        await writer.drain()
+        length = int.from_bytes(await asyncio.wait_for(reader.readexactly(2), timeout), "big")
+        return await asyncio.wait_for(reader.readexactly(length), timeout)
+
+    # returns the answer as wire, None on failure. a pooled connection closed by the server is
+    # replaced by a new one.
+    async def query(self, query, addr, timeout):
+        wire = query.to_wire()
+        while True:
+            idle = self.idle.get(addr)
+            conn = idle.pop() if idle else None
+            pooled = conn is not None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(asyncio.open_connection(*addr), timeout)
+                data = await self._exchange(conn, wire, timeout)
+            except (OSError, EOFError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                if conn is not None:
+                    conn[1].close()
+                if pooled:
+                    continue
+                return None
+            self.idle.setdefault(addr, []).append(conn)
+            return data
+
+    def close(self):
+        for conns in self.idle.values():
+            for _, writer in conns:
+                writer.close()
+        self.idle = {}
+
+
+class IterativeResolver:
+    # roots: addresses of the root servers. port: of every server (53, or a local stub).
+    # edns_payload: advertised UDP size (0: no EDNS, answers over 512 bytes come truncated).
+    def __init__(self, roots=None, port=53, timeout=2.0, retries=2, qps=0, edns_payload=1232):
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.qps = qps
+        self.edns_payload = edns_payload
+        # the delegation cache: cuts[zone] = [ns1., ns2., ...] (root: the root servers).
+        self.cuts = {".": []}
+        # addresses[ns host] = [IPv4], from glue and from A lookups.
+        self.addresses = {}
+        self.root_addresses = list(roots or root_servers)
+        # glue[zone] = {ns host: [addresses]} of the referral of the zone (names lowercased).
+        self.glue = {}
+        # walks (by the zone below a cut) and address lookups in flight, and the host each lookup
+        # in flight is waiting for (the lookups waiting on each other, to find cycles).
+        self.walking = {}
+        self.looking_up = {}
+        self.waits_for = {}
+        self.buckets = {}
+        self.udp = UDPTransport()
+        self.tcp = TCPPool()
+        self.stats = {"queries": 0, "timeouts": 0, "tcp": 0, "referrals": 0, "cut_hits": 0,
+                      "address_lookups": 0, "lame": 0}
+
+    async def open(self):
+        await self.udp.open()
+
+    def close(self):
+        self.udp.close()
+        self.tcp.close()
+
+    # the closest enclosing zone cut known.
+    def closest_cut(self, name):
+        while name != ".":
+            if name in self.cuts:
+                return name
+            name = name[name.find(".") + 1:] if "." in name else "."
+        return "."
+
+    # the zone one label below cut on the way to name.
+    @staticmethod
+    def _below(cut, name):
+        if cut == ".":
+            return name[name.rfind(".") + 1:]
+        head = name[:-len(cut) - 1]
+        return head[head.rfind(".") + 1:] + "." + cut
+
+    # ask the servers of a cut, trying the next one on timeout. returns a dns.message or None.
+    async def ask(self, addresses, name, rdtype):
+        first = random.randrange(len(addresses))
+        for attempt in range(self.retries + 1):
+            addr = (addresses[(first + attempt) % len(addresses)], self.port)
+            bucket = self.buckets.get(addr[0])
+            if bucket is None:
+                bucket = self.buckets[addr[0]] = TokenBucket(self.qps)
+            await bucket.acquire()
+            query = dns.message.make_query(name, rdtype, use_edns=0 if self.edns_payload else False,
+                                           payload=self.edns_payload or 512)
+            query.flags &= ~dns.flags.RD
+            self.stats["queries"] += 1
+            start = time.perf_counter()
+            wire = await self.udp.query(query, addr, self.timeout)
+            if wire is None:
+                self.stats["timeouts"] += 1
+                continue
+            try:
+                response = dns.message.from_wire(wire)
+                if response.flags & dns.flags.TC:
+                    self.stats["tcp"] += 1
+                    wire = await self.tcp.query(query, addr, self.timeout)
+                    if wire is None:
+                        continue
+                    response = dns.message.from_wire(wire)
+            except Exception:
+                continue
+            stats.observe("dns.latency_ms", (time.perf_counter() - start) * 1000)
+            return response
+        return None
+
+    # the addresses of the servers of a cut, looking up the NS without glue if needed. chain: the
+    # hosts being looked up by this walk, the innermost last. [] for a lame delegation, None if
+    # the lookups of the NS found nothing because servers did not answer.
+    async def servers_of(self, cut, chain):
+        if cut == ".":
+            return self.root_addresses
+        found = []
+        for ns in self.cuts[cut]:
+            found.extend(self.addresses.get(ns.rstrip(".").lower(), ()))
+        if found or len(chain) >= max_depth:
+            return found
+        unanswered = False
+        for ns in self.cuts[cut]:
+            found = await self.lookup_address(ns.rstrip(".").lower(), chain)
+            if found:
+                return found
+            unanswered = unanswered or found is None
+        if unanswered:
+            return None
+        self.stats["lame"] += 1
+        return []
+
+    # a referral in response, from a server of cut, on the way to name: the delegated zone is
+    # cached with its glue and returned. None if response is not such a referral.
+    def _referral(self, response, cut, name):
+        for rrset in response.authority:
+            if rrset.rdtype != dns.rdatatype.NS:
+                continue
+            zone = _name(rrset.name)
+            if zone == cut or not _under(zone, cut) or not _under(name, zone):
+                continue
+            # the NS as they are in the answer (as a resolver returns them), matched lowercased.
+            ns_list = [str(item) for item in rrset]
+            hosts = {ns.rstrip(".").lower() for ns in ns_list}
+            glue = {}
+            for extra in response.additional:
+                host = _name(extra.name)
+                if host in hosts and extra.rdtype in (dns.rdatatype.A, dns.rdatatype.AAAA):
+                    glue.setdefault(host, []).extend(str(item) for item in extra)
+                    if extra.rdtype == dns.rdatatype.A:
+                        self.addresses.setdefault(host, [])
+                        for item in extra:
+                            if str(item) not in self.addresses[host]:
+                                self.addresses[host].append(str(item))
+            self.cuts[zone] = ns_list
+            self.glue[zone] = glue
+            self.stats["referrals"] += 1
+            return zone
+        return None
+
+    # walk the delegations down to name. returns the records of rdtype in the answer (as text), []
+    # for a dead end (a lame delegation too, as a resolver answers SERVFAIL), or None when the
+    # servers of a cut did not answer.
+    async def walk(self, name, rdtype, chain=()):
+        for _ in range(max_referrals):
+            cut = self.closest_cut(name)
+            if rdtype == dns.rdatatype.NS and name in self.cuts and name != ".":
+                self.stats["cut_hits"] += 1
+                return list(self.cuts[name])
+            addresses = await self.servers_of(cut, chain)
+            if addresses is None:
+                return None
+            if not addresses:
+                return []
+            below = self._below(cut, name) if cut != name else name
+            if below in self.walking:
+                # another walk is asking the same servers the same way down: wait for it.
+                await asyncio.shield(self.walking[below])
+                continue
+            self.walking[below] = asyncio.get_running_loop().create_future()
+            try:
+                response = await self.ask(addresses, name, rdtype)
+            finally:
+                self.walking.pop(below).set_result(None)
+            if response is None:
+                return None
+            for rrset in response.answer:
+                if rrset.rdtype == rdtype and _name(rrset.name) == name:
+                    return [str(item) for item in rrset]
+            if response.rcode() != dns.rcode.NOERROR:
+                return []
+            zone = self._referral(response, cut, name)
+            if zone is None:
+                return []
+            if rdtype == dns.rdatatype.NS and zone == name:
+                # the NS of the zone are the ones of the referral.
+                return list(self.cuts[name])
+        return []
+
+    async def resolve_ns(self, zone):
+        return await self.walk(zone.lower(), dns.rdatatype.NS)
+
+    # the lookup of host in flight waits (through the lookups it waits for) for one of chain.
+    def _cycle(self, host, chain):
+        seen = set()
+        while host is not None and host not in seen:
+            if host in chain:
+                return True
+            seen.add(host)
+            host = self.waits_for.get(host)
+        return False
+
+    # the IPv4 addresses of an NS host (cached; one lookup at a time per host). chain: the hosts
+    # being looked up on the way to this one ([] when it comes back to one of them). None if
+    # servers did not answer: it is not cached, the next lookup asks again.
+    async def lookup_address(self, host, chain=()):
+        if host in self.addresses:
+            return self.addresses[host]
+        if host in chain or len(chain) >= max_depth or \
+                (host in self.looking_up and self._cycle(host, chain)):
+            self.stats["lame"] += 1
+            return []
+        # the innermost host of the chain now waits for this one.
+        if chain:
+            self.waits_for[chain[-1]] = host
+        try:
+            if host in self.looking_up:
+                return await asyncio.shield(self.looking_up[host])
+            future = self.looking_up[host] = asyncio.get_running_loop().create_future()
+            self.stats["address_lookups"] += 1
+            found = None
+            try:
+                found = await self.walk(host, dns.rdatatype.A, chain + (host,))
+            finally:
+                if found is not None:
+                    self.addresses[host] = found
+                self.looking_up.pop(host)
+                future.set_result(found)
+            return found
+        finally:
+            if chain:
+                self.waits_for.pop(chain[-1], None)
+
+
+# the glue of one zone in the format of <list>.glue.txt: "zone\tns host\taddress" per record,
+# "zone\t~NO~GLUE~" for a referral without glue.
+def format_glue(zone, glue):
+    if not glue:
+        return zone + "\t" + no_glue + "\n"
+    return "".join(zone + "\t" + host + "\t" + address + "\n"
+                   for host, addresses in glue.items() for address in addresses)
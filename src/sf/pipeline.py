@@ -0,0 +1,554 @@
+# the stages of the pipeline as functions, shared by the domrel CLI (domrel.py) and the
+# numbered scripts (1_findns.py, 2_build_dependency.py, 3_analyze_dependency.py, 4_draw_global.py,
+# 9_provider_graph.py).
+# every stage reads and writes the files of a list under data_dir, and returns what the next one
+# needs, so that stages chained in one process pass it in memory instead of reading it back:
+#   crawl(list)                                    -> domain_ns (the NS records)
+#   build(list, domain_ns=None)                    -> {"Global_graph_set", "metrics"}
+#   analyze(list, Global_graph_set=None, metrics=None) -> result (also analysis.json)
+#   export(list, Global_graph_set=None)            -> {mode: (nodes, links) written}
+#   providers(list, Global_graph_set=None)         -> {mode: (providers, zones, tiles...)}
+# None means: read it from data_dir. heavy modules (dnspython, tqdm, networkx, matplotlib) are
+# imported by the stage that needs them.
+# Python 3
+
+import os
+import time
+import json
+import pickle
+import contextlib
+import numpy as np
+from dep_graph import modes
+from instrument import stats
+
+###### GLOBAL CONFIG ######
+default_data_dir = "../data/"
+default_resolvers = ["223.5.5.5", "9.9.9.9"]
+# memory bound of the closure cache of each mode (total zones in the cached closures).
+closure_cache_size = 20000000
+default_tld_list = ["com", "net", "org", "xyz", "info", "top", "cc", "co", "io", "me", "cn", "tv",
+                    "ru", "de", "uk", "jp", "br", "pl", "fr", "eu"]
+extra_modes = ["general", "explicit", "critical"]
+colors = {"general": "g", "explicit": "b", "critical": "r"}
+
+
+###### FUNC ######
+# the domains of a list file, lowercased, in rank order.
+def read_list(domain_file):
+    domain_list = []
+    with open(domain_file) as inputf:
+        for line in inputf:
+            domain_list.append(line.strip().lower().split("\t")[0])
+    return domain_list
+
+
+### crawl (1_findns.py)
+# find the NS of the domains of a list and of everything they depend on, into
+# <list>.domain_ns_info.txt. returns the records as zone_index.load_domain_ns() reads them.
+# iterative: walk the delegations from the root servers (roots: their addresses, see
+# ns_iterative.py) instead of asking resolvers, and write the glue of the referrals to
+# <list>.glue.txt. the NS cache is not used then: a cached zone would not be walked, and its glue
+# would be missing. a crawl through resolvers removes the <list>.glue.txt of an older iterative
+# crawl (resume: the zones of the file keep their glue), it is not the glue of the new records.
+# the zones no server answered are not written: --resume asks them again.
+def crawl(ntype, data_dir=default_data_dir, resolvers=None, concurrency=64, qps=20, port=53,
+          timeout=2.0, retries=2, resume=False, cache_file=None, use_cache=True,
+          cache_ttl=None, negative_ttl=None, iterative=False, roots=None, edns_payload=1232):
+    from tqdm import tqdm
+    from ns_crawler import crawl as crawl_ns, read_results
+    from ns_cache import NSCache, default_ttl, default_negative_ttl
+    from zone_index import domain_ns_from_results
+
+    domain_list = read_list(data_dir+ntype+".list")
+    output_file = data_dir+ntype+".domain_ns_info.txt"
+    # zones resolved by the previous run.
+    done = {}
+    if resume:
+        with stats.timer("findns.resume"):
+            done = read_results(output_file)
+        print("[++] Resume with", len(done), "zones already resolved.")
+    cache = None
+    if use_cache and not iterative:
+        cache = NSCache(cache_file or data_dir+"ns_cache.sqlite",
+                        ttl=default_ttl if cache_ttl is None else cache_ttl,
+                        negative_ttl=default_negative_ttl if negative_ttl is None else negative_ttl)
+    resolver = None
+    if not iterative and not resume and os.path.exists(data_dir+ntype+".glue.txt"):
+        os.remove(data_dir+ntype+".glue.txt")
+        print("[++] Removed the glue of an older iterative crawl:", data_dir+ntype+".glue.txt")
+    if iterative:
+        from ns_iterative import IterativeResolver
+        resolver = IterativeResolver(roots, port=port, timeout=timeout, retries=retries, qps=qps,
+                                     edns_payload=edns_payload)
+
+    # begin query ns of these domains, as well as all domains in the ns records.
+    results = {}
+    outputf = open(output_file, "a" if resume else "w")
+    start = time.time()
+    try:
+        with tqdm(unit="zone") as progress, stats.timer("findns.crawl"):
+            crawl_stats = crawl_ns(domain_list, outputf, resolvers or default_resolvers,
+                                   concurrency=concurrency, qps=qps, port=port, timeout=timeout,
+                                   retries=retries, progress=progress, cache=cache, done=done,
+                                   results=results, iterative=resolver)
+    finally:
+        outputf.close()
+        if cache is not None:
+            cache.close()
+        if resolver is not None:
+            from ns_iterative import format_glue
+            with open(data_dir+ntype+".glue.txt", "a" if resume else "w") as gluef:
+                for zone, glue in resolver.glue.items():
+                    gluef.write(format_glue(zone, glue))
+    elapsed = time.time() - start
+    print("[++] zones:", crawl_stats["zones"], "queries:", crawl_stats["queries"],
+          "retries:", crawl_stats["retries"], "timeouts:", crawl_stats["timeouts"],
+          "no ns:", crawl_stats["no_ns"], "unanswered:", crawl_stats["unanswered"],
+          "errors:", crawl_stats["errors"], "cache hits:", crawl_stats["cache_hits"],
+          "resumed:", crawl_stats["resumed"],
+          "(%.1f zones/sec)" % (crawl_stats["zones"] / max(elapsed, 1e-9)))
+    if resolver is not None:
+        print("[++] iterative: referrals:", crawl_stats["referrals"], "cut hits:",
+              crawl_stats["cut_hits"], "tcp:", crawl_stats["tcp"], "address lookups:",
+              crawl_stats["address_lookups"], "lame:", crawl_stats["lame"],
+              "glue zones:", len(resolver.glue))
+    for k, v in crawl_stats.items():
+        stats.count("findns." + k, v)
+    latency = stats.histograms.get("dns.latency_ms")
+    if latency is not None:
+        print("[++] resolver latency: p50 < %gms, p99 < %gms, max %.1fms" % (
+            latency.quantile(0.5), latency.quantile(0.99), latency.max))
+    # the file holds the zones of the previous run first.
+    domain_ns = domain_ns_from_results(done)
+    return domain_ns_from_results(results, domain_ns)
+
+
+### build (2_build_dependency.py)
+# from the NS records (domain_ns, or <list>.domain_ns_info.txt), build and analyze the dependency
+# graph of the first limit domains of the list (0: all), streaming the outputs:
+#   <list>.metrics/, <list>.graph_set_global.bin, <list>.graph_set.dgf (the global graphs, and the
+#   per-domain ones with domain_graphs, see graph_file.py), <list>.graphs/ (graph_store),
+#   <list>.graph_set_per_domain.bin (pickle_graphs), pictures in graph/ (pictures).
+# returns {"Global_graph_set": {mode: G}, "metrics": the columns of <list>.metrics/ if
+# keep_metrics (they are held in memory as they are written), else None}.
+def build(ntype, data_dir=default_data_dir, domain_ns=None, limit=200, workers=1,
+          graph_store=False, pickle_graphs=False, pictures=True, render_workers=1,
+          save_graph_as_file=False, keep_metrics=False, domain_graphs=False):
+    from zone_index import load_domain_ns, load_snapshot_glue
+    from dep_graph import DepGraph, GlobalGraph
+    from dep_build import iter_build, materialize
+    from result_store import MetricsWriter, GraphWriter
+    from graph_file import GraphFileWriter, graph_file_path
+    from layout import LayoutCache, Renderer, mode_layouts
+
+    domain_file = data_dir+ntype+".list"
+    shard_dir = data_dir+ntype+".shards/"
+    metrics_dir = data_dir+ntype+".metrics/"
+    graph_store_dir = data_dir+ntype+".graphs/"
+    graph_output_dir = data_dir+"graph/"
+    layout_cache_dir = data_dir+"layout_cache/"
+
+    # all graphs. Graph_set[domain] = {"G_general": {"graph": G, "extrasize": 5, "avgextradepth", "maxextradepth"},
+    #                                  "G_explicit", "G_critical", "G_essential"}
+    # saved as <list>.graph_set_per_domain.bin (only with pickle_graphs: it holds every graph in memory)
+    Graph_set = {}
+    # global graphs. Global_graph_set = {"general": G, "explicit", "critical", "essential"}
+    Global_graph_set = {}
+
+    # on an exception, the render pool is terminated and the unfinished graph file removed.
+    with contextlib.ExitStack() as cleanup:
+        # the pool drawing the pictures, forked first: before the dependency graph is built, and
+        # before the build pool (see layout.Renderer).
+        renderer = cleanup.enter_context(Renderer(workers=render_workers if pictures else 0))
+
+        # read and store domain list from domain_file.
+        domain_list = read_list(domain_file)
+        print("[++] Domains in list:", len(domain_list))
+        # read and store (domain, ns) mappings. domain_ns[domain] = {ns1, ns2, ...}
+        if domain_ns is None:
+            with stats.timer("build.load_ns"):
+                domain_ns = load_domain_ns(data_dir+ntype+".domain_ns_info.txt")
+        print("[++] Zones in NS dict:", len(domain_ns))
+        # the glue seen by an iterative crawl, instead of guessing it from the names.
+        glue = load_snapshot_glue(data_dir+ntype+".domain_ns_info.txt")
+        if glue is not None:
+            print("[++] Zones with glue from the referrals:", len(glue))
+
+        # the dependency graph of each domain. 1. from NS record; 2. from the direct parent domain.
+        # mode is one of the following: "general", "explicit", "critical", "essential"
+        # (see dep_graph.py: the NS records are compiled once into integer arrays. the closure of
+        # each zone is computed once per mode and shared by all domains that depend on it. global
+        # graphs are built WHILE building individual ones.)
+        with stats.timer("build.dep_graph"):
+            dep = DepGraph(domain_ns, roots=domain_list, glue=glue)
+        print("[++] Zones in dependency graph:", len(dep))
+        if limit > 0:
+            domain_list = domain_list[:limit]
+
+        # build the graphs and metrics of all domains (see dep_build.py), streaming them out shard
+        # by shard. the pictures are laid out once (cached by graph content) and drawn by a pool
+        # (see layout.py).
+        layout_cache = LayoutCache(layout_cache_dir)
+        metrics_writer = MetricsWriter(metrics_dir, keep=keep_metrics)
+        graph_writer = GraphWriter(graph_store_dir, dep.names) if graph_store else None
+        graph_file_writer = cleanup.enter_context(
+            GraphFileWriter(graph_file_path(data_dir, ntype), dep.names))
+        global_zones = {mode: set() for mode in modes}
+        cache_stats = {}
+        rank = 0
+        build_start = time.perf_counter()
+        for raw, zones, shard_stats in iter_build(dep, domain_list, workers=workers,
+                                                  shard_dir=shard_dir,
+                                                  cache_size=closure_cache_size):
+            output_start = time.perf_counter()
+            for domain in raw:
+                metrics_writer.add(rank, domain, raw[domain])
+                rank += 1
+                if graph_writer is not None:
+                    graph_writer.add(domain, raw[domain])
+                if domain_graphs:
+                    graph_file_writer.add(domain, raw[domain])
+                for mode in modes:
+                    stats.count("build." + mode + ".nodes", raw[domain][mode]["nodes"])
+                    stats.count("build." + mode + ".edges", len(raw[domain][mode]["edges"]))
+
+                # show and save graphs.
+                draw = (save_graph_as_file or domain == "tsinghua.edu.cn") and pictures
+                if draw or pickle_graphs:
+                    G_set = materialize(dep, domain, raw[domain])
+                    if draw:
+                        graphs = {mode: G_set[mode]["graph"] for mode in modes}
+                        with stats.timer("build.layout"):
+                            pos = mode_layouts(graphs, layout_cache)
+                        for mode in modes:
+                            renderer.submit(graph_output_dir + domain + "." + mode + ".png",
+                                            graphs[mode], pos[mode])
+                    if pickle_graphs:
+                        Graph_set[domain] = G_set
+            stats.add_time("build.output", time.perf_counter() - output_start)
+            for mode in modes:
+                global_zones[mode] |= zones[mode]
+                for k, v in shard_stats[mode].items():
+                    cache_stats.setdefault(mode, {}).setdefault(k, 0)
+                    cache_stats[mode][k] += v
+            print("[+++++]", rank, "domains built.")
+        metrics_writer.close()
+        if graph_writer is not None:
+            graph_writer.close()
+        stats.add_time("build.domains", time.perf_counter() - build_start)
+        stats.count("build.domains", rank)
+
+        for mode in modes:
+            with stats.timer("build.global_graphs"):
+                global_edges = GlobalGraph(dep, mode)
+                global_edges.add(global_zones[mode])
+                Global_graph_set[mode] = global_edges.to_networkx()
+            stats.count("build." + mode + ".global_nodes", Global_graph_set[mode].number_of_nodes())
+            stats.count("build." + mode + ".global_edges", Global_graph_set[mode].number_of_edges())
+            for k, v in cache_stats[mode].items():
+                stats.count("build." + mode + ".closure_cache_" + k, v)
+            hits = cache_stats[mode]["hits"]
+            total = hits + cache_stats[mode]["misses"]
+            print("[++] Closure cache of", mode,
+                  "hit rate: %.3f" % (hits / total if total else 0.0), cache_stats[mode])
+
+        if pictures:
+            with stats.timer("build.layout"):
+                pos = mode_layouts(Global_graph_set, layout_cache)
+            for i in Global_graph_set:
+                renderer.submit(graph_output_dir + ntype + "." + i + ".png", Global_graph_set[i],
+                                pos[i])
+
+        with stats.timer("build.pickle"):
+            if pickle_graphs:
+                pickle.dump(Graph_set, open(data_dir+ntype+".graph_set_per_domain.bin", "wb"))
+            pickle.dump(Global_graph_set, open(data_dir+ntype+".graph_set_global.bin", "wb"))
+        with stats.timer("build.graph_file"):
+            graph_file_writer.set_global(Global_graph_set)
+            graph_file_writer.close()
+        if domain_graphs:
+            dedup = graph_file_writer.dedup_stats()
+            for k in ("graphs", "bodies", "edges", "stored_edges"):
+                stats.count("build.graph_file." + k, dedup[k])
+            print("[++] Per-domain graphs: %d, distinct shared bodies: %d (dedup ratio %.1f), "
+                  "edges stored: %d of %d" % (dedup["graphs"], dedup["bodies"],
+                                              dedup["dedup_ratio"], dedup["stored_edges"],
+                                              dedup["edges"]))
+        with stats.timer("build.render_wait"):
+            renderer.close()
+        stats.count("build.layout_cache_hits", layout_cache.hits)
+        stats.count("build.layout_cache_misses", layout_cache.misses)
+        print("[++] Layout cache hits:", layout_cache.hits, "misses:", layout_cache.misses)
+    return {"Global_graph_set": Global_graph_set,
+            "metrics": metrics_writer.table() if keep_metrics else None}
+
+
+### analyze (3_analyze_dependency.py)
+# sum of values (and count of rows) per group, for every extra mode at once.
+# group: int array (one group id per row), n_groups: number of groups.
+# returns sums[mode] and counts[mode], arrays of n_groups.
+def group_sum(metrics, values, group, n_groups):
+    mode_index = metrics["mode"].astype(np.int64)
+    key = mode_index * n_groups + group
+    sums = np.bincount(key, weights=values, minlength=len(modes) * n_groups)
+    counts = np.bincount(key, minlength=len(modes) * n_groups)
+    sums = sums.reshape(len(modes), n_groups)
+    counts = counts.reshape(len(modes), n_groups)
+    return ({mode: sums[modes.index(mode)] for mode in extra_modes},
+            {mode: counts[modes.index(mode)] for mode in extra_modes})
+
+
+def ratio(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return np.divide(a, b, out=np.full_like(a, np.nan), where=b != 0)
+
+
+def write_csv(output_dir, name, header, rows):
+    import csv
+    with open(os.path.join(output_dir, name), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def plot(plt, output_dir, x, y, xlabel, ylabel, name, show=False):
+    plt.clf()
+    for mode in extra_modes:
+        plt.plot(x, y[mode], 'o-', color=colors[mode], label="G_" + mode)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.legend(loc="best")
+    with stats.timer("analyze.plot"):
+        plt.savefig(os.path.join(output_dir, name))
+    if show:
+        plt.show()
+
+
+# values of the compared TLDs; tld_index[i] is the group of tld_list[i], -1 if absent.
+def per_tld(values, tld_index):
+    return np.where(tld_index >= 0, values[np.maximum(tld_index, 0)], np.nan)
+
+
+def as_list(array):
+    return [None if np.isnan(v) else float(v) for v in array]
+
+
+# output metrics of dependency analysis into <list>.analysis/ (plots as png, tables as csv,
+# everything in analysis.json). show: also show the plots (interactive backend).
+def analyze(ntype, data_dir=default_data_dir, Global_graph_set=None, metrics=None,
+            magnitude=10000, tld_list=None, top=50, rank_mode="critical", approx=False,
+            show=False):
+    import matplotlib
+    if not show:
+        # the plots are only saved: no GUI toolkit is loaded.
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from result_store import read_metrics
+    from reach_count import top_depended
+    from graph_file import load_global_graphs
+
+    output_dir = data_dir+ntype+".analysis/"
+    tld_list = default_tld_list if tld_list is None else tld_list
+    os.makedirs(output_dir, exist_ok=True)
+    # metrics of all domains: one row per (domain, mode), see result_store.py.
+    if metrics is None:
+        with stats.timer("analyze.read_metrics"):
+            metrics = read_metrics(data_dir+ntype+".metrics/")
+    n_domains = len(np.unique(metrics["rank"]))
+    print("[+]", n_domains, "domains in the Graph set.\n")
+    # global graphs. Global_graph_set = {"general": G, "explicit", "critical", "essential"}
+    # (memory-mapped from the graph file, see graph_file.py).
+    if Global_graph_set is None:
+        with stats.timer("analyze.load_graphs"):
+            Global_graph_set = load_global_graphs(data_dir, ntype)
+    stats.count("analyze.domains", n_domains)
+    stats.count("analyze.metric_rows", len(metrics["rank"]))
+    result = {"list": ntype, "domains": n_domains}
+
+    ### Global graph analysis.
+    # 1. relative density = |E(Global_graph)| / |E(Global_essential)|
+    Global_essential_edge_count = Global_graph_set["essential"].number_of_edges()
+    print("[+] Count of edges in Global graph of essential:", Global_essential_edge_count)
+    result["relative_density"] = {}
+    for mode in extra_modes:
+        edge_count = Global_graph_set[mode].number_of_edges()
+        RelativeDensity = edge_count / Global_essential_edge_count
+        result["relative_density"][mode] = RelativeDensity
+        print("[+] RelativeDensity of", mode, "is", RelativeDensity)
+
+    # 2. the indegree of each node (the most depended domains).
+    # TODO: the distribution of global indegree.
+    print("\n[+] The indegree of top", top, "nodes (excluding TLDs) in", rank_mode + ":")
+    # the indegree in the closure of the graph, counted without building the closure (see
+    # reach_count.py).
+    result["top_depended"] = []
+    with stats.timer("analyze.top_depended"):
+        items = top_depended(Global_graph_set[rank_mode], top, exact=not approx)
+    for item in items:
+        print("\t", item)
+        result["top_depended"].append(list(item))
+    write_csv(output_dir, "top_depended.csv", ["zone", "indegree"], result["top_depended"])
+
+    ### Individual graph analysis (group-bys over the metrics table, all modes at once).
+    extrasize = metrics["extrasize"].astype(np.float64)
+    non_empty = (metrics["extrasize"] > 0).astype(np.float64)
+    # 1. distribution of ExtraSize, MaxExtraDepth, AvgExtraDepth.
+    # has_zn: count of domains that has non-essential dependency (non-empty Zn).
+    # avg_zn: the avg length of non-empty Zn.
+    one_group = np.zeros(len(extrasize), dtype=np.int64)
+    has_zn, count = group_sum(metrics, non_empty, one_group, 1)
+    sum_zn, _ = group_sum(metrics, extrasize, one_group, 1)
+    max_extra_depth_under_4, _ = group_sum(
+        metrics, (metrics["maxextradepth"] < 4).astype(np.float64), one_group, 1)
+    summary = []
+    print("\n[+] domains with non-essential dependency: ")
+    for mode in extra_modes:
+        summary.append([mode, int(count[mode][0]), int(has_zn[mode][0]),
+                        has_zn[mode][0] / count[mode][0], ratio(sum_zn[mode], has_zn[mode])[0],
+                        int(max_extra_depth_under_4[mode][0]),
+                        max_extra_depth_under_4[mode][0] / count[mode][0]])
+        print(mode, "count:", summary[-1][2], "pct:", summary[-1][3], "avg:", summary[-1][4])
+    print("\n[+] domains with max-extra-depth < 4: ")
+    for row in summary:
+        print(row[0], "count:", row[5], "pct:", row[6])
+    write_csv(output_dir, "summary.csv", ["mode", "domains", "has_zn", "has_zn_pct", "avg_zn",
+                                          "max_extra_depth_under_4", "max_extra_depth_under_4_pct"],
+              summary)
+    result["summary"] = [dict(zip(["mode", "domains", "has_zn", "has_zn_pct", "avg_zn",
+                                   "max_extra_depth_under_4", "max_extra_depth_under_4_pct"], row))
+                         for row in summary]
+
+    # 2. relationship between domain rank & |Zn|
+    # concentrate magnitude domains in one dot. the last dot may hold fewer domains.
+    bucket = metrics["rank"] // magnitude
+    n_buckets = int(bucket.max()) + 1 if len(bucket) else 0
+    sum_zn, count = group_sum(metrics, extrasize, bucket, n_buckets)
+    x = [i * magnitude for i in range(n_buckets)]
+    y = {mode: ratio(sum_zn[mode], count[mode]) for mode in extra_modes}
+    plot(plt, output_dir, x, y, "Domain ranking", "Avg # extra dependency", "rank.png", show)
+    write_csv(output_dir, "rank.csv", ["rank", "domains"] + extra_modes,
+              [[x[i], int(count["general"][i])] + [y[mode][i] for mode in extra_modes]
+               for i in range(n_buckets)])
+    result["rank"] = {"magnitude": magnitude, "x": x,
+                      "avg_zn": {mode: as_list(y[mode]) for mode in extra_modes}}
+
+    # 3. relationship between |Zn| and TLD.
+    # split domains according to TLDs.
+    tlds, tld_group = np.unique(np.char.rpartition(metrics["domain"], b".")[:, 2],
+                                return_inverse=True)
+    tlds = [tld.decode() for tld in tlds]
+    sum_zn, count = group_sum(metrics, extrasize, tld_group.ravel(), len(tlds))
+    non_empty_zn, _ = group_sum(metrics, non_empty, tld_group.ravel(), len(tlds))
+    # the TLDs to compare. a TLD absent from the list gets no value.
+    tld_index = np.array([tlds.index(tld) if tld in tlds else -1 for tld in tld_list],
+                         dtype=np.int64)
+    y_avg = {mode: per_tld(ratio(sum_zn[mode], count[mode]), tld_index) for mode in extra_modes}
+    y_non_empty = {mode: per_tld(ratio(non_empty_zn[mode], count[mode]), tld_index)
+                   for mode in extra_modes}
+    # draw the results. first the avg |Zn| graph per TLD.
+    plot(plt, output_dir, tld_list, y_avg, "TLD", "Avg # extra dependency", "tld_avg_zn.png",
+         show)
+    # draw the results. the ratio of domains with non-empty |Zn| graph per TLD.
+    plot(plt, output_dir, tld_list, y_non_empty, "TLD",
+         "% Domains with non-empty extra dependencies", "tld_non_empty_zn.png", show)
+    # all TLDs go to the table, not only the compared ones.
+    write_csv(output_dir, "tld.csv", ["tld", "domains"]
+              + ["avg_zn_" + mode for mode in extra_modes]
+              + ["non_empty_zn_" + mode for mode in extra_modes],
+              [[tld, int(count["general"][i])]
+               + [ratio(sum_zn[mode], count[mode])[i] for mode in extra_modes]
+               + [ratio(non_empty_zn[mode], count[mode])[i] for mode in extra_modes]
+               for i, tld in enumerate(tlds)])
+    result["tld"] = {"tld": tld_list,
+                     "avg_zn": {mode: as_list(y_avg[mode]) for mode in extra_modes},
+                     "non_empty_zn": {mode: as_list(y_non_empty[mode]) for mode in extra_modes}}
+
+    with open(os.path.join(output_dir, "analysis.json"), "w") as f:
+        json.dump(result, f, indent=2)
+    print("\n[+] Results in", output_dir)
+    return result
+
+
+### export (4_draw_global.py)
+# the drawing js of the global graph of each mode, <list>.global_graph/global_graph_<mode>.js
+# (webkitDep=..., see graph_export.py). the entire graph is tooooo big: only the nodes with an
+# in or out degree over degree_limit are drawn, at most top of them (0: all).
+def export(ntype, data_dir=default_data_dir, Global_graph_set=None, export_modes=None,
+           degree_limit=2, top=0):
+    from graph_export import edge_arrays, degrees, select_nodes, write_webkitdep
+    from graph_file import load_global_graphs
+
+    output_dir = data_dir+ntype+".global_graph/"
+    output_filename = output_dir + "global_graph_"       # global_graph_(type).js
+    os.makedirs(output_dir, exist_ok=True)
+    # global graphs. Global_graph_set = {"general": G, "explicit", "critical", "essential"}
+    # (memory-mapped from the graph file, see graph_file.py).
+    if Global_graph_set is None:
+        with stats.timer("export.load_graphs"):
+            Global_graph_set = load_global_graphs(data_dir, ntype)
+
+    written = {}
+    for mode in export_modes or modes:
+        start = time.perf_counter()
+        with stats.timer("export.edge_arrays"):
+            nodes, src, dst = edge_arrays(Global_graph_set[mode])
+        with stats.timer("export.select"):
+            in_degree, out_degree = degrees(len(nodes), src, dst)
+            keep = select_nodes(in_degree, out_degree, degree_limit, top)
+        with stats.timer("export.write"), open(output_filename + mode + ".js", "w") as outputf:
+            n_nodes, n_links = write_webkitdep(outputf, nodes, src, dst, keep)
+        stats.count("export." + mode + ".nodes", n_nodes)
+        stats.count("export." + mode + ".links", n_links)
+        written[mode] = (n_nodes, n_links)
+        print("[+] %s: %d of %d nodes, %d links in %.3fs -> %s" % (
+            mode, n_nodes, len(nodes), n_links, time.perf_counter() - start,
+            output_filename + mode + ".js"))
+    return written
+
+
+### providers (9_provider_graph.py)
+# the global graph of each mode collapsed into providers (operators: naming families, AS of the
+# NS, registrars, cycles), written as the tiles provider -> zone -> domain of a viewer in
+# <list>.providers/<mode>/ (see provider_graph.py). the domains are the ones of the list, the
+# AS and registrars come from the enrichment (domains_a_as_register.json) and ns_registrar.csv.
+def providers(ntype, data_dir=default_data_dir, Global_graph_set=None, domain_ns=None,
+              provider_modes=None, tile_size=500):
+    from zone_index import load_domain_ns
+    from enrich import load_registrars
+    from graph_export import edge_arrays
+    from graph_file import load_global_graphs
+    from provider_graph import collapse, write_tiles, load_enriched
+
+    output_dir = data_dir+ntype+".providers/"
+    if Global_graph_set is None:
+        with stats.timer("providers.load_graphs"):
+            Global_graph_set = load_global_graphs(data_dir, ntype)
+    with stats.timer("providers.load_labels"):
+        if domain_ns is None:
+            domain_ns = load_domain_ns(data_dir+ntype+".domain_ns_info.txt")
+        enriched = load_enriched(data_dir, ntype)
+        registrars = {}
+        if os.path.exists(data_dir+"ns_registrar.csv"):
+            registrars = load_registrars(data_dir+"ns_registrar.csv")
+        domain_list = read_list(data_dir+ntype+".list") if os.path.exists(data_dir+ntype+".list") \
+            else None
+    print("[++] Names enriched:", len(enriched), "zones with a registrar:", len(registrars))
+
+    written = {}
+    for mode in provider_modes or modes:
+        start = time.perf_counter()
+        with stats.timer("providers.edge_arrays"):
+            nodes, src, dst = edge_arrays(Global_graph_set[mode])
+        with stats.timer("providers.collapse"):
+            collapsed = collapse(nodes, src, dst, domain_list, domain_ns, enriched, registrars)
+        with stats.timer("providers.write"):
+            tiles = write_tiles(output_dir + mode + "/", collapsed, tile_size,
+                                meta={"list": ntype, "mode": mode})
+        stats.count("providers." + mode + ".providers", len(collapsed["names"]))
+        written[mode] = (len(collapsed["names"]), len(collapsed["zone_order"])) + tiles
+        print("[+] %s: %d nodes -> %d providers (%d cycles), %d zone tiles, %d domain tiles in "
+              "%.3fs -> %s" % (mode, len(collapsed["nodes"]), len(collapsed["names"]),
+                               collapsed["cycles"], tiles[0], tiles[1],
+                               time.perf_counter() - start, output_dir + mode + "/index.json"))
+    return written
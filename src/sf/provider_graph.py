@@ -0,0 +1,283 @@
+# provider-level collapse of a global dependency graph, and its export as lazily loadable tiles
+# (the providers stage, 9_provider_graph.py). instead of dropping the nodes of low degree (as
+# 4_draw_global.py does), every zone is put into the super-node of its operator:
+#   - family: zones named as one numbered series (awsdns-13.com, awsdns-cn-59.cn: "awsdns-*"),
+#     when at least two zones of the graph share it.
+#   - AS: the most common AS of the addresses of the NS hosts of the zone
+#     (domains_a_as_register.json, or <list>.a_as_register.jsonl of 1_enrich.py).
+#   - registrar: of the zone (REGISTER of the enrichment, or else ns_registrar.csv). only after
+#     the AS, a registrar such as MarkMonitor holds zones of many unrelated operators.
+#   - the root and the TLDs, then every other zone, stay on their own.
+# the zones of a cycle (strongly connected component: com, net, gtld-servers.net, nstld.com)
+# depend on each other and are collapsed into one provider, the one of the best label among them.
+# the domains are the ones of the list (or, without it, the nodes nothing depends on); a domain
+# that something depends on is a zone too.
+# the weights are group-bys over the edge arrays (np.unique of combined keys, np.bincount), and
+# the hierarchy provider -> zone -> domain is written in <list>.providers/<mode>/:
+#   index.json        {"providers": [{"id", "name", "kind", "zones", "domains", "examples",
+#                     "zone_tiles": [first, last]}], "links": [[provider, provider, edges]], ...}
+#                     providers by domains depending on them, links from the dependent provider.
+#   zones/<t>.json    {"zones": [{"name", "provider", "domains", "domain_tiles": [first, last],
+#                     "depends": [[zone, provider]], "used_by": {provider: zones}}]}, at most
+#                     tile_size zones, in the order of the providers.
+#   domains/<t>.json  {"zones": {zone: [domains]}}: the domains depending directly on each zone,
+#                     at most tile_size of them (the list of a zone may go on in the next tile).
+# a viewer loads the index, then the tiles of the provider or zone it opens.
+# Python 3
+
+import os
+import re
+import json
+import shutil
+import numpy as np
+from collections import Counter
+
+###### GLOBAL CONFIG ######
+default_tile_size = 500
+# first label of a family member: name-13, name-cn-59.
+family_pattern = re.compile(r"^([a-z][a-z0-9]*)-(?:[a-z]+-)*\d+$")
+# kinds of providers, the best first (the label kept by a cycle).
+kinds = ["family", "as", "registrar", "tld", "zone"]
+examples = 3
+
+
+###### FUNC ######
+def family_of(zone):
+    match = family_pattern.match(zone.split(".", 1)[0])
+    return match.group(1) if match else None
+
+
+# "MarkMonitor, Inc." and "MarkMonitor. Inc." (ns_registrar.csv has no commas) as one key.
+def registrar_key(registrar):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", registrar.lower()).split())
+
+
+# the most common AS of the NS hosts of a zone (the smallest on a tie), None if unknown.
+def as_of(zone, domain_ns, enriched):
+    counts = Counter()
+    for ns in domain_ns.get(zone, ()):
+        counts.update(enriched.get(ns.lower(), {}).get("AS") or ())
+    if not counts:
+        return None
+    return min(counts.items(), key=lambda item: (-item[1], item[0]))[0]
+
+
+# the label (key, kind, name) of every zone, by itself.
+def zone_labels(zones, domain_ns, enriched, registrars):
+    from enrich import registrar_of
+    families = [family_of(zone) for zone in zones]
+    family_count = Counter(family for family in families if family)
+    labels = []
+    for zone, family in zip(zones, families):
+        if family and family_count[family] > 1:
+            labels.append(("family:" + family, "family", family + "-*"))
+            continue
+        if zone == "." or "." not in zone:
+            labels.append(("tld:" + zone, "tld", zone))
+            continue
+        asn = as_of(zone, domain_ns, enriched)
+        if asn is not None:
+            labels.append(("as:%d" % asn, "as", "AS%d" % asn))
+            continue
+        registrar = (enriched.get(zone) or {}).get("REGISTER") or registrar_of(zone, registrars)
+        if registrar and registrar_key(registrar):
+            labels.append(("registrar:" + registrar_key(registrar), "registrar", registrar))
+            continue
+        labels.append(("zone:" + zone, "zone", zone))
+    return labels
+
+
+# every nontrivial strongly connected component takes the best label of its members (by kind,
+# then the most common among them, then the key).
+def merge_cycles(n, src, dst, zone_ids, labels):
+    from reach_count import scc
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    comp = np.asarray(scc(indptr, dst[order]))
+    size = np.bincount(comp)
+    position = {int(node): i for i, node in enumerate(zone_ids)}
+    members = {}
+    for node in np.flatnonzero(size[comp] > 1):
+        members.setdefault(int(comp[node]), []).append(position[int(node)])
+    for cycle in members.values():
+        counts = Counter(labels[i][0] for i in cycle)
+        best = min((labels[i] for i in cycle),
+                   key=lambda label: (kinds.index(label[1]), -counts[label[0]], label[0]))
+        for i in cycle:
+            labels[i] = best
+    return len(members)
+
+
+# start of the run of every value of a sorted array, as a CSR indptr over n values.
+def _indptr(sorted_values, n):
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sorted_values, minlength=n), out=indptr[1:])
+    return indptr
+
+
+# collapse a graph into providers. nodes, src, dst: as graph_export.edge_arrays(). domains: names
+# of the list (None: the nodes nothing depends on). domain_ns: the NS of the zones, enriched:
+# {name: {"AS", "REGISTER"}}, registrars: enrich.load_registrars().
+# returns the collapsed graph as a dict of arrays (see write_tiles()).
+def collapse(nodes, src, dst, domains=None, domain_ns=None, enriched=None, registrars=None):
+    nodes = list(nodes)
+    n = len(nodes)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    in_degree = np.bincount(dst, minlength=n)
+    if domains is None:
+        is_domain = in_degree == 0
+    else:
+        domains = set(domains)
+        is_domain = np.fromiter((node in domains for node in nodes), dtype=bool, count=n)
+    is_zone = (in_degree > 0) | ~is_domain
+    zone_ids = np.flatnonzero(is_zone)
+
+    labels = zone_labels([nodes[i] for i in zone_ids], domain_ns or {}, enriched or {},
+                         registrars or {})
+    cycles = merge_cycles(n, src, dst, zone_ids, labels)
+    # one provider per key (the first label of it names it: a registrar is not spelled the same
+    # in the two sources).
+    keys = {}
+    names = []
+    label_of = np.empty(len(zone_ids), dtype=np.int64)
+    for i, label in enumerate(labels):
+        if label[0] not in keys:
+            keys[label[0]] = len(names)
+            names.append(label)
+        label_of[i] = keys[label[0]]
+    p = len(names)
+
+    # group-bys over the edges: zone -> zone, and domain -> zone (pairs counted once).
+    prov = np.full(n, -1, dtype=np.int64)
+    prov[zone_ids] = label_of
+    zone_edge = is_zone[src] & is_zone[dst]
+    domain_edge = is_domain[src] & is_zone[dst]
+    zone_domains = np.bincount(dst[domain_edge], minlength=n)
+    pairs = np.unique(src[domain_edge] * p + prov[dst[domain_edge]])
+    provider_domains = np.bincount(pairs % p, minlength=p)
+    provider_zones = np.bincount(label_of, minlength=p)
+
+    # providers by domains then zones, renumbered in that order.
+    rank = np.lexsort((np.arange(p), -provider_zones, -provider_domains))
+    renumber = np.empty(p, dtype=np.int64)
+    renumber[rank] = np.arange(p)
+    prov[zone_ids] = renumber[label_of]
+    provider_domains = provider_domains[rank]
+    provider_zones = provider_zones[rank]
+    names = [names[i] for i in rank]
+
+    zs, zd = src[zone_edge], dst[zone_edge]
+    cross = prov[zs] != prov[zd]
+    link_keys, link_weights = np.unique(prov[zs[cross]] * p + prov[zd[cross]], return_counts=True)
+    used_keys, used_counts = np.unique(zd * p + prov[zs], return_counts=True)
+
+    # zones by provider, then by domains depending on them, then by name.
+    zone_order = zone_ids[np.lexsort((zone_ids, -zone_domains[zone_ids], prov[zone_ids]))]
+    return {"nodes": nodes, "prov": prov, "names": names, "provider_domains": provider_domains,
+            "provider_zones": provider_zones, "zone_order": zone_order,
+            "zone_domains": zone_domains, "links": (link_keys // p, link_keys % p, link_weights),
+            "used_by": (used_keys // p, used_keys % p, used_counts), "depends": (zs, zd),
+            "domain_edges": (src[domain_edge], dst[domain_edge]), "cycles": cycles,
+            "domains": int(is_domain.sum())}
+
+
+def _write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+# write the tiles of a collapsed graph in output_dir (replacing the ones already there).
+# returns (zone tiles, domain tiles).
+def write_tiles(output_dir, collapsed, tile_size=default_tile_size, meta=None):
+    nodes, prov = collapsed["nodes"], collapsed["prov"]
+    n = len(nodes)
+    zone_order = collapsed["zone_order"]
+    zone_domains = collapsed["zone_domains"]
+    position = np.full(n, -1, dtype=np.int64)
+    position[zone_order] = np.arange(len(zone_order))
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir + "zones")
+    os.makedirs(output_dir + "domains")
+
+    # domains: (zone, domain) pairs in the order of the zones, cut every tile_size pairs.
+    domain_src, domain_dst = collapsed["domain_edges"]
+    order = np.lexsort((domain_src, position[domain_dst]))
+    domain_src, domain_dst = domain_src[order], domain_dst[order]
+    domain_tile = np.arange(len(domain_src)) // tile_size
+    first_pair = np.searchsorted(position[domain_dst], np.arange(len(zone_order)))
+    n_domain_tiles = int(domain_tile[-1]) + 1 if len(domain_tile) else 0
+    for t in range(n_domain_tiles):
+        tile = {}
+        for s, d in zip(domain_src[t * tile_size:(t + 1) * tile_size].tolist(),
+                        domain_dst[t * tile_size:(t + 1) * tile_size].tolist()):
+            tile.setdefault(nodes[d], []).append(nodes[s])
+        _write_json("%sdomains/%d.json" % (output_dir, t), {"tile": t, "zones": tile})
+
+    # the edges out of and into each zone, grouped by zone.
+    depend_src, depend_dst = collapsed["depends"]
+    order = np.argsort(depend_src, kind="stable")
+    depend_src, depend_dst = depend_src[order], depend_dst[order]
+    depend_ptr = _indptr(depend_src, n)
+    used_zone, used_provider, used_count = collapsed["used_by"]
+    used_ptr = _indptr(used_zone, n)
+
+    zone_tile = np.arange(len(zone_order)) // tile_size
+    n_zone_tiles = int(zone_tile[-1]) + 1 if len(zone_tile) else 0
+    for t in range(n_zone_tiles):
+        tile = []
+        for i in range(t * tile_size, min((t + 1) * tile_size, len(zone_order))):
+            z = int(zone_order[i])
+            zone = {"name": nodes[z], "provider": int(prov[z]), "domains": int(zone_domains[z])}
+            if zone_domains[z]:
+                zone["domain_tiles"] = [int(domain_tile[first_pair[i]]),
+                                        int(domain_tile[first_pair[i] + zone_domains[z] - 1])]
+            zone["depends"] = [[nodes[d], int(prov[d])]
+                               for d in depend_dst[depend_ptr[z]:depend_ptr[z + 1]].tolist()]
+            zone["used_by"] = {str(q): c for q, c in zip(
+                used_provider[used_ptr[z]:used_ptr[z + 1]].tolist(),
+                used_count[used_ptr[z]:used_ptr[z + 1]].tolist())}
+            tile.append(zone)
+        _write_json("%szones/%d.json" % (output_dir, t), {"tile": t, "zones": tile})
+
+    # the index: providers and the weighted links between them.
+    zone_start = np.searchsorted(prov[zone_order], np.arange(len(collapsed["names"])))
+    providers = []
+    for q, (key, kind, name) in enumerate(collapsed["names"]):
+        first = int(zone_start[q])
+        count = int(collapsed["provider_zones"][q])
+        providers.append({
+            "id": q, "name": name, "kind": kind, "zones": count,
+            "domains": int(collapsed["provider_domains"][q]),
+            "examples": [nodes[z] for z in zone_order[first:first + min(count, examples)].tolist()],
+            "zone_tiles": [int(zone_tile[first]), int(zone_tile[first + count - 1])]})
+    link_src, link_dst, link_weight = collapsed["links"]
+    order = np.lexsort((link_dst, link_src, -link_weight))
+    index = dict(meta or {})
+    index.update({"tile_size": tile_size, "zones": len(zone_order),
+                  "domains": collapsed["domains"], "cycles": collapsed["cycles"],
+                  "zone_tiles": n_zone_tiles, "domain_tiles": n_domain_tiles,
+                  "providers": providers,
+                  "links": [[a, b, w] for a, b, w in zip(link_src[order].tolist(),
+                                                          link_dst[order].tolist(),
+                                                          link_weight[order].tolist())]})
+    _write_json(output_dir + "index.json", index)
+    return n_zone_tiles, n_domain_tiles
+
+
+# the enrichment of the names: <list>.a_as_register.jsonl of 1_enrich.py if there is one, or
+# else domains_a_as_register.json ({} if neither).
+def load_enriched(data_dir, ntype):
+    from enrich import to_dict
+    jsonl_file = data_dir + ntype + ".a_as_register.jsonl"
+    if os.path.exists(jsonl_file):
+        return to_dict(jsonl_file)
+    json_file = data_dir + "domains_a_as_register.json"
+    if os.path.exists(json_file):
+        with open(json_file) as f:
+            return {name.lower(): record for name, record in json.load(f).items()}
+    return {}
@@ -0,0 +1,219 @@
+# in-memory index of a domain_ns_info.txt for on-demand queries (used by query_server.py).
+# the NS records are loaded once into
+#   - a forward index: the compiled dependency graph (dep_graph.DepGraph) with its closure caches,
+#   - a reverse NS index: ns_zones[ns host] = zones listing it as NS,
+#   - the reverse edges of every mode (DepGraph.reach_mask), for "who depends on",
+#   - a suffix trie of the zones, for the closest enclosing zone of any name and the zones under
+#     a suffix.
+# the graphs and metrics of a domain are built lazily (dep_build.build_domain) and every answer
+# is kept in an LRU cache of results.
+# Python 3
+
+import threading
+import numpy as np
+from collections import OrderedDict
+from zone_index import intern_name
+from dep_graph import DepGraph, modes
+from dep_build import build_domain, new_caches
+
+###### GLOBAL CONFIG ######
+default_result_cache = 10000        # answers kept in the LRU.
+default_closure_cache = 20000000    # zones of the cached closures of each mode.
+# what LRUCache.get() returns for a key not in the cache (None is a value: an unknown name).
+absent = object()
+
+
+###### FUNC ######
+class LRUCache:
+    def __init__(self, max_entries=default_result_cache):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        value = self.cache.get(key, absent)
+        if value is absent:
+            self.stats["misses"] += 1
+            return absent
+        self.stats["hits"] += 1
+        self.cache.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def __len__(self):
+        return len(self.cache)
+
+
+# zones by their labels from the TLD down: "sjtu.edu.cn" is at ["cn"]["edu"]["sjtu"].
+# a node is a dict of children, the None key marks a zone.
+class SuffixTrie:
+    def __init__(self, names=()):
+        self.root = {}
+        self.size = 0
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        node = self.root
+        for label in reversed(name.split(".")):
+            node = node.setdefault(label, {})
+        if None not in node:
+            node[None] = name
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    # the longest zone that is name or one of its parents, None if there is none.
+    def closest(self, name):
+        node = self.root
+        found = None
+        for label in reversed(name.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+    # the zones under suffix (itself included), depth first, at most limit of them.
+    def under(self, suffix, limit=None):
+        node = self.root
+        for label in reversed(suffix.split(".")):
+            node = node.get(label)
+            if node is None:
+                return []
+        result = []
+        stack = [node]
+        while stack and (limit is None or len(result) < limit):
+            node = stack.pop()
+            if None in node:
+                result.append(node[None])
+            stack.extend(child for label, child in node.items() if label is not None)
+        return result
+
+
+class QueryIndex:
+    # domain_ns[domain] = {ns1, ns2, ...} (see zone_index.py). domains: the domain list, in rank
+    # order (the domains answered by dependents()). glue: of the referrals, as in the build.
+    def __init__(self, domain_ns, domains=(), result_cache=default_result_cache,
+                 closure_cache=default_closure_cache, glue=None):
+        self.dep = DepGraph(domain_ns, roots=domains, glue=glue)
+        self.caches = new_caches(self.dep, closure_cache)
+        self.results = LRUCache(result_cache)
+        # the threads of the server share the caches: the lock guards the results, closure_lock
+        # the closure caches (the rest of the index is only read).
+        self.lock = threading.Lock()
+        self.closure_lock = threading.Lock()
+        self.domain_ns = domain_ns
+        self.ns_zones = {}
+        for zone, ns_set in domain_ns.items():
+            for ns in ns_set:
+                self.ns_zones.setdefault(ns.lower(), []).append(zone)
+        self.trie = SuffixTrie(domain_ns)
+        ids = self.dep.ids
+        self.domains = [intern_name(domain) for domain in domains]
+        self.domain_ids = np.array([ids[domain] for domain in self.domains], dtype=np.int64)
+
+    # the name itself if the index knows it, else its closest enclosing zone (None: unknown).
+    def resolve(self, name):
+        name = name.strip().lower().rstrip(".")
+        if name in self.dep.ids:
+            return name
+        return self.trie.closest(name)
+
+    # the answer of key, computed outside of the lock on a miss (two threads missing the same key
+    # both compute it, the answers are the same).
+    def _cached(self, key, compute):
+        with self.lock:
+            value = self.results.get(key)
+        if value is absent:
+            value = compute()
+            with self.lock:
+                self.results.put(key, value)
+        return value
+
+    def _build(self, zone):
+        with self.closure_lock:
+            return build_domain(self.dep, self.caches, zone)[0]
+
+    def _raw(self, zone):
+        return self._cached(("raw", zone), lambda: self._build(zone))
+
+    # what the index has on a name: its zone, NS records, the zones listing it as NS and its
+    # parents. None if unknown.
+    def zone(self, name):
+        name = name.strip().lower().rstrip(".")
+        zone = self.resolve(name)
+        if zone is None and name not in self.ns_zones:
+            return None
+        return {"name": name, "zone": zone,
+                "ns": list(self.domain_ns.get(zone, ())) if zone else [],
+                "ns_of": self.ns_zones.get(name, []),
+                "parents": _parents(self.dep, zone) if zone else []}
+
+    # the metrics of a domain in every mode, as in the metrics store.
+    def metrics(self, name):
+        zone = self.resolve(name)
+        if zone is None:
+            return None
+        raw = self._raw(zone)
+        return {"name": name, "zone": zone, "modes": {
+            mode: {"nodes": raw[mode]["nodes"], "edges": len(raw[mode]["edges"]),
+                   "extrasize": raw[mode].get("extrasize", 0),
+                   "avgextradepth": raw[mode].get("avgextradepth", 0),
+                   "maxextradepth": raw[mode].get("maxextradepth", 0)} for mode in modes}}
+
+    # the dependency graph of a domain in one mode: its zones and edges (names).
+    def graph(self, name, mode="critical"):
+        zone = self.resolve(name)
+        if zone is None:
+            return None
+        raw = self._raw(zone)
+        names = self.dep.names
+        edges = raw[mode]["edges"].tolist()
+        nodes = {zone: None}
+        for u, v in edges:
+            nodes[names[u]] = None
+            nodes[names[v]] = None
+        return {"name": name, "zone": zone, "mode": mode, "nodes": list(nodes),
+                "edges": [[names[u], names[v]] for u, v in edges]}
+
+    # the domains of the list depending on a zone or an NS host in one mode, in rank order.
+    # an NS host is depended upon by the zones listing it, and by everything depending on them.
+    def dependents(self, name, mode="critical", limit=100):
+        name = name.strip().lower().rstrip(".")
+
+        def compute():
+            ids = self.dep.ids
+            starts = [ids[zone] for zone in self.ns_zones.get(name, ())]
+            if name in ids:
+                starts.append(ids[name])
+            if not starts:
+                return None
+            seen = self.dep.reach_mask(starts, mode, reverse=True)
+            hit = self.domain_ids[seen[self.domain_ids]].tolist()
+            return {"name": name, "mode": mode, "zones": int(seen.sum()), "domains": len(hit),
+                    "top": [self.dep.names[i] for i in hit[:limit]]}
+        return self._cached(("dependents", name, mode, limit), compute)
+
+    def stats(self):
+        return {"zones": len(self.dep), "ns_hosts": len(self.ns_zones),
+                "domains": len(self.domains), "results": len(self.results),
+                "result_cache": dict(self.results.stats),
+                "closure_cache": {mode: dict(self.caches[mode].stats) for mode in modes}}
+
+
+# the parents of a zone, root excluded.
+def _parents(dep, zone):
+    parents = []
+    i = dep.parent[dep.ids[zone]]
+    while i > 0:
+        parents.append(dep.names[i])
+        i = dep.parent[i]
+    return parents
@@ -0,0 +1,102 @@
+# HTTP (TCP or Unix socket) front of a query_index.QueryIndex (used by 7_query_service.py).
+# GET endpoints, JSON answers (404 when the name is unknown, 400 on bad parameters):
+#   /graph?name=tsinghua.edu.cn&mode=critical   zones and edges of the graph of a domain
+#   /metrics?name=tsinghua.edu.cn               its metrics in every mode
+#   /dependents?name=dns.edu.cn&mode=critical&limit=100
+#                                               the domains of the list depending on a zone or NS
+#   /zone?name=www.tsinghua.edu.cn              NS records, closest zone and parents of a name
+#   /under?name=edu.cn&limit=100                the zones of the index under a suffix
+#   /stats                                      sizes and cache counters
+# connections are kept alive (HTTP/1.1), one thread per connection.
+# Python 3
+
+import os
+import json
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from dep_graph import modes
+
+###### GLOBAL CONFIG ######
+default_limit = 100
+
+
+###### FUNC ######
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes: do not let them wait for the ACK of each other.
+    disable_nagle_algorithm = True
+    # set by make_server().
+    index = None
+    quiet = True
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        name = params.get("name", "")
+        mode = params.get("mode", "critical")
+        try:
+            limit = int(params.get("limit", default_limit))
+        except ValueError:
+            return self._send(400, {"error": "bad limit"})
+        if mode not in modes:
+            return self._send(400, {"error": "unknown mode " + mode})
+        index = self.index
+        if url.path == "/stats":
+            return self._send(200, index.stats())
+        if not name:
+            return self._send(400, {"error": "missing name"})
+        if url.path == "/graph":
+            result = index.graph(name, mode)
+        elif url.path == "/metrics":
+            result = index.metrics(name)
+        elif url.path == "/dependents":
+            result = index.dependents(name, mode, limit)
+        elif url.path == "/zone":
+            result = index.zone(name)
+        elif url.path == "/under":
+            result = {"name": name, "zones": index.trie.under(name.lower().rstrip("."), limit)}
+        else:
+            return self._send(404, {"error": "unknown endpoint " + url.path})
+        if result is None:
+            return self._send(404, {"error": "unknown name " + name})
+        self._send(200, result)
+
+    # the client address of a Unix socket is a str.
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+# a server of index on host:port, or on the Unix socket at unix. serve with serve_forever().
+def make_server(index, host="127.0.0.1", port=8053, unix=None, quiet=True):
+    handler = type("BoundQueryHandler", (QueryHandler,), {"index": index, "quiet": quiet})
+    if unix:
+        # no Nagle on a Unix socket.
+        handler.disable_nagle_algorithm = False
+        return UnixHTTPServer(unix, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,244 @@
+# reachability counts of a global dependency graph: for every zone, how many zones depend on it
+# (directly or not), i.e. its in-degree in the transitive closure, without building the closure.
+# the graph is condensed into its strongly connected components, then
+#   - exact: the set of zones reachable from each component is propagated over the condensed
+#     DAG from the sinks up, and every zone of it counted once per member. a set is dropped as soon as all the
+#     components pointing to it are done, so only the frontier is kept in memory.
+#   - approx: a HyperLogLog sketch of the ancestors of each component is propagated from the
+#     sources down (merging sketches is an element-wise max), for graphs too big to count exactly.
+# Python 3
+
+import numpy as np
+
+###### GLOBAL CONFIG ######
+default_precision = 12      # HyperLogLog registers: 2^12 (about 1.6% standard error).
+
+
+###### FUNC ######
+# integer CSR of a networkx graph (or of a graph_file.GraphView). returns (nodes, indptr,
+# indices, self_loop).
+def graph_to_csr(G):
+    from graph_export import edge_arrays
+    nodes, src, dst = edge_arrays(G)
+    n = len(nodes)
+    self_loop = np.zeros(n, dtype=bool)
+    self_loop[src[src == dst]] = True
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return nodes, indptr, dst[order], self_loop
+
+
+# strongly connected components (iterative Tarjan). returns comp[node]; components are numbered
+# in reverse topological order (a component only points to components with smaller numbers).
+def scc(indptr, indices):
+    n = len(indptr) - 1
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    index = [-1] * n
+    low = [0] * n
+    comp = [-1] * n
+    on_stack = [False] * n
+    stack = []
+    counter = 0
+    n_comp = 0
+    for s in range(n):
+        if index[s] >= 0:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        on_stack[s] = True
+        work = [[s, indptr[s]]]
+        while work:
+            top = work[-1]
+            v, pos = top
+            if pos < indptr[v + 1]:
+                top[1] = pos + 1
+                w = indices[pos]
+                if index[w] < 0:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, indptr[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work and low[v] < low[work[-1][0]]:
+                low[work[-1][0]] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = n_comp
+                    if w == v:
+                        break
+                n_comp += 1
+    return np.array(comp, dtype=np.int64)
+
+
+# the condensed DAG: (comp, members, comp_indptr, comp_indices), edges between components only.
+def condense(indptr, indices):
+    comp = scc(indptr, indices)
+    n_comp = int(comp.max()) + 1 if len(comp) else 0
+    src = np.repeat(comp, np.diff(indptr))
+    dst = comp[indices]
+    keep = src != dst
+    pairs = np.unique(src[keep] * max(n_comp, 1) + dst[keep])
+    c_src, c_dst = pairs // max(n_comp, 1), pairs % max(n_comp, 1)
+    comp_indptr = np.zeros(n_comp + 1, dtype=np.int64)
+    np.cumsum(np.bincount(c_src, minlength=n_comp), out=comp_indptr[1:])
+    order = np.argsort(comp, kind="stable")
+    members_indptr = np.zeros(n_comp + 1, dtype=np.int64)
+    np.cumsum(np.bincount(comp, minlength=n_comp), out=members_indptr[1:])
+    members = [order[members_indptr[c]:members_indptr[c + 1]] for c in range(n_comp)]
+    return comp, members, comp_indptr, c_dst
+
+
+# exact count of ancestors: counts[v] = |{u != v : u reaches v}|.
+# condensed: the result of condense(indptr, indices), if already known.
+def exact_ancestor_counts(indptr, indices, condensed=None):
+    n = len(indptr) - 1
+    comp, members, comp_indptr, comp_indices = condensed or condense(indptr, indices)
+    n_comp = len(members)
+    counts = np.zeros(n, dtype=np.int64)
+    # how many components still need the reachable set of each component.
+    pending = np.bincount(comp_indices, minlength=n_comp).tolist()
+    comp_indptr = comp_indptr.tolist()
+    comp_indices = comp_indices.tolist()
+    reach = {}
+    # components are numbered sinks first: every successor is done before its predecessors.
+    for c in range(n_comp):
+        succ = comp_indices[comp_indptr[c]:comp_indptr[c + 1]]
+        for s in succ:
+            pending[s] -= 1
+        # the biggest set that nobody else needs any more is grown in place instead of copied.
+        free = [s for s in succ if pending[s] == 0]
+        if free:
+            base = max(free, key=lambda s: len(reach[s]))
+            r = reach.pop(base)
+        else:
+            base = -1
+            r = set()
+        r.update(members[c].tolist())
+        for s in succ:
+            if s == base:
+                continue
+            r |= reach[s]
+            if pending[s] == 0:
+                del reach[s]
+        # every member of c reaches every zone of r.
+        counts[np.fromiter(r, dtype=np.int64, count=len(r))] += len(members[c])
+        if pending[c] > 0:
+            reach[c] = r
+    # a zone does not count itself.
+    return counts - 1
+
+
+# 64-bit mix of integers (splitmix64), the hash of the HyperLogLog sketches.
+def _hash64(x):
+    with np.errstate(over="ignore"):
+        z = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+# HyperLogLog (register, rank) of each node id.
+def _hll_points(ids, precision):
+    h = _hash64(np.asarray(ids))
+    register = (h >> np.uint64(64 - precision)).astype(np.int64)
+    rest = (h << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    # rank = leading zeros of the remaining bits + 1.
+    rank = np.full(len(h), 1, dtype=np.uint8)
+    bit = np.uint64(1 << 63)
+    for i in range(64 - precision):
+        zero = (rest & (bit >> np.uint64(i))) == 0
+        if not zero.any():
+            break
+        rank[zero & (rank == i + 1)] += 1
+    return register, rank
+
+
+def _hll_estimate(registers):
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.power(2.0, -registers.astype(np.float64)), axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    # small range correction (linear counting).
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
+
+
+# approximate count of ancestors with HyperLogLog sketches.
+def approx_ancestor_counts(indptr, indices, precision=default_precision, condensed=None):
+    n = len(indptr) - 1
+    m = 1 << precision
+    comp, members, comp_indptr, comp_indices = condensed or condense(indptr, indices)
+    n_comp = len(members)
+    register, rank = _hll_points(np.arange(n), precision)
+    # predecessors of every component, and how many successors still need its sketch.
+    c_src = np.repeat(np.arange(n_comp), np.diff(comp_indptr))
+    order = np.argsort(comp_indices, kind="stable")
+    pred_indptr = np.zeros(n_comp + 1, dtype=np.int64)
+    np.cumsum(np.bincount(comp_indices, minlength=n_comp), out=pred_indptr[1:])
+    pred = c_src[order].tolist()
+    pred_indptr = pred_indptr.tolist()
+    pending = np.diff(comp_indptr).tolist()
+    sketches = {}
+    estimate = np.zeros(n_comp)
+    # sources first: walk the components from the highest number down.
+    for c in range(n_comp - 1, -1, -1):
+        preds = pred[pred_indptr[c]:pred_indptr[c + 1]]
+        # a source has no ancestors, and its sketch is only needed if it has successors.
+        if not preds and pending[c] == 0:
+            continue
+        sketch = np.zeros(m, dtype=np.uint8)
+        for p in preds:
+            np.maximum(sketch, sketches[p], out=sketch)
+            pending[p] -= 1
+            if pending[p] == 0:
+                del sketches[p]
+        # ancestors of c: its predecessors' sketches, without c's own members.
+        if preds:
+            estimate[c] = _hll_estimate(sketch)
+        own = members[c]
+        np.maximum.at(sketch, register[own], rank[own])
+        if pending[c] > 0:
+            sketches[c] = sketch
+    sizes = np.array([len(members[c]) for c in range(n_comp)])
+    # the other members of a component reach each zone of it.
+    return np.rint(estimate[comp] + sizes[comp] - 1).astype(np.int64)
+
+
+# in-degree of every node of G in the transitive closure of G (what nx.transitive_closure gives:
+# a node on a cycle, or with a self-loop, depends on itself). returns (nodes, counts).
+def closure_in_degree(G, exact=True, precision=default_precision):
+    nodes, indptr, indices, self_loop = graph_to_csr(G)
+    condensed = condense(indptr, indices)
+    if exact:
+        counts = exact_ancestor_counts(indptr, indices, condensed)
+    else:
+        counts = approx_ancestor_counts(indptr, indices, precision, condensed)
+    comp = condensed[0]
+    cyclic = self_loop | (np.bincount(comp, minlength=len(nodes))[comp] > 1)
+    return nodes, counts + cyclic
+
+
+# the top k zones by closure in-degree, excluding TLDs (names without a dot; root is kept).
+# returns [(zone, count), ...] in the order of sorted(..., reverse=True) on the counts (ties keep
+# the node order of G).
+def top_depended(G, k, exact=True, precision=default_precision):
+    nodes, counts = closure_in_degree(G, exact, precision)
+    top = []
+    for i in np.argsort(-counts, kind="stable"):
+        if "." in nodes[i]:
+            top.append((nodes[i], int(counts[i])))
+            if len(top) >= k:
+                break
+    return top
@@ -0,0 +1,144 @@
+# k-zone resilience sweep: which sets of k zones (or provider families, e.g. all awsdns-*) jointly
+# take down the most domains of a global graph (see block_impact.py for the rule).
+#   - exhaustive: every k-combination of the candidate units, walked depth-first so that the
+#     scenarios sharing a prefix share its lost zones (BlockState add/undo). a branch is cut when
+#     even its best completion cannot enter the current top: blocking a unit can only take down
+#     the zones depending on it, so the lost domains of a scenario are at most those of its prefix
+#     plus the exposure (domains depending on the unit) of each unit still to add.
+#     the first unit of the combinations is spread over a pool of forked processes.
+#   - greedy / lazy greedy (CELF): pick the unit with the largest marginal gain k times. lazy
+#     greedy re-evaluates a unit only when its last gain is still the best, which is exact if the
+#     loss is submodular; joint failures (two redundant providers) are not, so greedy is a fast
+#     heuristic for large k and the exhaustive sweep the reference for small k.
+# Python 3
+
+import os
+import re
+import heapq
+from itertools import count
+
+###### GLOBAL CONFIG ######
+# state of the worker processes, set in the parent before the pool is forked (see dep_build.py).
+_index = None
+_units = None
+_sweep_args = None
+
+
+###### FUNC ######
+# exposure of a unit (zone ids): (zones, domains) depending on it, the unit included. an upper
+# bound of what blocking the unit can add to any scenario.
+def exposure(index, unit):
+    seen = set(unit)
+    stack = list(unit)
+    while stack:
+        for u in index._pred[stack.pop()]:
+            if u not in seen:
+                seen.add(u)
+                stack.append(u)
+    seen = [u for u in seen if index._alive[u]]
+    return len(seen), int(index.is_domain[seen].sum()) if seen else 0
+
+
+# the units of a sweep: every zone (not TLDs nor root), except that the zones matching one of
+# families (regular expressions) are merged into one unit named after it. units with no domain
+# depending on them are dropped, the others sorted by exposure, at most candidates of them.
+# returns [(name, [zone ids], (zones, domains) exposure), ...]
+def candidate_units(index, families=(), candidates=None):
+    patterns = [(family, re.compile(family)) for family in families]
+    grouped = {family: [] for family in families}
+    units = []
+    for i, name in enumerate(index.names):
+        if "." not in name or name == "." or not index._alive[i]:
+            continue
+        for family, pattern in patterns:
+            if pattern.search(name):
+                grouped[family].append(i)
+                break
+        else:
+            units.append((name, [i]))
+    units += [(family, ids) for family, ids in grouped.items() if ids]
+    units = [(name, ids, exposure(index, ids)) for name, ids in units]
+    units = [unit for unit in units if unit[2][1] > 0]
+    units.sort(key=lambda unit: (-unit[2][1], -unit[2][0], unit[0]))
+    return units[:candidates] if candidates else units
+
+
+# the top scenarios of k units whose first unit is units[first]: [(domains, zones, unit indexes)].
+def _sweep_from(first):
+    k, top = _sweep_args
+    bound = [unit[2][1] for unit in _units]
+    state = _index.state()
+    best = []
+    tie = count()
+
+    def visit(start, chosen):
+        if len(chosen) == k:
+            item = (state.lost_domains, state.lost, next(tie), tuple(chosen))
+            if len(best) < top:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+            return
+        need = k - len(chosen)
+        for i in range(start, len(_units) - need + 1):
+            # units are sorted by exposure: the best completion adds the next ones.
+            if len(best) == top and state.lost_domains + sum(bound[i:i + need]) < best[0][0]:
+                break
+            undo = state.add(_units[i][1])
+            chosen.append(i)
+            visit(i + 1, chosen)
+            chosen.pop()
+            state.undo(undo)
+
+    undo = state.add(_units[first][1])
+    visit(first + 1, [first])
+    state.undo(undo)
+    return [(domains, zones, chosen) for domains, zones, _, chosen in best]
+
+
+# the top scenarios of exactly k units, by domains then zones lost, over workers processes.
+# returns [(domains lost, zones lost, [unit names]), ...]
+def sweep(index, units, k, top=100, workers=None):
+    global _index, _units, _sweep_args
+    _index, _units, _sweep_args = index, units, (k, top)
+    firsts = list(range(len(units) - k + 1))
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(firsts) < 2:
+        results = map(_sweep_from, firsts)
+        merged = [item for result in results for item in result]
+    else:
+        import multiprocessing
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            merged = [item for result in pool.imap_unordered(_sweep_from, firsts)
+                      for item in result]
+    merged.sort(key=lambda item: (-item[0], -item[1], item[2]))
+    return [(domains, zones, [units[i][0] for i in chosen])
+            for domains, zones, chosen in merged[:top]]
+
+
+# greedy selection of k units, lazy (CELF) or not. returns the scenario after each pick:
+# [(domains lost, zones lost, [unit names]), ...] for 1..k units.
+def greedy(index, units, k, lazy=True):
+    state = index.state()
+    chosen = []
+    steps = []
+    # max-heap of (-gain, -zones, unit index, round of the gain); exposure is a valid first bound.
+    heap = [(-unit[2][1], -unit[2][0], i, -1) for i, unit in enumerate(units)]
+    heapq.heapify(heap)
+    for step in range(min(k, len(units))):
+        if lazy:
+            while True:
+                _, _, i, computed = heapq.heappop(heap)
+                if computed == step:
+                    break
+                zones, domains = state.gain(units[i][1])
+                heapq.heappush(heap, (-domains, -zones, i, step))
+        else:
+            remaining = [i for _, _, i, _ in heap]
+            gains = {i: state.gain(units[i][1]) for i in remaining}
+            i = max(remaining, key=lambda i: (gains[i][1], gains[i][0], -i))
+            heap = [item for item in heap if item[2] != i]
+        state.add(units[i][1])
+        chosen.append(i)
+        steps.append((state.lost_domains, state.lost, [units[j][0] for j in chosen]))
+    return steps
@@ -0,0 +1,219 @@
+# streaming, columnar outputs of 2_build_dependency.py.
+# 1. per-domain metrics: <list>.metrics/part-NNNNN.npz, one row per (domain, mode), columns
+#      rank, domain, mode, extrasize, avgextradepth, maxextradepth, nodes, edges
+#    mode is the index of the mode in dep_graph.modes, domain is UTF-8 bytes. rows are written
+#    in chunks as the domains are built, so the memory does not grow with the list.
+# 2. per-domain graphs (optional): <list>.graphs/ with the zone names (names.txt, one per line,
+#    line i = zone id i), the edges of all graphs of a chunk in edges-NNNNN.npy (int32, (k, 2))
+#    and index-NNNNN.npz telling where the edges of each (domain, mode) are. edges are read
+#    lazily (memory-mapped), one graph at a time.
+# Python 3
+
+import os
+import json
+import numpy as np
+from dep_graph import modes
+
+###### GLOBAL CONFIG ######
+store_version = 1
+metric_columns = ["rank", "domain", "mode", "extrasize", "avgextradepth", "maxextradepth",
+                  "nodes", "edges"]
+
+
+###### FUNC ######
+def _write_meta(path, kind):
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"version": store_version, "kind": kind, "modes": modes}, f)
+
+
+def _parts(path, prefix):
+    return sorted(name for name in os.listdir(path) if name.startswith(prefix))
+
+
+# the metric columns of one (domain, mode) from its raw result (dep_build.build_domain()).
+def _metric_values(m):
+    return {"extrasize": m.get("extrasize", 0), "avgextradepth": m.get("avgextradepth", 0),
+            "maxextradepth": m.get("maxextradepth", 0), "nodes": m["nodes"],
+            "edges": len(m["edges"])}
+
+
+# keep: also hold the written chunks in memory, for table().
+class MetricsWriter:
+    def __init__(self, path, chunk_rows=65536, keep=False):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.part = 0
+        self.kept = [] if keep else None
+        os.makedirs(path, exist_ok=True)
+        # remove the parts of a previous run.
+        for name in _parts(path, "part-"):
+            os.remove(os.path.join(path, name))
+        _write_meta(path, "metrics")
+        self._reset()
+
+    def _reset(self):
+        self.rows = {column: [] for column in metric_columns}
+
+    # add the rows of one domain. raw_set is the result of dep_build.build_domain().
+    def add(self, rank, domain, raw_set):
+        for i, mode in enumerate(modes):
+            self.rows["rank"].append(rank)
+            self.rows["domain"].append(domain.encode())
+            self.rows["mode"].append(i)
+            for column, value in _metric_values(raw_set[mode]).items():
+                self.rows[column].append(value)
+        if len(self.rows["rank"]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows["rank"]:
+            return
+        columns = {"rank": np.array(self.rows["rank"], dtype=np.int64),
+                   "domain": np.array(self.rows["domain"], dtype=np.bytes_),
+                   "mode": np.array(self.rows["mode"], dtype=np.int8),
+                   "extrasize": np.array(self.rows["extrasize"], dtype=np.int32),
+                   "avgextradepth": np.array(self.rows["avgextradepth"], dtype=np.float64),
+                   "maxextradepth": np.array(self.rows["maxextradepth"], dtype=np.int32),
+                   "nodes": np.array(self.rows["nodes"], dtype=np.int32),
+                   "edges": np.array(self.rows["edges"], dtype=np.int64)}
+        np.savez(os.path.join(self.path, "part-%05d.npz" % self.part), **columns)
+        if self.kept is not None:
+            self.kept.append(columns)
+        self.part += 1
+        self._reset()
+
+    def close(self):
+        self.flush()
+
+    # what read_metrics() would read back from the store (with keep only).
+    def table(self):
+        return _concat(self.kept)
+
+
+# all metrics of a store as columns: metrics[column] = array.
+def read_metrics(path):
+    return _concat([np.load(os.path.join(path, name)) for name in _parts(path, "part-")])
+
+
+def _concat(parts):
+    metrics = {}
+    for column in metric_columns:
+        if parts:
+            metrics[column] = np.concatenate([part[column] for part in parts])
+        else:
+            metrics[column] = np.zeros(0)
+    return metrics
+
+
+# update the rows of some domains in place: raw[domain] = the raw result of the domain
+# (dep_build.build_domain()). only the parts holding one of them are rewritten (atomically).
+# returns the number of rows updated.
+def patch_metrics(path, raw):
+    keys = {domain.encode(): domain for domain in raw}
+    updated = 0
+    for name in _parts(path, "part-"):
+        part_file = os.path.join(path, name)
+        with np.load(part_file) as part:
+            columns = {column: part[column].copy() for column in metric_columns}
+        rows = np.flatnonzero(np.isin(columns["domain"], list(keys)))
+        if not len(rows):
+            continue
+        for row in rows.tolist():
+            m = raw[keys[columns["domain"][row]]][modes[columns["mode"][row]]]
+            for column, value in _metric_values(m).items():
+                columns[column][row] = value
+        tmp = os.path.join(path, "tmp-" + name)
+        np.savez(tmp, **columns)
+        os.replace(tmp, part_file)
+        updated += len(rows)
+    return updated
+
+
+class GraphWriter:
+    # names: the zone names of the compiled graph (DepGraph.names), id i on line i.
+    def __init__(self, path, names, chunk_edges=1 << 22):
+        self.path = path
+        self.chunk_edges = chunk_edges
+        self.part = 0
+        os.makedirs(path, exist_ok=True)
+        for name in _parts(path, "edges-") + _parts(path, "index-"):
+            os.remove(os.path.join(path, name))
+        _write_meta(path, "graphs")
+        with open(os.path.join(path, "names.txt"), "w") as f:
+            for name in names:
+                f.write(name + "\n")
+        self._reset()
+
+    def _reset(self):
+        self.edges = []
+        self.count = 0
+        self.index = {"domain": [], "mode": [], "start": [], "end": []}
+
+    def add(self, domain, raw_set):
+        for i, mode in enumerate(modes):
+            edges = raw_set[mode]["edges"]
+            self.index["domain"].append(domain.encode())
+            self.index["mode"].append(i)
+            self.index["start"].append(self.count)
+            self.count += len(edges)
+            self.index["end"].append(self.count)
+            self.edges.append(edges)
+        if self.count >= self.chunk_edges:
+            self.flush()
+
+    def flush(self):
+        if not self.index["domain"]:
+            return
+        edges = np.concatenate(self.edges) if self.count else np.zeros((0, 2), dtype=np.int32)
+        np.save(os.path.join(self.path, "edges-%05d.npy" % self.part), edges)
+        np.savez(os.path.join(self.path, "index-%05d.npz" % self.part),
+                 domain=np.array(self.index["domain"], dtype=np.bytes_),
+                 mode=np.array(self.index["mode"], dtype=np.int8),
+                 start=np.array(self.index["start"], dtype=np.int64),
+                 end=np.array(self.index["end"], dtype=np.int64))
+        self.part += 1
+        self._reset()
+
+    def close(self):
+        self.flush()
+
+
+class GraphReader:
+    def __init__(self, path):
+        self.path = path
+        self._names = None
+        # location[(domain, mode)] = (part, start, end), from the (small) index files.
+        self.location = {}
+        for part, name in enumerate(_parts(path, "index-")):
+            index = np.load(os.path.join(path, name))
+            for domain, mode, start, end in zip(index["domain"], index["mode"],
+                                                index["start"], index["end"]):
+                self.location[(domain.decode(), modes[mode])] = (part, int(start), int(end))
+        self._edges = {}
+
+    @property
+    def names(self):
+        if self._names is None:
+            with open(os.path.join(self.path, "names.txt")) as f:
+                self._names = f.read().split("\n")[:-1]
+        return self._names
+
+    def __contains__(self, domain):
+        return (domain, modes[0]) in self.location
+
+    # the edges (zone ids) of one graph, read from the memory-mapped chunk.
+    def edges(self, domain, mode):
+        part, start, end = self.location[(domain, mode)]
+        if part not in self._edges:
+            self._edges[part] = np.load(os.path.join(self.path, "edges-%05d.npy" % part),
+                                        mmap_mode="r")
+        return self._edges[part][start:end]
+
+    # the networkx graph of one domain in one mode.
+    def graph(self, domain, mode):
+        import networkx as nx
+        names = self.names
+        G = nx.DiGraph()
+        G.add_node(domain)
+        G.add_edges_from((names[u], names[v]) for u, v in self.edges(domain, mode).tolist())
+        return G
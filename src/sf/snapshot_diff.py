@@ -0,0 +1,122 @@
+# incremental update between two crawl snapshots (domain_ns_info.txt) of a list (used by
+# 8_update_dependency.py).
+#   1. diff: the zones whose set of NS differs between the snapshots (added and removed ones too),
+#      or whose NS with glue differ (the glue recorded by iterative crawls, when there is some).
+#   2. the domains to rebuild: those whose closure in the OLD graph contains a changed zone, found
+#      by one reverse walk from the changed zones. the closure of any other domain walks the same
+#      zones with the same records in both snapshots, so its graphs and metrics are unchanged.
+#   3. the affected domains are rebuilt in both snapshots (dep_build.build_domain): their metrics
+#      are patched in the metrics store, and their closures diffed into a changelog.
+#   4. the global graphs are patched in place: the zones of the new global graph are those
+#      reachable from the domains (one forward walk); zones no longer reached are dropped, and
+#      only changed or new zones get their edges (re)made.
+# Python 3
+
+import numpy as np
+from dep_graph import DepGraph, modes
+from dep_build import build_domain, new_caches
+from result_store import patch_metrics
+
+###### GLOBAL CONFIG ######
+closure_cache_size = 20000000
+
+
+###### FUNC ######
+# the NS of a zone with glue in the referral, None if the zone is not in glue.
+def _glued(glue, zone):
+    zone_glue = glue.get(zone.lower()) if glue is not None else None
+    if zone_glue is None:
+        return None
+    return {ns for ns, addresses in zone_glue.items() if addresses}
+
+
+# zones whose NS (or NS with glue) differ: changed[zone] = (removed NS, added NS), sorted lists.
+# old_glue, new_glue: the glue of the snapshots (see zone_index.load_glue), None if guessed.
+def diff_snapshots(old_ns, new_ns, old_glue=None, new_glue=None):
+    changed = {}
+    for zone in old_ns.keys() | new_ns.keys():
+        old = old_ns.get(zone, {})
+        new = new_ns.get(zone, {})
+        if old.keys() != new.keys() or _glued(old_glue, zone) != _glued(new_glue, zone):
+            changed[zone] = (sorted(old.keys() - new.keys()), sorted(new.keys() - old.keys()))
+    return changed
+
+
+# the domains (in the order of domains) whose closure in dep contains a changed zone.
+# the general mode keeps every edge, its closure contains the closures of all modes.
+def affected_domains(dep, domains, changed):
+    starts = [dep.ids[zone] for zone in changed if zone in dep.ids]
+    if not starts:
+        return []
+    seen = dep.reach_mask(starts, "general", reverse=True)
+    return [domain for domain in domains if seen[dep.ids[domain]]]
+
+
+# what changed in the closure of one domain in one mode: zones and edges, by name.
+def closure_changes(old_dep, old_result, new_dep, new_result, mode):
+    old_zones = {old_dep.names[u] for u in old_result[1][mode]}
+    new_zones = {new_dep.names[u] for u in new_result[1][mode]}
+    old_edges = {(old_dep.names[u], old_dep.names[v])
+                 for u, v in old_result[0][mode]["edges"].tolist()}
+    new_edges = {(new_dep.names[u], new_dep.names[v])
+                 for u, v in new_result[0][mode]["edges"].tolist()}
+    changes = {"added": sorted(new_zones - old_zones), "removed": sorted(old_zones - new_zones),
+               "edges_added": sorted(new_edges - old_edges),
+               "edges_removed": sorted(old_edges - new_edges)}
+    return {k: v for k, v in changes.items() if v}
+
+
+# patch the global graph G of a mode in place to the closures of domain_ids in dep.
+# returns (zones added, zones removed).
+def patch_global(G, dep, domain_ids, mode, changed):
+    names = dep.names
+    reached = np.flatnonzero(dep.reach_mask(domain_ids, mode)).tolist()
+    zones = {names[u] for u in reached}
+    removed = [zone for zone in G.nodes() if zone not in zones]
+    G.remove_nodes_from(removed)
+    # the edges of a zone only depend on its own NS records: only changed and new zones (as
+    # present before any edge is added) are linked again.
+    relink = [u for u in reached if names[u] not in G or names[u] in changed]
+    added = sum(1 for u in relink if names[u] not in G)
+    for u in relink:
+        zone = names[u]
+        new = {names[v] for v in dep.successors(u, mode)}
+        if zone in G:
+            G.remove_edges_from([(zone, v) for v in list(G.successors(zone)) if v not in new])
+        G.add_edges_from((zone, v) for v in new)
+    return added, len(removed)
+
+
+# update the outputs of a build of domains from the old snapshot to the new one:
+# the metrics store at metrics_dir and Global_graph_set are patched in place.
+# old_glue, new_glue: the glue of each snapshot, as given to DepGraph by the build.
+# returns (changelog, stats): changelog[domain][mode] = closure_changes() of the changed modes.
+def update(old_ns, new_ns, domains, metrics_dir, Global_graph_set, old_glue=None, new_glue=None):
+    changed = diff_snapshots(old_ns, new_ns, old_glue, new_glue)
+    stats = {"zones_changed": len(changed), "domains": len(domains)}
+    old_dep = DepGraph(old_ns, roots=domains, glue=old_glue)
+    affected = affected_domains(old_dep, domains, changed)
+    stats["domains_rebuilt"] = len(affected)
+    new_dep = DepGraph(new_ns, roots=domains, glue=new_glue)
+    old_closures = new_caches(old_dep, closure_cache_size)
+    new_closures = new_caches(new_dep, closure_cache_size)
+    changelog = {}
+    raw = {}
+    for domain in affected:
+        old_result = build_domain(old_dep, old_closures, domain)
+        new_result = build_domain(new_dep, new_closures, domain)
+        raw[domain] = new_result[0]
+        changes = {}
+        for mode in modes:
+            mode_changes = closure_changes(old_dep, old_result, new_dep, new_result, mode)
+            if mode_changes:
+                changes[mode] = mode_changes
+        if changes:
+            changelog[domain] = changes
+    stats["domains_changed"] = len(changelog)
+    stats["metric_rows_patched"] = patch_metrics(metrics_dir, raw) if raw else 0
+    domain_ids = [new_dep.ids[domain] for domain in domains]
+    for mode in modes:
+        added, removed = patch_global(Global_graph_set[mode], new_dep, domain_ids, mode, changed)
+        stats["global_" + mode] = {"zones_added": added, "zones_removed": removed}
+    return changelog, stats
@@ -0,0 +1,275 @@
+# a local stub DNS server answering NS queries from a table, for testing and benchmarking
+# the crawler offline.
+# zones[zone] = [ns1, ns2, ...]; any other name gets an empty NOERROR answer (i.e., ~NO~NS~).
+# a_records[name] = [ip1, ip2, ...] (optional) answers A queries the same way.
+# StubAuthServers: the authoritative servers of the whole tree of zones instead (referrals, glue,
+# TCP), for the iterative crawler (ns_iterative.py).
+# usage: python stub_dns.py <domain_ns_info.txt> [port] [--auth]
+# Python 3
+
+import sys
+import time
+import asyncio
+import threading
+import dns.message
+import dns.rdatatype
+import dns.rrset
+import dns.flags
+import dns.rcode
+import dns.exception
+from zone_index import parent_of
+
+
+###### FUNC ######
+# read a domain_ns_info.txt file into the zone table of the stub server.
+def load_zones(ns_file, null_ns="~NO~NS~"):
+    zones = {}
+    with open(ns_file) as inputf:
+        for line in inputf:
+            try:
+                zone, ns = line.strip().split("\t")
+            except ValueError:
+                continue
+            if ns != null_ns:
+                zones.setdefault(zone.lower(), []).append(ns.rstrip(".") + ".")
+    return zones
+
+
+# the answer of a query over UDP: truncated (TC, no records) over 512 bytes or the EDNS size.
+def udp_wire(query, response):
+    try:
+        return response.to_wire(max_size=query.payload if query.edns >= 0 else 512)
+    except dns.exception.TooBig:
+        response.answer, response.authority, response.additional = [], [], []
+        response.flags |= dns.flags.TC
+        return response.to_wire()
+
+
+# address: the address the server listens on, for servers answering per address.
+class StubDNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server, address=None):
+        self.server = server
+        self.address = address
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        self.server.query_count += 1
+        if self.address is None:
+            wire = self.server.answer(query).to_wire()
+        else:
+            wire = udp_wire(query, self.server.answer(query, self.address))
+        if self.server.delay > 0:
+            asyncio.get_running_loop().call_later(self.server.delay, self.transport.sendto, wire, addr)
+        else:
+            self.transport.sendto(wire, addr)
+
+
+# the stub server runs its own event loop in a background thread, so that it can be used from
+# synchronous code as well as next to an asyncio client.
+class StubDNSServer:
+    def __init__(self, zones, host="127.0.0.1", port=0, delay=0.0, a_records=None):
+        self.zones = zones
+        self.a_records = a_records or {}
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.query_count = 0
+        self.loop = None
+        self.thread = None
+
+    # build the response to one query.
+    def answer(self, query):
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.AA
+        question = query.question[0]
+        zone = question.name.to_text().rstrip(".").lower()
+        if question.rdtype == dns.rdatatype.NS and zone in self.zones:
+            response.answer.append(dns.rrset.from_text_list(
+                question.name, 300, "IN", "NS", self.zones[zone]))
+        elif question.rdtype == dns.rdatatype.A and zone in self.a_records:
+            response.answer.append(dns.rrset.from_text_list(
+                question.name, 300, "IN", "A", self.a_records[zone]))
+        return response
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            listeners = self.loop.run_until_complete(self.listen())
+            ready.set()
+            self.loop.run_forever()
+            for listener in listeners:
+                listener.close()
+            # the connections still open (TCP).
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    # open the sockets (in the loop of the server). returns what to close on stop.
+    async def listen(self):
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: StubDNSProtocol(self), local_addr=(self.host, self.port))
+        # the real port when port 0 was asked.
+        self.port = transport.get_extra_info("sockname")[1]
+        self.transport = transport
+        return [transport]
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# the authoritative servers of all the zones, each NS host at its own loopback address (127.0.0.1
+# is the root server, see ns_iterative.IterativeResolver(roots=[root_address])), on UDP and TCP,
+# all on the same port. a server is authoritative for the zones listing one of its hosts: it
+# answers their NS, and the A of the NS hosts in them; a query under a zone delegated from them
+# gets a referral, with glue for the NS hosts under the zone of the server (in bailiwick).
+# glue (optional): glue[zone] = the NS hosts (lowercased) with glue in the referral of zone
+# instead, e.g. to break the bailiwick rule of DepGraph's guess (dep_graph.has_glue_vec).
+class StubAuthServers(StubDNSServer):
+    def __init__(self, zones, port=0, delay=0.0, root_address="127.0.0.1", glue=None):
+        super().__init__(zones, host=root_address, port=port, delay=delay)
+        self.root_address = root_address
+        self.glue = glue or {}
+        self.tcp_count = 0
+        hosts = sorted({ns.rstrip(".").lower() for ns_list in zones.values() for ns in ns_list})
+        # 127.1.1.1, 127.1.1.2, ... (the last byte never 0 or 255).
+        self.addresses = {host: "127.%d.%d.%d" % (1 + i // 64516, i // 254 % 254 + 1, i % 254 + 1)
+                          for i, host in enumerate(hosts)}
+        self.served = {root_address: {"."}}
+        for zone, ns_list in zones.items():
+            for ns in ns_list:
+                self.served.setdefault(self.addresses[ns.rstrip(".").lower()], set()).add(zone)
+
+    # the zone of the servers giving the referral of cut: its closest enclosing zone.
+    def parent_zone(self, cut):
+        zone = parent_of(cut)
+        while zone != "." and zone not in self.zones:
+            zone = parent_of(zone)
+        return zone
+
+    # the NS hosts with glue in the referral of cut.
+    def glued_hosts(self, cut):
+        if cut in self.glue:
+            return self.glue[cut]
+        zone = self.parent_zone(cut)
+        hosts = {ns.rstrip(".").lower() for ns in self.zones[cut]}
+        return {host for host in hosts if zone == "." or host.endswith("." + zone)}
+
+    # the glue in the referral of every zone, as zone_index.load_glue() reads it. not the zones
+    # sharing a server with their parent: it answers for them itself, with no referral.
+    def referral_glue(self):
+        glue = {}
+        for cut in self.zones:
+            if set(self.zones[cut]) & set(self.zones.get(self.parent_zone(cut), ())):
+                continue
+            glue[cut] = {host: [self.addresses[host]] for host in self.glued_hosts(cut)}
+        return glue
+
+    def answer(self, query, address):
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name.to_text().rstrip(".").lower() or "."
+        served = self.served.get(address, ())
+        # the closest enclosing zone of the server.
+        zone = name
+        while zone not in served:
+            if zone == ".":
+                response.set_rcode(dns.rcode.REFUSED)
+                return response
+            zone = parent_of(zone)
+        # the delegation from zone on the way down to name.
+        cut = None
+        below = name
+        while below != zone:
+            if below in self.zones:
+                cut = below
+            below = parent_of(below)
+        if cut is not None:
+            response.authority.append(dns.rrset.from_text_list(cut + ".", 300, "IN", "NS",
+                                                               self.zones[cut]))
+            glued = self.glued_hosts(cut)
+            for ns in self.zones[cut]:
+                host = ns.rstrip(".").lower()
+                if host in glued:
+                    response.additional.append(dns.rrset.from_text_list(
+                        ns, 300, "IN", "A", [self.addresses[host]]))
+            return response
+        response.flags |= dns.flags.AA
+        if question.rdtype == dns.rdatatype.NS and name == zone and zone != ".":
+            response.answer.append(dns.rrset.from_text_list(
+                question.name, 300, "IN", "NS", self.zones[zone]))
+        elif question.rdtype == dns.rdatatype.A and name in self.addresses:
+            response.answer.append(dns.rrset.from_text_list(
+                question.name, 300, "IN", "A", [self.addresses[name]]))
+        return response
+
+    async def serve_tcp(self, address, reader, writer):
+        try:
+            while True:
+                length = int.from_bytes(await reader.readexactly(2), "big")
+                query = dns.message.from_wire(await reader.readexactly(length))
+                self.query_count += 1
+                self.tcp_count += 1
+                wire = self.answer(query, address).to_wire()
+                writer.write(len(wire).to_bytes(2, "big") + wire)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, dns.exception.DNSException,
+                asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def listen(self):
+        listeners = []
+        for address in self.served:
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda address=address: StubDNSProtocol(self, address),
+                local_addr=(address, self.port))
+            # the real port when port 0 was asked: the root is the first one.
+            self.port = transport.get_extra_info("sockname")[1]
+            listeners.append(transport)
+            listeners.append(await asyncio.start_server(
+                lambda r, w, address=address: self.serve_tcp(address, r, w), address, self.port))
+        return listeners
+
+
+###### MAIN ######
+if __name__ == "__main__":
+    zones = load_zones(sys.argv[1])
+    port = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 5353
+    if "--auth" in sys.argv:
+        server = StubAuthServers(zones, port=port).start()
+        print("[+] stub authoritative servers of", len(zones), "zones at", len(server.served),
+              "addresses, root 127.0.0.1:" + str(server.port))
+    else:
+        server = StubDNSServer(zones, port=port).start()
+        print("[+] stub DNS server with", len(zones), "zones on 127.0.0.1:" + str(server.port))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,137 @@
+# synthetic, realistic NS topologies for benchmarks: a domain list and the domain_ns_info.txt
+# that 1_findns.py would crawl for it (or the zone table of the stub DNS server to crawl it).
+#   - TLDs: com/net served by gtld-servers.net (itself under nstld.com: cross-TLD dependency),
+#     the others by in-bailiwick a.nic.<tld>.
+#   - providers: popularity follows a power law (Zipf, s = 1.1) so a few providers serve most
+#     domains. most host themselves (in-bailiwick, with glue); some are hosted by a bigger
+#     provider (out-of-bailiwick), some pairs host each other (NS cycles), and a few spread their
+#     NS over several TLDs (awsdns-like families).
+#   - domains: self-hosted (glue), one provider, two providers, hosted by another domain (so
+#     chains of domains), or dead (no NS).
+# usage: python sf/synth_topology.py synth100k --domains 100000 [--seed 0]
+#        writes ../data/synth100k.list and ../data/synth100k.domain_ns_info.txt
+# Python 3
+
+import argparse
+import numpy as np
+from zone_index import expand_zones
+from ns_crawler import format_result
+
+###### GLOBAL CONFIG ######
+tlds = ["com", "net", "org", "cn", "de", "uk", "ru", "jp", "io", "xyz", "info", "top", "fr",
+        "br", "nl", "eu", "au", "in", "it", "co"]
+tld_weights = [45, 6, 5, 8, 4, 3, 3, 2, 2, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1]
+zipf_s = 1.1
+# how domains are hosted: self-hosted, one provider, two providers, by another domain, dead.
+hosting = {"self": 0.15, "provider": 0.65, "two_providers": 0.12, "domain": 0.05, "dead": 0.03}
+# how providers are hosted: themselves, by a bigger provider, in a cycle, on several TLDs.
+provider_hosting = {"self": 0.75, "bigger": 0.12, "cycle": 0.08, "family": 0.05}
+
+
+###### FUNC ######
+def _pick(rng, table, n):
+    return rng.choice(list(table), size=n, p=np.array(list(table.values())) / sum(table.values()))
+
+
+# zones[zone] = [ns1., ns2., ...] and the domain list of a synthetic topology.
+def generate(n_domains, seed=0, n_providers=None):
+    rng = np.random.default_rng(seed)
+    n_providers = n_providers or max(20, n_domains // 100)
+    p_tld = np.array(tld_weights, dtype=np.float64) / sum(tld_weights)
+    zones = {"nstld.com": ["av1.nstld.com.", "av2.nstld.com."],
+             "gtld-servers.net": ["av1.nstld.com.", "av2.nstld.com."]}
+    for tld in tlds:
+        if tld in ("com", "net"):
+            zones[tld] = [c + ".gtld-servers.net." for c in "abcdefghijklm"]
+        else:
+            zones[tld] = ["a.nic." + tld + ".", "b.nic." + tld + "."]
+            zones["nic." + tld] = ["a.nic." + tld + ".", "b.nic." + tld + "."]
+
+    # providers, by decreasing popularity.
+    providers = ["dns%d.%s" % (i, tlds[t]) for i, t in
+                 enumerate(rng.choice(len(tlds), size=n_providers, p=p_tld))]
+    kinds = _pick(rng, provider_hosting, n_providers)
+    hosts = {}
+    for provider, kind in zip(providers, kinds):
+        if kind == "family":
+            hosts[provider] = ["ns%d.%s-%d.%s." % (k, provider.split(".")[0], k, tld)
+                               for k, tld in enumerate(["com", "net", "org", "uk"])]
+            for host in hosts[provider]:
+                zone = host[host.find(".") + 1:-1]
+                zones[zone] = [host]
+        else:
+            hosts[provider] = ["ns1.%s." % provider, "ns2.%s." % provider]
+        zones[provider] = hosts[provider]
+    for i, provider in enumerate(providers):
+        if i == 0 or kinds[i] in ("self", "family"):
+            continue
+        other = providers[int(rng.integers(0, i))]
+        if kinds[i] == "bigger":
+            zones[provider] = hosts[other]
+        else:
+            # a cycle: the two providers host each other.
+            zones[provider] = hosts[other][:1] + hosts[provider][:1]
+            zones[other] = hosts[provider][:1] + hosts[other][:1]
+
+    weights = 1.0 / np.arange(1, n_providers + 1) ** zipf_s
+    weights /= weights.sum()
+    picks = rng.choice(n_providers, size=(n_domains, 2), p=weights)
+    domain_tlds = rng.choice(len(tlds), size=n_domains, p=p_tld)
+    domains = ["d%d-%x.%s" % (i, int(h), tlds[t]) for i, (h, t) in
+               enumerate(zip(rng.integers(0, 1 << 24, size=n_domains), domain_tlds))]
+    for i, kind in enumerate(_pick(rng, hosting, n_domains)):
+        domain = domains[i]
+        if kind == "self":
+            zones[domain] = ["ns1.%s." % domain, "ns2.%s." % domain]
+        elif kind == "provider":
+            zones[domain] = hosts[providers[picks[i, 0]]]
+        elif kind == "two_providers":
+            zones[domain] = hosts[providers[picks[i, 0]]] + [
+                host for host in hosts[providers[picks[i, 1]]] if picks[i, 1] != picks[i, 0]]
+        elif kind == "domain" and i > 0:
+            other = domains[int(rng.integers(0, i))]
+            zones[domain] = ["ns1.%s." % other]
+        elif kind == "domain":
+            zones[domain] = hosts[providers[0]]
+        # dead: no NS at all.
+    return zones, domains
+
+
+# the domain_ns_info.txt that 1_findns.py writes when it crawls domains against a server
+# answering from zones (the same walk, without the network).
+def crawl_offline(zones, domains, outputf):
+    seen = set()
+    queue = []
+    for domain in domains:
+        queue.extend(expand_zones([domain], seen))
+    i = 0
+    while i < len(queue):
+        zone = queue[i]
+        i += 1
+        ns_list = zones.get(zone, [])
+        outputf.write(format_result(zone, ns_list))
+        for ns in ns_list:
+            queue.extend(expand_zones([ns.rstrip(".")], seen))
+    return i
+
+
+# write <data_dir>/<name>.list and <name>.domain_ns_info.txt. returns (zones, domains, lines).
+def write_synthetic(name, n_domains, seed=0, data_dir="../data/"):
+    zones, domains = generate(n_domains, seed)
+    with open(data_dir + name + ".list", "w") as f:
+        f.write("".join(domain + "\n" for domain in domains))
+    with open(data_dir + name + ".domain_ns_info.txt", "w") as f:
+        crawled = crawl_offline(zones, domains, f)
+    return zones, domains, crawled
+
+
+###### MAIN ######
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="synthetic domain list and NS records.")
+    parser.add_argument("name", help="name of the list written to ../data/<name>.*")
+    parser.add_argument("--domains", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    zones, domains, crawled = write_synthetic(args.name, args.domains, args.seed)
+    print("[+] %d domains, %d zones with NS, %d zones crawled -> ../data/%s.*" % (
+        len(domains), len(zones), crawled, args.name))
@@ -0,0 +1,139 @@
+# check the iterative crawl (1_findns.py --iterative, ns_iterative.py) against the recursive one:
+# the same topology is served by the stub recursive resolver (StubDNSServer) and by stub
+# authoritative servers (StubAuthServers: root, TLDs, providers, each at its own address), and both
+# crawls must find the same NS for every zone. prints the queries of each, the TCP fallbacks and the
+# delegation cache hits. a part of the referrals break the bailiwick rule of the glue guessed from
+# the names (dep_graph.has_glue_vec): the glue flags of DepGraph(glue=) from the crawl must follow
+# the glue the servers gave, not the guess. then a crawl of zones whose glueless NS form a cycle
+# must end (the zones lame) instead of waiting for itself.
+# usage: python verify_iterative.py [--domains 2000] [--edns-payload 0]
+#        python verify_iterative.py --ns-file ../data/other.domain_ns_info.txt --list ../data/other.list
+# Python 3
+
+import io
+import time
+import asyncio
+import argparse
+import numpy as np
+from stub_dns import StubDNSServer, StubAuthServers, load_zones
+from ns_crawler import crawl, NSCrawler
+from ns_iterative import IterativeResolver
+from dep_graph import DepGraph
+from zone_index import domain_ns_from_results
+from synth_topology import generate
+
+parser = argparse.ArgumentParser(description="iterative crawl against the recursive one.")
+parser.add_argument("--domains", type=int, default=2000, help="synthetic domains to crawl")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--ns-file", help="serve a real domain_ns_info.txt instead")
+parser.add_argument("--list", help="domain list to crawl (with --ns-file)")
+parser.add_argument("--concurrency", type=int, default=64)
+parser.add_argument("--edns-payload", type=int, default=1232,
+                    help="EDNS UDP size of the iterative crawl (0: no EDNS, more TCP)")
+parser.add_argument("--flip-every", type=int, default=4,
+                    help="the referrals of one in N zones break the bailiwick rule of the glue")
+args = parser.parse_args()
+
+
+###### FUNC ######
+def run(name, domains, **kwargs):
+    results = {}
+    start = time.time()
+    crawl_stats = crawl(domains, io.StringIO(), concurrency=args.concurrency, qps=0,
+                        results=results, **kwargs)
+    print("[+] %-9s zones: %d queries: %d timeouts: %d (%.1fs)" % (
+        name, crawl_stats["zones"], crawl_stats["queries"], crawl_stats["timeouts"],
+        time.time() - start))
+    return results, crawl_stats
+
+
+# the referrals of one zone in flip_every give glue to exactly the NS the bailiwick rule gives none
+# (out-of-bailiwick hosts with glue, in-bailiwick hosts without). only zones below the TLDs with no
+# zone delegated under them: a zone whose in-bailiwick NS lose their glue is lame, and the names
+# under it are no zones in both crawls. and only zones with a referral (see referral_glue).
+def flipped_glue(zones, flip_every):
+    servers = StubAuthServers(zones)
+    parents = {servers.parent_zone(zone) for zone in zones}
+    leaves = sorted(zone for zone in servers.referral_glue() if "." in zone and zone not in parents)
+    glue = {}
+    for zone in leaves[::flip_every]:
+        hosts = {ns.rstrip(".").lower() for ns in zones[zone]}
+        glue[zone] = hosts - servers.glued_hosts(zone)
+    return glue
+
+
+###### MAIN ######
+if args.ns_file:
+    zones = load_zones(args.ns_file)
+    domains = [line.strip().split("\t")[0].lower() for line in open(args.list) if line.strip()]
+else:
+    zones, domains = generate(args.domains, args.seed)
+
+with StubDNSServer(zones) as server:
+    recursive, _ = run("recursive", domains, resolvers=["127.0.0.1"], port=server.port)
+flips = flipped_glue(zones, args.flip_every) if args.flip_every else {}
+with StubAuthServers(zones, glue=flips) as servers:
+    referral_glue = servers.referral_glue()
+    resolver = IterativeResolver([servers.root_address], port=servers.port,
+                                 edns_payload=args.edns_payload)
+    iterative, crawl_stats = run("iterative", domains, resolvers=[], port=servers.port,
+                                 iterative=resolver)
+    print("[+] iterative: referrals: %d cut hits: %d address lookups: %d lame: %d, "
+          "tcp: %d (the servers saw %d queries, %d over TCP) at %d addresses" % (
+              crawl_stats["referrals"], crawl_stats["cut_hits"], crawl_stats["address_lookups"],
+              crawl_stats["lame"], crawl_stats["tcp"], servers.query_count, servers.tcp_count,
+              len(servers.served)))
+
+# without the delegation cache, every zone would be walked from the root (one query per label).
+print("[+] walking every zone from the root would take %d queries" % sum(
+    zone.count(".") + 1 for zone in iterative))
+
+# the same NS for every zone. (names are compared lowercased: the case of a name may be lost to
+# the compression of the answers.)
+normalize = lambda ns_list: {ns.rstrip(".").lower() for ns in ns_list}
+recursive = {zone.lower(): ns_list for zone, ns_list in recursive.items()}
+iterative = {zone.lower(): ns_list for zone, ns_list in iterative.items()}
+mismatched = [zone for zone in recursive
+              if normalize(recursive[zone]) != normalize(iterative.get(zone, []))]
+missing = set(recursive) ^ set(iterative)
+print("[+] zones: %d recursive, %d iterative, %d mismatched, %d only in one" % (
+    len(recursive), len(iterative), len(mismatched), len(missing)))
+for zone in sorted(missing)[:10]:
+    print("\t", zone, "only in the", "recursive" if zone in recursive else "iterative", "crawl")
+for zone in mismatched[:10]:
+    print("\t", zone, sorted(normalize(recursive[zone])), sorted(normalize(iterative.get(zone, []))))
+
+# glueless NS in a cycle: a.com is served by ns1.b.net, b.net by ns1.a.com.
+cycle = {"com": ["a.gtld.net."], "net": ["a.gtld.net."], "gtld.net": ["a.gtld.net."],
+         "a.com": ["ns1.b.net."], "b.net": ["ns1.a.com."]}
+with StubAuthServers(cycle) as servers:
+    cycle_resolver = IterativeResolver([servers.root_address], port=servers.port, timeout=0.5)
+    crawler = NSCrawler([], lambda zone, ns_list: None, qps=0, iterative=cycle_resolver)
+    try:
+        asyncio.run(asyncio.wait_for(crawler.run(["x.a.com", "y.b.net"]), 30))
+        cycle_ended = True
+    except asyncio.TimeoutError:
+        cycle_ended = False
+print("[+] glueless NS cycle: crawl %s, zones: %d, lame: %d" % (
+    "ended" if cycle_ended else "DID NOT END", crawler.stats["zones"], cycle_resolver.stats["lame"]))
+
+# the glue flags of the edges: guessed from the names, from the glue the crawl recorded, and from
+# the glue the servers gave. the recorded glue must give the flags of the given one on the edges of
+# the zones with a referral (the others may have been answered by a server of the parent), and
+# differ from the guess on the flipped zones.
+domain_ns = domain_ns_from_results(iterative)
+graph = DepGraph(domain_ns, roots=domains)
+guessed = graph.ns_glue
+real = DepGraph(domain_ns, roots=domains, glue=resolver.glue).ns_glue
+expected = DepGraph(domain_ns, roots=domains, glue=referral_glue).ns_glue
+referred = np.array([graph.names[i] in referral_glue for i in graph.ns_src], dtype=bool)
+glue_wrong = int(np.sum((real != expected) & referred))
+guess_differs = int(np.sum(guessed != real))
+print("[+] NS edges: %d (%d of zones with a referral, %d zones flipped), glue guessed: %d, "
+      "seen: %d, given: %d, seen != given on %d edges, guessed != seen on %d edges" % (
+          len(real), referred.sum(), len(flips), guessed.sum(), real.sum(), expected.sum(),
+          glue_wrong, guess_differs))
+glue_ignored = bool(flips) and not guess_differs
+if glue_ignored:
+    print("\t the flipped referrals changed no glue flag")
+exit(1 if mismatched or missing or not cycle_ended or glue_wrong or glue_ignored else 0)
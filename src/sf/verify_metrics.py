@@ -0,0 +1,48 @@
+# regression check of the per-domain metrics (ExtraSize, AvgExtraDepth, MaxExtraDepth):
+# recompute them with the current code and compare with a graph_set_per_domain.bin.
+# INPUT:
+#   sys.argv[1] (name of the list, e.g. edu), ../data/<list>.domain_ns_info.txt
+#   ../data/<list>.glue.txt (output of 1_findns.py --iterative, if there is one)
+#   ../data/<list>.graph_set_per_domain.bin (reference output of 2_build_dependency.py)
+# OUTPUT: mismatches on stdout; exit code 1 if there is any.
+# usage: python sf/verify_metrics.py edu gov other
+# Python 3
+
+import sys
+import pickle
+from zone_index import load_domain_ns, load_snapshot_glue
+from dep_graph import DepGraph, modes
+from dep_build import build_all
+
+###### GLOBAL CONFIG ######
+metrics = ["extrasize", "avgextradepth", "maxextradepth"]
+
+###### MAIN ######
+failed = 0
+for ntype in sys.argv[1:]:
+    Graph_set = pickle.load(open("../data/"+ntype+".graph_set_per_domain.bin", "rb"))
+    domain_list = list(Graph_set)
+    ns_file = "../data/"+ntype+".domain_ns_info.txt"
+    dep = DepGraph(load_domain_ns(ns_file), roots=domain_list, glue=load_snapshot_glue(ns_file))
+    raw, global_zones, cache_stats = build_all(dep, domain_list)
+
+    mismatches = 0
+    for domain in domain_list:
+        for mode in modes:
+            for metric in metrics:
+                if metric not in Graph_set[domain][mode]:
+                    continue
+                expected = Graph_set[domain][mode][metric]
+                got = raw[domain][mode][metric]
+                if abs(got - expected) > 1e-9:
+                    print("[!]", ntype, domain, mode, metric, "expected", expected, "got", got)
+                    mismatches += 1
+            # the zones of the graph must match too.
+            nodes = {dep.names[v] for v in raw[domain][mode]["edges"][:, 1]} | {domain}
+            if nodes != set(Graph_set[domain][mode]["graph"].nodes):
+                print("[!]", ntype, domain, mode, "zones differ")
+                mismatches += 1
+    print("[+]", ntype, len(domain_list), "domains,", mismatches, "mismatches.")
+    failed += mismatches
+
+sys.exit(1 if failed else 0)
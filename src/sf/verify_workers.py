@@ -0,0 +1,74 @@
+# check that a sharded build gives the same bytes as a single-process one (see dep_build.py):
+# builds a list with --workers 1 and with --workers N (domrel.py build --pickle --domain-graphs
+# --graph-store --no-pictures), each in its own scratch folder with a copy of the inputs, and
+# compares every output file byte by byte.
+# INPUT: ../data/<list>.list, ../data/<list>.domain_ns_info.txt (and ../data/<list>.glue.txt)
+# OUTPUT: the files that differ on stdout; exit code 1 if there is any.
+# usage: python sf/verify_workers.py other [--workers 4] [--limit 0]
+# Python 3
+
+import os
+import sys
+import shutil
+import filecmp
+import argparse
+import tempfile
+import subprocess
+
+parser = argparse.ArgumentParser(description="sharded build against a single-process one.")
+parser.add_argument("list", nargs="+", help="names of the lists, e.g. edu gov other")
+parser.add_argument("--data-dir", default="../data/", help="folder of the input files")
+parser.add_argument("--workers", type=int, default=4, help="processes of the sharded build")
+parser.add_argument("--limit", type=int, default=0, help="--limit of the builds (0: all)")
+parser.add_argument("--keep", action="store_true", help="keep the scratch folders")
+args = parser.parse_args()
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+###### FUNC ######
+# build ntype with workers processes in a scratch folder. returns the folder.
+def run_build(ntype, workers):
+    data_dir = tempfile.mkdtemp(prefix="verify_workers_%s_%d_" % (ntype, workers)) + "/"
+    for suffix in (".list", ".domain_ns_info.txt", ".glue.txt"):
+        if os.path.exists(args.data_dir + ntype + suffix):
+            shutil.copy(args.data_dir + ntype + suffix, data_dir)
+    with open(data_dir + "build.log", "w") as log:
+        subprocess.run([sys.executable, os.path.join(script_dir, "domrel.py"), "build", ntype,
+                        "--data-dir", data_dir, "--workers", str(workers), "--limit",
+                        str(args.limit), "--pickle", "--domain-graphs", "--graph-store",
+                        "--no-pictures"], stdout=log, stderr=subprocess.STDOUT, check=True)
+    os.remove(data_dir + "build.log")
+    return data_dir
+
+
+# the files under a folder, relative to it.
+def list_files(root):
+    files = set()
+    for path, _, names in os.walk(root):
+        for name in names:
+            files.add(os.path.relpath(os.path.join(path, name), root))
+    return files
+
+
+###### MAIN ######
+failed = 0
+for ntype in args.list:
+    single = run_build(ntype, 1)
+    sharded = run_build(ntype, args.workers)
+    files = list_files(single) | list_files(sharded)
+    differ = []
+    for name in sorted(files):
+        a, b = os.path.join(single, name), os.path.join(sharded, name)
+        if not (os.path.exists(a) and os.path.exists(b) and filecmp.cmp(a, b, shallow=False)):
+            differ.append(name)
+            print("[!]", ntype, name, "differs" if os.path.exists(a) and os.path.exists(b)
+                  else "only in one build")
+    print("[+]", ntype, len(files), "files, workers 1 vs", args.workers, ":", len(differ),
+          "differ.")
+    failed += len(differ)
+    if not args.keep:
+        shutil.rmtree(single)
+        shutil.rmtree(sharded)
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,124 @@
+# shared index of (domain, ns) data, used by 1_findns.py and 2_build_dependency.py.
+#   domain_ns[domain] = {ns1: None, ns2: None, ...}   (insertion-ordered set of NS per zone)
+# zone names are interned, and the parent chain of a name is memoized (in a bounded cache, the
+# query service lives long).
+# Python 3
+
+import os
+import sys
+import functools
+
+###### GLOBAL CONFIG ######
+null_ns = "~NO~NS~"
+# names whose parent chain is memoized (the least recently used are dropped).
+parent_chain_cache_size = 1 << 18
+
+
+###### FUNC ######
+# intern a zone name (without the trailing dot), so that equal names share one string object.
+def intern_name(name):
+    return sys.intern(name.rstrip("."))
+
+
+# the direct parent of a zone. the parent of a TLD is root (".").
+def parent_of(zone):
+    if zone.find(".") >= 0:
+        return zone[zone.find(".") + 1:]
+    return "."
+
+
+# the zone itself and all its parents (root excluded), memoized per name.
+# "www.example.com" -> ("www.example.com", "example.com", "com")
+@functools.lru_cache(maxsize=parent_chain_cache_size)
+def parent_chain(name):
+    zone = intern_name(name)
+    if not zone:
+        return ()
+    if zone.find(".") < 0:
+        return (zone,)
+    # reuse the (memoized) chain of the parent.
+    return (zone,) + parent_chain(zone[zone.find(".") + 1:])
+
+
+# expand names into all the zones they depend on by position, without duplicates, keeping order.
+def expand_zones(names, seen=None):
+    if seen is None:
+        seen = set()
+    expanded = []
+    for name in names:
+        for zone in parent_chain(name):
+            if zone in seen:
+                # the rest of the chain has been expanded with it.
+                break
+            seen.add(zone)
+            expanded.append(zone)
+    return expanded
+
+
+# add one (domain, ns) record. dead ends (~NO~NS~) are not added.
+def add_ns(domain_ns, domain, ns):
+    ns = ns.rstrip(".")
+    if ns == null_ns:
+        return
+    domain = intern_name(domain)
+    if domain not in domain_ns:
+        domain_ns[domain] = {}
+    domain_ns[domain][sys.intern(ns)] = None
+
+
+# read and store (domain, ns) mappings from a domain_ns_info.txt file.
+# (the same as add_ns() for every line, inlined as this is the hot loop on large files.)
+def load_domain_ns(ns_file, domain_ns=None):
+    if domain_ns is None:
+        domain_ns = {}
+    intern = sys.intern
+    with open(ns_file) as inputf:
+        for line in inputf:
+            try:
+                domain, ns = line.strip().split("\t")
+            except ValueError:
+                print(line.strip())
+                continue
+            ns = ns.rstrip(".")
+            if ns == null_ns:
+                continue
+            domain = domain.rstrip(".")
+            entry = domain_ns.get(domain)
+            if entry is None:
+                entry = domain_ns[intern(domain)] = {}
+            entry[intern(ns)] = None
+    return domain_ns
+
+
+# read the glue recorded by the iterative crawl (<list>.glue.txt, see ns_iterative.py).
+# returns glue[zone] = {ns host: [addresses]}, {} for a referral without glue.
+def load_glue(glue_file):
+    glue = {}
+    with open(glue_file) as inputf:
+        for line in inputf:
+            fields = line.rstrip("\n").split("\t")
+            zone_glue = glue.setdefault(sys.intern(fields[0]), {})
+            if len(fields) == 3:
+                zone_glue.setdefault(sys.intern(fields[1]), []).append(fields[2])
+    return glue
+
+
+# the glue recorded with a snapshot of NS records: <list>.glue.txt next to
+# <list>.domain_ns_info.txt (<list>.glue.prev.txt next to <list>.domain_ns_info.prev.txt).
+# returns load_glue() of it, None if there is none (the glue is then guessed from the names).
+def load_snapshot_glue(ns_file):
+    head, tail = os.path.split(ns_file)
+    if ".domain_ns_info" not in tail:
+        return None
+    glue_file = os.path.join(head, tail.replace(".domain_ns_info", ".glue", 1))
+    return load_glue(glue_file) if os.path.exists(glue_file) else None
+
+
+# the same records from crawl results: results[zone] = [ns1., ns2., ...] ([] for ~NO~NS~).
+def domain_ns_from_results(results, domain_ns=None):
+    if domain_ns is None:
+        domain_ns = {}
+    for domain, ns_list in results.items():
+        for ns in ns_list:
+            add_ns(domain_ns, domain, ns)
+    return domain_ns